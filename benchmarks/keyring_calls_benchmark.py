@@ -0,0 +1,90 @@
+"""
+Counts the calls of the OS credentials manager (keyring) that the KeyringCredentialsStore makes in typical scenarios,
+without and with its caches, using an in-memory keyring backend that simulates the latency of a real one.
+
+Usage (from the repository root):
+
+    python -m benchmarks.keyring_calls_benchmark [--latency-ms 50] [--credentials-length 3000]
+
+The "without caches" column disables the process and disk caches of the KeyringCredentialsStore (but not the manifest
+of the chunked credentials on Windows, whose chunks are loaded in parallel).
+"""
+import argparse
+import secrets
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple, Callable
+from unittest import mock
+
+import keyring
+
+from focus_time_app.configuration.persistence import Persistence
+from focus_time_app.focus_time_calendar.impl.keyring_credentials_store import KeyringCredentialsStore
+from tests.utils.in_memory_keyring import CountingInMemoryKeyring
+
+
+def run_scenario(backend: CountingInMemoryKeyring, scenario: Callable[[], None]) -> Tuple[int, float]:
+    backend.calls = 0
+    start = time.perf_counter()
+    scenario()
+    return backend.calls, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Simulated latency of each keyring call")
+    parser.add_argument("--credentials-length", type=int, default=3000,
+                        help="Length of the stored credentials (a large Azure token has several thousand characters)")
+    parser.add_argument("--daemon-syncs", type=int, default=10,
+                        help="Number of reconnects of the simulated sync daemon")
+    args = parser.parse_args()
+
+    backend = CountingInMemoryKeyring(args.latency_ms / 1000)
+    keyring.set_keyring(backend)
+    credentials = "x" * args.credentials_length
+
+    print(f"Keyring calls (and seconds) for credentials of {args.credentials_length} characters, with a simulated "
+          f"latency of {args.latency_ms} ms per call\n")
+    print(f"{'Platform':<10}{'Scenario':<32}{'without caches':>20}{'with caches':>20}")
+
+    with tempfile.TemporaryDirectory() as storage_directory, \
+            mock.patch.object(Persistence, "get_storage_directory", return_value=Path(storage_directory)):
+        for platform, pw_length_limit in [("win32", 500), ("darwin", 0)]:
+            with mock.patch.dict(KeyringCredentialsStore.PASSWORD_LENGTH_LIMITATION, {sys.platform: pw_length_limit}):
+                KeyringCredentialsStore.clear_process_cache()
+                store = KeyringCredentialsStore(namespace_override="benchmark", use_disk_cache=True)
+                store.save_credentials(credentials)
+
+                def sync_in_new_process(use_caches: bool):
+                    # Each sync run by the background scheduler is a new process
+                    KeyringCredentialsStore.clear_process_cache()
+                    store = KeyringCredentialsStore(namespace_override="benchmark", use_disk_cache=use_caches)
+                    assert store.load_credentials() == credentials
+
+                def daemon_reconnects(use_caches: bool):
+                    for _ in range(args.daemon_syncs):
+                        # Mirrors DaemonCommand, which discards the process cache before reconnecting, because
+                        # another process might have changed the credentials
+                        KeyringCredentialsStore.clear_process_cache()
+                        store = KeyringCredentialsStore(namespace_override="benchmark", use_disk_cache=use_caches)
+                        assert store.load_credentials() == credentials
+
+                def token_refresh(use_caches: bool):
+                    # Mirrors Outlook365KeyringBackend.save_token(), a refreshed token differs in all chunks
+                    store = KeyringCredentialsStore(namespace_override="benchmark", use_disk_cache=use_caches)
+                    store.save_credentials(secrets.token_hex(len(credentials) // 2))
+
+                for name, scenario in [("sync (new process)", sync_in_new_process),
+                                       (f"daemon ({args.daemon_syncs} reconnects)", daemon_reconnects),
+                                       ("token refresh", token_refresh)]:
+                    # Note: each scenario is run once to warm up the disk cache (as after the first sync)
+                    scenario(True)
+                    results = [run_scenario(backend, lambda: scenario(use_caches)) for use_caches in [False, True]]
+                    columns = "".join(f"{f'{calls} ({seconds:.2f}s)':>20}" for calls, seconds in results)
+                    print(f"{platform:<10}{name:<32}{columns}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Measures the cold-start time of the CLI, i.e. the wall-clock time of a fresh "python focus_time_app/main.py <command>"
+process, for the "version", "sync" and "start" commands, and attributes the import time to the imported (top-level)
+packages, using Python's "-X importtime" option. The "sync" and "start" commands run against an in-process CalDAV
+stand-in server, with a configuration and credentials (in a file-based keyring) that are stored in a temporary
+directory, so that neither the real configuration nor the credentials manager of the OS are touched.
+
+Usage (from the repository root):
+
+    python -m benchmarks.startup_benchmark [--runs 5] [--budgets benchmarks/startup_budgets.json]
+                                           [--budget sync=1200] [--entry version --entry sync]
+
+Each entry point has a budget (in milliseconds) for the median wall-clock time of its runs, and for its import time
+(the sum of the "self" times reported by "-X importtime", which inflates them slightly). The process exits with code
+1 if any budget is exceeded, so that the benchmark can be used to catch startup regressions, e.g. in CI jobs.
+
+Because the benchmark runs the actual CLI, it only runs on the platforms that the CLI supports (macOS and Windows, see
+check_os_compatibility()), but not e.g. on Linux CI runners.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+from unittest import mock
+
+import keyring
+
+from focus_time_app.configuration.configuration import ConfigurationV1
+from focus_time_app.configuration.persistence import Persistence
+from focus_time_app.focus_time_calendar.event import CalendarType
+from focus_time_app.focus_time_calendar.impl.keyring_credentials_store import KeyringCredentialsStore
+from focus_time_app.utils.compatibility_checker import check_os_compatibility
+from tests.utils.caldav_stand_in_server import CaldavStandInServer
+from tests.utils.file_keyring import FileKeyring, KEYRING_FILE_ENV_VAR_NAME, FILE_KEYRING_BACKEND_NAME
+
+PROJECT_ROOT_PATH = Path(__file__).parent.parent
+MAIN_PY_PATH = PROJECT_ROOT_PATH / "focus_time_app" / "main.py"
+DEFAULT_BUDGETS_PATH = Path(__file__).parent / "startup_budgets.json"
+
+# CLI arguments of each entry point
+ENTRY_POINTS: Dict[str, List[str]] = {
+    "version": ["version"],
+    "sync": ["sync"],
+    "start": ["start", "30"],
+}
+
+
+@dataclass
+class EntryPointResult:
+    name: str
+    wall_times_ms: List[float]
+    import_time_ms: float
+    import_times_by_package_ms: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def median_wall_time_ms(self) -> float:
+        return statistics.median(self.wall_times_ms)
+
+
+def parse_importtime_output(stderr: str) -> Dict[str, float]:
+    """
+    Parses the "-X importtime" lines of the provided stderr output, and returns the summed-up "self" import time (in
+    milliseconds) of each top-level package (e.g. "typer" for "typer.main"), ordered by descending time.
+    """
+    times_by_package: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        columns = line[len("import time:"):].split("|")
+        if len(columns) != 3 or not columns[0].strip().isdigit():
+            continue  # the header line
+        package = columns[2].strip().split(".")[0]
+        times_by_package[package] = times_by_package.get(package, 0.0) + int(columns[0]) / 1000
+    return dict(sorted(times_by_package.items(), key=lambda item: -item[1]))
+
+
+def load_budgets(budgets_path: Path, overrides: List[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Returns the budgets (by entry point, e.g. {"sync": {"wall_ms": 1500, "import_ms": 900}}) from the JSON file,
+    where overrides (e.g. "sync=1200") replace the wall-clock time budget.
+    """
+    budgets = json.loads(budgets_path.read_text(encoding="utf-8"))
+    for override in overrides:
+        name, _, value = override.partition("=")
+        budgets.setdefault(name, {})["wall_ms"] = float(value)
+    return budgets
+
+
+def create_environment(directory: Path, server: CaldavStandInServer) -> Dict[str, str]:
+    """
+    Returns the environment variables for the CLI processes, which make them use a configuration (for the calendar of
+    the stand-in server) and credentials stored in <directory>.
+    """
+    env = dict(os.environ)
+    # Note: these variables determine the storage directory (see Persistence.get_storage_directory()) on all platforms
+    env.update({"HOME": str(directory), "USERPROFILE": str(directory), "APPDATA": str(directory),
+                "XDG_CONFIG_HOME": str(directory),
+                "PYTHON_KEYRING_BACKEND": FILE_KEYRING_BACKEND_NAME,
+                KEYRING_FILE_ENV_VAR_NAME: str(directory / "keyring.json"),
+                "PYTHONPATH": str(PROJECT_ROOT_PATH)})
+
+    with mock.patch.dict(os.environ, env):
+        configuration = ConfigurationV1(calendar_type=CalendarType.CalDAV, calendar_look_ahead_hours=3,
+                                        calendar_look_back_hours=5, focustime_event_name="Focus time",
+                                        start_commands=[], stop_commands=[], dnd_profile_name="unused",
+                                        set_event_reminder=False, event_reminder_time_minutes=0,
+                                        adapter_configuration={"calendar_url": server.calendar_url})
+        Persistence.store_configuration(configuration)
+        previous_keyring = keyring.get_keyring()
+        keyring.set_keyring(FileKeyring())
+        try:
+            KeyringCredentialsStore().save_credentials(f"{server.username}||{server.password}")
+        finally:
+            keyring.set_keyring(previous_keyring)
+    return env
+
+
+def run_cli(args: List[str], env: Dict[str, str], python_options: Tuple[str, ...] = ()) -> Tuple[float, str]:
+    """
+    Runs the CLI in a new process, and returns its wall-clock time (in milliseconds) and its stderr output.
+    """
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, *python_options, str(MAIN_PY_PATH), *args], env=env,
+                             cwd=PROJECT_ROOT_PATH, capture_output=True, text=True)
+    duration_ms = (time.perf_counter() - start) * 1000
+    if process.returncode != 0:
+        raise RuntimeError(f"'{' '.join(args)}' failed with exit code {process.returncode}:\n{process.stdout}\n"
+                           f"{process.stderr}")
+    return duration_ms, process.stderr
+
+
+def benchmark_entry_point(name: str, runs: int, env: Dict[str, str], server: CaldavStandInServer) -> EntryPointResult:
+    def reset():
+        # "start" fails if there already is an active focus time event
+        server.clear()
+        with mock.patch.dict(os.environ, env):
+            Persistence.set_ongoing_focustime(ongoing=False)
+
+    args = ENTRY_POINTS[name]
+    # Note: the first (unmeasured) run writes the bytecode and configuration caches, like the first run after an update
+    reset()
+    run_cli(args, env)
+
+    wall_times_ms = []
+    for _ in range(runs):
+        reset()
+        wall_times_ms.append(run_cli(args, env)[0])
+
+    reset()
+    _, stderr = run_cli(args, env, python_options=("-X", "importtime"))
+    import_times_by_package_ms = parse_importtime_output(stderr)
+    return EntryPointResult(name=name, wall_times_ms=wall_times_ms,
+                            import_time_ms=sum(import_times_by_package_ms.values()),
+                            import_times_by_package_ms=import_times_by_package_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of measured runs per entry point")
+    parser.add_argument("--entry", action="append", choices=list(ENTRY_POINTS),
+                        help="Entry point to measure (can be repeated), by default all of them")
+    parser.add_argument("--budgets", type=Path, default=DEFAULT_BUDGETS_PATH,
+                        help="JSON file with the budgets (in milliseconds) of each entry point")
+    parser.add_argument("--budget", action="append", default=[], metavar="ENTRY=MS",
+                        help="Overrides the wall-clock time budget of an entry point (can be repeated)")
+    parser.add_argument("--top", type=int, default=10, help="Number of packages listed per entry point")
+    parser.add_argument("--latency-ms", type=float, default=0,
+                        help="Simulated latency of each request to the CalDAV stand-in server")
+    args = parser.parse_args()
+
+    try:
+        check_os_compatibility()
+    except ValueError as e:
+        sys.exit(f"The startup benchmark runs the CLI, which does not support this platform: {e}")
+
+    budgets = load_budgets(args.budgets, args.budget)
+    results: List[EntryPointResult] = []
+    with tempfile.TemporaryDirectory() as directory, \
+            CaldavStandInServer(latency_seconds=args.latency_ms / 1000) as server:
+        env = create_environment(Path(directory), server)
+        for name in args.entry or list(ENTRY_POINTS):
+            results.append(benchmark_entry_point(name, args.runs, env, server))
+
+    exceeded_budgets = []
+    print(f"{'Entry point':<14}{'median':>10}{'min':>10}{'max':>10}{'budget':>10}{'imports':>10}{'budget':>10}")
+    for result in results:
+        budget = budgets.get(result.name, {})
+        wall_budget, import_budget = budget.get("wall_ms"), budget.get("import_ms")
+        print(f"{result.name:<14}{result.median_wall_time_ms:>10.0f}{min(result.wall_times_ms):>10.0f}"
+              f"{max(result.wall_times_ms):>10.0f}{wall_budget or '-':>10}{result.import_time_ms:>10.0f}"
+              f"{import_budget or '-':>10}")
+        if wall_budget is not None and result.median_wall_time_ms > wall_budget:
+            exceeded_budgets.append(f"{result.name}: median wall-clock time {result.median_wall_time_ms:.0f} ms "
+                                    f"exceeds the budget of {wall_budget} ms")
+        if import_budget is not None and result.import_time_ms > import_budget:
+            exceeded_budgets.append(f"{result.name}: import time {result.import_time_ms:.0f} ms exceeds the budget "
+                                    f"of {import_budget} ms")
+
+    for result in results:
+        print(f"\nSlowest imports of '{result.name}' (ms, self time summed up per top-level package):")
+        for package, duration_ms in list(result.import_times_by_package_ms.items())[:args.top]:
+            print(f"  {package:<30}{duration_ms:>10.1f}")
+
+    if exceeded_budgets:
+        print("\nBudgets exceeded:\n  " + "\n  ".join(exceeded_budgets))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Measures the calendar operations of the app (get_events(), create_event(), update_event() and remove_event(), as well
+as a complete "sync", i.e. SyncCommand.run()) with the CalDAV and the Outlook 365 adapter, each of which talks to an
+in-process stand-in server (see tests/utils) that simulates a configurable network latency. The calendars are seeded
+with synthetic (but seeded, thus reproducible) events: a mix of focus time events and "noise" events, some of which
+recur or have a reminder (VALARM).
+
+Usage (from the repository root):
+
+    python -m benchmarks.sync_benchmark [--adapter caldav --adapter outlook365] [--events 10,100,1000,10000]
+                                        [--latency-ms 0,20] [--mode full --mode incremental] [--repetitions 5]
+                                        [--output results.json] [--compare baseline.json]
+
+In the "full" mode, the adapter queries all events of the time window from the server. In the "incremental" mode,
+the adapter is wrapped in a CachingCalendarAdapter (like the CLI commands do), and synchronizes incrementally (using
+CalDAV sync tokens or Graph delta queries) with the local EventStore. The first get_events() call and the first sync
+(which adjusts the reminders of the seeded focus time events) are reported separately ("get_events (first)" and
+"sync (first)"), because they do more work than the following ones.
+
+The results (durations in milliseconds, and the number of requests the stand-in server received) are printed and
+optionally written to a JSON file. With --compare, the medians are compared to those of an earlier JSON file.
+
+By default, the rate limit of the app (see ConfigurationV1.http_max_requests_per_second) is disabled, because it would
+dominate the results of the fast stand-in servers. The O365 library waits 200 ms between consecutive requests on its
+own, which is included in the results of the Outlook 365 adapter.
+
+The sync operation uses a fake command executor and notification implementation (see tests/utils), so that it
+neither changes the DND mode of the OS nor shows notifications, and runs on any platform.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, List, Union
+from unittest import mock
+
+from focus_time_app.cli.commands import sync_command as sync_command_module
+from focus_time_app.cli.commands.sync_command import SyncCommand
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter
+from focus_time_app.focus_time_calendar.caching_calendar_adapter import CachingCalendarAdapter
+from focus_time_app.focus_time_calendar.event import FocusTimeEvent
+from focus_time_app.focus_time_calendar.event_store import EventStore
+from tests.utils.caldav_stand_in_server import CaldavStandInServer
+from tests.utils.fake_command_executor import FakeCommandExecutor
+from tests.utils.fake_os_notification import FakeOsNotification
+from tests.utils.graph_stand_in_server import GraphStandInServer
+from tests.utils.stand_in_calendar_adapters import create_stand_in_adapter, create_stand_in_configuration, \
+    store_stand_in_credentials, stand_in_environment
+from tests.utils.synthetic_calendar import generate_synthetic_events, seed_calendar
+
+ADAPTERS = ["caldav", "outlook365"]
+MODES = ["full", "incremental"]
+
+
+@dataclass
+class OperationResult:
+    adapter: str
+    events: int
+    latency_ms: float
+    mode: str
+    operation: str
+    durations_ms: List[float] = field(default_factory=list)
+    requests: int = 0  # requests received by the stand-in server, summed up over all runs
+
+    @property
+    def key(self) -> str:
+        return f"{self.adapter}/{self.events}/{self.latency_ms:g}ms/{self.mode}/{self.operation}"
+
+    def to_json(self) -> dict:
+        result = asdict(self)
+        if self.durations_ms:
+            durations = sorted(self.durations_ms)
+            result.update(median_ms=statistics.median(durations), min_ms=durations[0], max_ms=durations[-1],
+                          p95_ms=durations[min(len(durations) - 1, round(0.95 * (len(durations) - 1)))],
+                          requests_per_run=self.requests / len(durations))
+        return result
+
+
+class _OperationTimer:
+    def __init__(self, server: Union[CaldavStandInServer, GraphStandInServer], results: List[OperationResult],
+                 adapter: str, events: int, latency_ms: float, mode: str):
+        self._server = server
+        self._results = results
+        self._result_template = dict(adapter=adapter, events=events, latency_ms=latency_ms, mode=mode)
+
+    def measure(self, operation: str, function: Callable[[], object], repetitions: int = 1) -> list:
+        result = OperationResult(operation=operation, **self._result_template)
+        self._results.append(result)
+        return_values = []
+        for _ in range(repetitions):
+            request_count = self._server.request_count
+            start = time.perf_counter()
+            return_values.append(function())
+            result.durations_ms.append((time.perf_counter() - start) * 1000)
+            result.requests += self._server.request_count - request_count
+        return return_values
+
+
+def benchmark_combination(adapter_name: str, event_count: int, latency_ms: float, mode: str, repetitions: int,
+                          seed: int, max_requests_per_second: int, results: List[OperationResult]):
+    server_class = CaldavStandInServer if adapter_name == "caldav" else GraphStandInServer
+    with tempfile.TemporaryDirectory() as directory, stand_in_environment(Path(directory)), \
+            server_class(latency_seconds=latency_ms / 1000) as server:
+        incremental = mode == "incremental"
+        configuration = create_stand_in_configuration(server, use_delta_queries=incremental,
+                                                      http_max_requests_per_second=max_requests_per_second)
+        seed_calendar(server, generate_synthetic_events(event_count, configuration.focustime_event_name, seed=seed))
+        store_stand_in_credentials(server)
+
+        event_store = EventStore(configuration, Path(directory) / EventStore.DATABASE_FILE_NAME) \
+            if incremental else None
+        adapter: AbstractCalendarAdapter = create_stand_in_adapter(configuration, server, event_store)
+        if event_store:
+            adapter = CachingCalendarAdapter(configuration, adapter, event_store)
+
+        timer = _OperationTimer(server, results, adapter_name, event_count, latency_ms, mode)
+        timer.measure("get_events (first)", adapter.get_events)
+        timer.measure("get_events", adapter.get_events, repetitions)
+
+        # Note: the created events lie outside the time window of get_events() and the sync, to not affect them
+        first_start = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=30)
+        next_starts = iter(first_start + timedelta(hours=i) for i in range(repetitions))
+
+        def create_event() -> FocusTimeEvent:
+            start = next(next_starts)
+            return adapter.create_event(start, start + timedelta(minutes=30))
+
+        created_events = timer.measure("create_event", create_event, repetitions)
+        events_to_update = iter(created_events)
+        timer.measure("update_event", lambda: adapter.update_event(next(events_to_update), reminder_in_minutes=5),
+                      repetitions)
+        # Note: the updates changed the version identifiers (e.g. the ETags) of the events on the server
+        events_to_remove = iter(adapter.get_events((first_start, first_start + timedelta(hours=repetitions))))
+        timer.measure("remove_event", lambda: adapter.remove_event(next(events_to_remove)), repetitions)
+
+        sync_command = SyncCommand(configuration, adapter)
+        # Note: the output of the sync (e.g. "No focus time is active") would clutter the results
+        with mock.patch.object(sync_command_module, "CommandExecutorImpl", FakeCommandExecutor()), \
+                mock.patch.object(sync_command_module, "OsNativeNotificationImpl", FakeOsNotification()), \
+                contextlib.redirect_stdout(io.StringIO()):
+            timer.measure("sync (first)", sync_command.run)
+            timer.measure("sync", sync_command.run, repetitions)
+
+        if event_store:
+            event_store.close()
+
+
+def compare(results: List[OperationResult], baseline_path: Path):
+    baseline = {f"{r['adapter']}/{r['events']}/{r['latency_ms']:g}ms/{r['mode']}/{r['operation']}": r
+                for r in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]}
+    print(f"\nComparison of the medians with {baseline_path}:")
+    compared_results = 0
+    for result in results:
+        baseline_result = baseline.get(result.key)
+        if not result.durations_ms or not baseline_result or not baseline_result.get("median_ms"):
+            continue
+        compared_results += 1
+        median_ms = statistics.median(result.durations_ms)
+        change = (median_ms / baseline_result["median_ms"] - 1) * 100
+        print(f"  {result.key:<60}{baseline_result['median_ms']:>10.1f}{median_ms:>10.1f}{change:>+9.0f}%")
+    if not compared_results:
+        print("  The baseline contains none of the measured combinations")
+
+
+def _parse_list(value: str, item_type: type) -> list:
+    return [item_type(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--adapter", action="append", choices=ADAPTERS,
+                        help="Adapter to measure (can be repeated), by default all of them")
+    parser.add_argument("--events", type=lambda v: _parse_list(v, int), default=[10, 100, 1000],
+                        help="Comma-separated numbers of events the calendar is seeded with")
+    parser.add_argument("--latency-ms", type=lambda v: _parse_list(v, float), default=[0.0, 20.0],
+                        help="Comma-separated latencies (of each request to the stand-in server) to simulate")
+    parser.add_argument("--mode", action="append", choices=MODES,
+                        help="Synchronization mode (can be repeated), by default all of them")
+    parser.add_argument("--repetitions", type=int, default=5, help="Number of measured runs per operation")
+    parser.add_argument("--max-requests-per-second", type=int, default=0,
+                        help="Rate limit of the app (0 disables it), see ConfigurationV1.http_max_requests_per_second")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic events")
+    parser.add_argument("--output", type=Path, help="JSON file the results are written to")
+    parser.add_argument("--compare", type=Path, help="JSON file (written by an earlier run) to compare the results to")
+    args = parser.parse_args()
+
+    results: List[OperationResult] = []
+    for adapter_name in args.adapter or ADAPTERS:
+        for event_count in args.events:
+            for latency_ms in args.latency_ms:
+                for mode in args.mode or MODES:
+                    print(f"Measuring {adapter_name} with {event_count} events, {latency_ms:g} ms latency, "
+                          f"{mode} mode ...", file=sys.stderr)
+                    benchmark_combination(adapter_name, event_count, latency_ms, mode, args.repetitions, args.seed,
+                                          args.max_requests_per_second, results)
+
+    print(f"{'Adapter/events/latency/mode/operation':<60}{'median':>10}{'p95':>10}{'min':>10}{'max':>10}"
+          f"{'requests':>10}")
+    for result in results:
+        summary = result.to_json()
+        print(f"{result.key:<60}{summary['median_ms']:>10.1f}{summary['p95_ms']:>10.1f}{summary['min_ms']:>10.1f}"
+              f"{summary['max_ms']:>10.1f}{summary['requests_per_run']:>10.1f}")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "metadata": {"timestamp": datetime.now(timezone.utc).isoformat(), "python": sys.version,
+                         "platform": platform.platform(), "arguments": sys.argv[1:]},
+            "results": [result.to_json() for result in results]}, indent=2), encoding="utf-8")
+        print(f"\nWrote the results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
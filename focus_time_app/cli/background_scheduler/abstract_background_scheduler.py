@@ -7,9 +7,12 @@ class AbstractBackgroundScheduler(ABC):
     """
 
     @abstractmethod
-    def install_or_repair_background_scheduler(self):
+    def install_or_repair_background_scheduler(self, run_as_daemon: bool = False):
         """
-        Installs or repairs a background job that calls the "sync" command of the Focus Time App CLI
+        Installs or repairs a background job that calls the "sync" command of the Focus Time App CLI.
+
+        :param run_as_daemon: if True, the background job keeps the long-running "daemon" command alive, instead of
+            starting the "sync" command once per minute
         """
 
     def uninstall_background_scheduler(self):
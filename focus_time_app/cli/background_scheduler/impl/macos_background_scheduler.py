@@ -19,19 +19,25 @@ class MacOsBackgroundScheduler(AbstractBackgroundScheduler):
         "StartInterval": 60,  # seconds
         "RunAtLoad": True
     }
+    LAUNCHD_DAEMON_AGENT_DICT = {
+        "Label": f"com.focustime{get_environment_suffix()}",
+        "KeepAlive": True,  # restarts the daemon should it ever exit
+        "RunAtLoad": True
+    }
     LAUNCHD_AGENT_FILE = Path.home() / "Library" / "LaunchAgents" / f"com.focustime{get_environment_suffix()}.plist"
 
-    def install_or_repair_background_scheduler(self):
+    def install_or_repair_background_scheduler(self, run_as_daemon: bool = False):
         self.uninstall_background_scheduler()
 
-        plist_dict = copy(self.LAUNCHD_AGENT_DICT)
+        plist_dict = copy(self.LAUNCHD_DAEMON_AGENT_DICT if run_as_daemon else self.LAUNCHD_AGENT_DICT)
+        command = "daemon" if run_as_daemon else "sync"
 
         if is_production_environment():
-            plist_dict["ProgramArguments"] = [sys.executable, "sync"]
+            plist_dict["ProgramArguments"] = [sys.executable, command]
             if os.getenv(CI_ENV_VAR_NAME, None) is not None:
                 plist_dict["EnvironmentVariables"] = {CI_ENV_VAR_NAME: "1"}
         else:
-            plist_dict["ProgramArguments"] = [sys.executable, "focus_time_app/main.py", "sync"]
+            plist_dict["ProgramArguments"] = [sys.executable, "focus_time_app/main.py", command]
             plist_dict["WorkingDirectory"] = str(Path(__file__).parent.parent.parent.parent.parent)
 
         with self.LAUNCHD_AGENT_FILE.open("wb") as f:
@@ -35,13 +35,15 @@ class WindowsBackgroundScheduler(AbstractBackgroundScheduler):
 
         self._logger = logging.getLogger(type(self).__name__)
 
-    def install_or_repair_background_scheduler(self):
+    def install_or_repair_background_scheduler(self, run_as_daemon: bool = False):
         self.uninstall_background_scheduler()
-        self._create_trigger_sync_task()
+        self._create_trigger_sync_task(run_as_daemon)
         self._logger.info(f"Successfully configured a scheduled Windows task, see '{self.TASK_NAME}' in Task Scheduler")
 
     def uninstall_background_scheduler(self):
         if self._trigger_sync_task_exists():
+            # Stops the running instance (if any), which is relevant for the long-running daemon
+            self._root_folder.GetTask(WindowsBackgroundScheduler.TASK_NAME).Stop(0)
             self._root_folder.DeleteTask(WindowsBackgroundScheduler.TASK_NAME, 0)
 
     def _trigger_sync_task_exists(self) -> bool:
@@ -51,7 +53,7 @@ class WindowsBackgroundScheduler(AbstractBackgroundScheduler):
         except com_error:  # no such task exists
             return False
 
-    def _create_trigger_sync_task(self):
+    def _create_trigger_sync_task(self, run_as_daemon: bool):
         silent_cmd_binary_path = Path(sys.executable).parent / self.SILENT_CMD_BINARY
         if hasattr(sys, "_MEIPASS"):
             silent_cmd_binary_path = Path(sys._MEIPASS) / self.SILENT_CMD_BINARY
@@ -68,13 +70,18 @@ class WindowsBackgroundScheduler(AbstractBackgroundScheduler):
         action = task_def.Actions.Create(0)  # 0 means to execute a command
         action.ID = "Trigger sync"
         action.Path = str(silent_cmd_binary_path)
-        self._create_cmd_file()
+        self._create_cmd_file(command="daemon" if run_as_daemon else "sync")
         action.Arguments = str(self._cmd_file_path)
 
         # Set parameters
         task_def.RegistrationInfo.Description = "Triggers the Focus Time App synchronization mechanism"
         task_def.Settings.Enabled = True
         task_def.Settings.StopIfGoingOnBatteries = False
+        if run_as_daemon:
+            # The trigger still fires every minute, but because Task Scheduler ignores new instances while the daemon
+            # is running, it only acts as a watchdog that restarts the daemon in case it exited
+            task_def.Settings.ExecutionTimeLimit = "PT0S"  # no time limit, the default would stop it after 72 hours
+            task_def.Settings.MultipleInstances = 2  # TASK_INSTANCES_IGNORE_NEW
 
         # Register task
         self._root_folder.RegisterTaskDefinition(
@@ -86,7 +93,7 @@ class WindowsBackgroundScheduler(AbstractBackgroundScheduler):
             0  # NOT on logon
         )
 
-    def _create_cmd_file(self):
+    def _create_cmd_file(self, command: str):
         self._cmd_file_path.unlink(missing_ok=True)
         cmd_file_content = f"REM This file is auto-generated by the focus-time CLI{os.linesep}"
 
@@ -94,11 +101,11 @@ class WindowsBackgroundScheduler(AbstractBackgroundScheduler):
             cmd_file_content += f"set {CI_ENV_VAR_NAME}=1{os.linesep}"
 
         if is_production_environment():
-            cmd_file_content += f"{sys.executable} sync"
+            cmd_file_content += f"{sys.executable} {command}"
         else:
             # set the working dir to the source code root
             cmd_file_content += f'cd "{self._cmd_file_path.parent}"{os.linesep}'
             # Run the command
-            cmd_file_content += f"{sys.executable} focus_time_app/main.py sync"
+            cmd_file_content += f"{sys.executable} focus_time_app/main.py {command}"
 
         self._cmd_file_path.write_text(cmd_file_content)
@@ -1,21 +1,24 @@
+import functools
 import logging
 import sys
 from pathlib import Path
-from typing import Tuple, Annotated
+from typing import Tuple, Annotated, Callable, Optional
 
 import typer
 
-from focus_time_app.cli.commands.doctor_command import DoctorCommand
-from focus_time_app.cli.commands.configuration_command import ConfigurationCommand
-from focus_time_app.cli.commands.start_command import StartCommand
-from focus_time_app.cli.commands.stop_command import StopCommand
-from focus_time_app.cli.commands.sync_command import SyncCommand
-from focus_time_app.cli.commands.uninstall_command import UninstallCommand
 from focus_time_app.configuration.configuration import ConfigurationV1
 from focus_time_app.configuration.persistence import Persistence
 from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter
-from focus_time_app.focus_time_calendar.adapter_factory import create_calendar_adapter
+from focus_time_app.focus_time_calendar import http_trace
+from focus_time_app.focus_time_calendar.adapter_factory import create_caching_calendar_adapter
 from focus_time_app.utils import is_production_environment
+from focus_time_app.utils.deadline import Deadline
+from focus_time_app.utils.profiling import PROFILE_ENV_VAR_NAME, PROFILE_STACKS_ENV_VAR_NAME, PROFILES_DIRECTORY_NAME
+from focus_time_app.utils.perf import span, record_run, PHASE_CONFIG_LOAD, PHASE_CONNECTION_CHECK, \
+    PERF_HISTORY_FILE_NAME
+
+# Note: the modules that implement the commands are imported lazily (inside the functions below), so that each CLI
+# invocation only imports what the invoked command actually needs, which reduces the startup time
 
 app = typer.Typer(help="CLI tool that triggers your desktop OS's Do-Not-Disturb feature (and other arbitrary scripts), "
                        "based on blocker events on your calendar.", pretty_exceptions_enable=False)
@@ -24,22 +27,75 @@ NO_CONFIG_FILE_ERROR_MSG = "For this command to work, you first need to run the
                            "to set the necessary configuration!"
 
 
+@app.callback()
+def main(ctx: typer.Context,
+         trace_http: Annotated[bool, typer.Option(help="Print every HTTP request sent to your calendar server (to "
+                                                       "stderr), and a summary per calendar operation")] = False,
+         profile: Annotated[bool, typer.Option(envvar=PROFILE_ENV_VAR_NAME,
+                                               help="Profile the command with cProfile, writing a .pstats file to "
+                                                    "the 'profiles' directory next to the configuration file")] = False,
+         profile_stacks: Annotated[bool, typer.Option(envvar=PROFILE_STACKS_ENV_VAR_NAME,
+                                                      help="Together with --profile, also write a file with "
+                                                           "collapsed call stacks, for flame graphs")] = False):
+    if trace_http:
+        http_trace.set_listener(lambda record: typer.echo(f"HTTP {record}", err=True))
+    ctx.call_on_close(lambda: _log_http_summary(print_summary=trace_http))
+    if profile and ctx.invoked_subcommand:
+        from focus_time_app.utils.profiling import CommandProfiler
+        profiles_directory = Persistence.get_storage_directory() / PROFILES_DIRECTORY_NAME
+        profiler = CommandProfiler(ctx.invoked_subcommand, profiles_directory, sample_stacks=profile_stacks)
+        profiler.start()
+        ctx.call_on_close(profiler.stop)
+
+
+def _log_http_summary(print_summary: bool):
+    for line in http_trace.log_summary(logging.getLogger("cli.http")):
+        if print_summary:
+            typer.echo(f"HTTP summary of {line}", err=True)
+
+
 def _load_configuration_and_adapter() -> Tuple[ConfigurationV1, AbstractCalendarAdapter]:
     """
     Attempts to load the configuration of this app from disk and return it, together with the implementation of the
-    calendar adapter.
+    calendar adapter (which records the retrieved events in the local EventStore).
 
     If no configuration file could be found, a FileNotFoundError is raised. If anything else goes wrong, other
     errors are raised.
     """
-    configuration = Persistence.load_configuration()
-    calendar_adapter = create_calendar_adapter(configuration)
+    with span(PHASE_CONFIG_LOAD):
+        configuration = Persistence.load_configuration()
+        calendar_adapter = create_caching_calendar_adapter(configuration)
     return configuration, calendar_adapter
 
 
+def _record_timings(command_function: Callable) -> Callable:
+    """
+    Decorator for commands whose phases (see focus_time_app.utils.perf) should be timed, and recorded in the history
+    file that the 'perf' command evaluates.
+    """
+
+    @functools.wraps(command_function)
+    def wrapper(*args, **kwargs):
+        with record_run(command_function.__name__, Persistence.get_storage_directory() / PERF_HISTORY_FILE_NAME):
+            return command_function(*args, **kwargs)
+
+    return wrapper
+
+
+def _set_sync_deadline(config: ConfigurationV1, adapter: AbstractCalendarAdapter) -> Optional[Deadline]:
+    """
+    Creates the deadline by which the command must have finished (so that it cannot hold the single-instance lock
+    forever, should the calendar server or a start/stop command stall), and sets it on the calendar adapter.
+    """
+    deadline = Deadline.from_seconds(config.sync_deadline_seconds)
+    adapter.set_deadline(deadline)
+    return deadline
+
+
 def _check_adapter_is_valid_or_exit(adapter: AbstractCalendarAdapter, logger_name: str):
     try:
-        adapter.check_connection_and_credentials()
+        with span(PHASE_CONNECTION_CHECK):
+            adapter.check_connection_and_credentials()
     except Exception as e:
         error_msg = "Could not establish a valid connection to your calendar (are the credentials valid?)"
         typer.echo(f"{error_msg}: {e}")
@@ -47,6 +103,60 @@ def _check_adapter_is_valid_or_exit(adapter: AbstractCalendarAdapter, logger_nam
         raise typer.Exit(code=1) from None
 
 
+def _run_optimistically(config: ConfigurationV1, adapter: AbstractCalendarAdapter, logger_name: str,
+                        run_commands: Callable[[], None]):
+    """
+    Runs the commands without first verifying the connection to the calendar server (which would cost several
+    additional requests on every invocation), assuming that the cached credentials are still valid. Only if the
+    commands fail with an authentication error, the full diagnosis of _check_adapter_is_valid_or_exit() is run, to
+    tell the user whether the connection or credentials are the culprit. Other errors (e.g. of a failing start
+    command) are raised unchanged.
+
+    Once the commands succeeded, credentials that are about to expire are refreshed, see
+    AbstractCalendarAdapter.refresh_credentials_if_expiring().
+
+    If the calendar server could not be reached in the most recent attempts (e.g. because the machine is offline), the
+    ConnectivityCircuitBreaker makes this function exit immediately, instead of waiting for network timeouts.
+    """
+    from focus_time_app.focus_time_calendar.circuit_breaker import ConnectivityCircuitBreaker, \
+        CalendarUnreachableError, is_connectivity_error, is_authentication_error
+
+    logger = logging.getLogger(logger_name)
+    circuit_breaker = ConnectivityCircuitBreaker(adapter.get_server_url(), config.connectivity_failure_threshold)
+    try:
+        circuit_breaker.before_attempt()
+    except CalendarUnreachableError as e:
+        typer.echo(f"Skipping the connection to your calendar: {e}")
+        logger.info(f"Skipping the connection to the calendar: {e}")
+        raise typer.Exit(code=1) from None
+
+    try:
+        with span(PHASE_CONNECTION_CHECK):
+            adapter.prepare_connection()
+        run_commands()
+    except (typer.Exit, typer.Abort):
+        raise
+    except Exception as e:
+        if is_connectivity_error(e):
+            # Note: the diagnosis is skipped, because it would only run into the same network timeouts again
+            circuit_breaker.record_failure()
+            error_msg = "Could not reach your calendar server (are you offline?)"
+            typer.echo(f"{error_msg}: {e}")
+            logger.exception(error_msg)
+            raise typer.Exit(code=1) from None
+        if is_authentication_error(e):
+            _check_adapter_is_valid_or_exit(adapter, logger_name)
+        raise
+    circuit_breaker.record_success()
+
+    # Note: refreshing the credentials only now (rather than when the commands needed them) keeps the refresh off the
+    # critical path of the next invocation
+    try:
+        adapter.refresh_credentials_if_expiring()
+    except Exception:
+        logger.warning("Unable to refresh the credentials ahead of their expiry", exc_info=True)
+
+
 def _handle_unexpected_configuration_loading_error(logger_name: str, e: Exception):
     error_msg = "An unexpected error occurred trying to load the configuration"
     typer.echo(f"{error_msg}: {e}")
@@ -55,6 +165,7 @@ def _handle_unexpected_configuration_loading_error(logger_name: str, e: Exceptio
 
 
 @app.command()
+@_record_timings
 def sync():
     """
     Synchronizes the Do-Not-Disturb state of your local machine with your focus time calendar events. If there is an
@@ -62,6 +173,8 @@ def sync():
     (unless this app already recently activated it). If there is no active calendar event (anymore), Do-Not-Disturb is
     deactivated again (if this app has set it), and other possibly configured stop commands are called.
     """
+    from focus_time_app.cli.commands.sync_command import SyncCommand
+
     logger_name = "cli.sync"
     try:
         config, calendar_adapter = _load_configuration_and_adapter()
@@ -71,17 +184,20 @@ def sync():
     except Exception as e:
         raise _handle_unexpected_configuration_loading_error(logger_name, e)
 
-    _check_adapter_is_valid_or_exit(calendar_adapter, logger_name)
-
-    SyncCommand(config, calendar_adapter).run()
+    deadline = _set_sync_deadline(config, calendar_adapter)
+    _run_optimistically(config, calendar_adapter, logger_name, SyncCommand(config, calendar_adapter, deadline).run)
 
 
 @app.command()
+@_record_timings
 def start(duration: Annotated[int, typer.Argument(min=1, help="Length of the focus time session, in minutes")]):
     """
     Creates a new focus time calendar event in your calendar that starts now and ends in <duration> minutes. Also
     runs the 'sync' command internally, so that your start command(s) are immediately executed.
     """
+    from focus_time_app.cli.commands.start_command import StartCommand
+    from focus_time_app.cli.commands.sync_command import SyncCommand
+
     logger_name = "cli.start"
     try:
         config, calendar_adapter = _load_configuration_and_adapter()
@@ -91,18 +207,25 @@ def start(duration: Annotated[int, typer.Argument(min=1, help="Length of the foc
     except Exception as e:
         raise _handle_unexpected_configuration_loading_error(logger_name, e)
 
-    _check_adapter_is_valid_or_exit(calendar_adapter, logger_name)
+    deadline = _set_sync_deadline(config, calendar_adapter)
+
+    def run_commands():
+        StartCommand(config, calendar_adapter, duration).run()
+        SyncCommand(config, calendar_adapter, deadline).run()
 
-    StartCommand(config, calendar_adapter, duration).run()
-    SyncCommand(config, calendar_adapter).run()
+    _run_optimistically(config, calendar_adapter, logger_name, run_commands)
 
 
 @app.command()
+@_record_timings
 def stop():
     """
     Stops an ongoing focus time calendar event, by shortening it so that it ends right now. Also runs the 'sync'
     command internally, so that your stop command(s) are immediately executed.
     """
+    from focus_time_app.cli.commands.stop_command import StopCommand
+    from focus_time_app.cli.commands.sync_command import SyncCommand
+
     logger_name = "cli.stop"
     try:
         config, calendar_adapter = _load_configuration_and_adapter()
@@ -112,10 +235,61 @@ def stop():
     except Exception as e:
         raise _handle_unexpected_configuration_loading_error(logger_name, e)
 
-    _check_adapter_is_valid_or_exit(calendar_adapter, logger_name)
+    deadline = _set_sync_deadline(config, calendar_adapter)
 
-    StopCommand(config, calendar_adapter).run()
-    SyncCommand(config, calendar_adapter).run()
+    def run_commands():
+        StopCommand(config, calendar_adapter).run()
+        SyncCommand(config, calendar_adapter, deadline).run()
+
+    _run_optimistically(config, calendar_adapter, logger_name, run_commands)
+
+
+@app.command()
+def status():
+    """
+    Prints whether a focus time is currently active, and when the next one starts, based on the focus time calendar
+    events that the other commands most recently retrieved from your calendar. Does not contact your calendar server.
+    """
+    from focus_time_app.cli.commands.status_command import StatusCommand
+    from focus_time_app.focus_time_calendar.event_store import EventStore
+
+    try:
+        config = Persistence.load_configuration()
+    except FileNotFoundError:  # Note: other exceptions might be raised
+        typer.echo(NO_CONFIG_FILE_ERROR_MSG)
+        raise typer.Exit(code=1)
+    except Exception as e:
+        raise _handle_unexpected_configuration_loading_error("cli.status", e)
+
+    StatusCommand(EventStore(config)).run()
+
+
+@app.command()
+def daemon(interval_seconds: Annotated[int, typer.Option(
+    min=10, help="Number of seconds to wait between two refreshes of the events from your calendar")] = 60):
+    """
+    Runs the 'sync' command in an endless loop, keeping the configuration and the connection to your calendar alive
+    between the synchronizations. In between the regular refreshes of the events from your calendar, it also wakes up
+    exactly when a focus time event starts or ends. The background scheduler starts this command if you enabled the
+    'use_sync_daemon' configuration option.
+    """
+    from focus_time_app.cli.commands.daemon_command import DaemonCommand
+
+    DaemonCommand(interval_seconds).run()
+
+
+@app.command()
+def perf(runs: Annotated[int, typer.Option(min=1, help="Number of most recent runs to evaluate")] = 100,
+         command: Annotated[Optional[str], typer.Option(
+             help="Only evaluate the runs of this command, e.g. 'sync'")] = None):
+    """
+    Prints how long the phases (e.g. loading the configuration, retrieving the events, or running your start/stop
+    commands) of the most recent runs of the 'sync', 'start', 'stop' and 'daemon' commands took (50th, 95th and 99th
+    percentile). Does not contact your calendar server.
+    """
+    from focus_time_app.cli.commands.perf_command import PerfCommand
+
+    PerfCommand(Persistence.get_storage_directory() / PERF_HISTORY_FILE_NAME, runs, command).run()
 
 
 @app.command()
@@ -123,12 +297,20 @@ def configure(skip_background_scheduler_setup: Annotated[bool, typer.Option(
     help="Whether to skip the set up of operating-system-specific background "
          "scheduler that regularly calls the 'sync' command")] = False,
               skip_install_dnd_helper: Annotated[bool, typer.Option(
-                  help="Whether to skip the set up of the do-not-disturb mechanism")] = False
+                  help="Whether to skip the set up of the do-not-disturb mechanism")] = False,
+              use_sync_daemon: Annotated[Optional[bool], typer.Option(
+                  "--use-sync-daemon/--no-use-sync-daemon",
+                  help="Whether the background scheduler should keep a long-running 'daemon' process alive, "
+                       "instead of starting the 'sync' command once per minute. If you keep your existing "
+                       "configuration, the choice is applied to it",
+                  show_default=False)] = None
               ):
     """
     Checks the existing configuration for validity and lets you create a new configuration. All configuration options
     are interactively prompted.
     """
+    from focus_time_app.cli.commands.configuration_command import ConfigurationCommand
+
     try:
         config, calendar_adapter = _load_configuration_and_adapter()
     except FileNotFoundError:  # Note: other exceptions might be raised
@@ -137,7 +319,7 @@ def configure(skip_background_scheduler_setup: Annotated[bool, typer.Option(
         raise _handle_unexpected_configuration_loading_error("cli.configure", e)
 
     ConfigurationCommand(config, calendar_adapter, skip_background_scheduler_setup=skip_background_scheduler_setup,
-                         skip_install_dnd_helper=skip_install_dnd_helper).run()
+                         skip_install_dnd_helper=skip_install_dnd_helper, use_sync_daemon=use_sync_daemon).run()
 
 
 @app.command()
@@ -145,6 +327,8 @@ def uninstall():
     """
     Removes scheduled background jobs and Do-Not-Disturb helpers, if the operating system supports the removal.
     """
+    from focus_time_app.cli.commands.uninstall_command import UninstallCommand
+
     UninstallCommand().run()
 
 
@@ -161,7 +345,14 @@ def doctor():
     """
     Repairs the configuration of the background scheduler and Do-Not-Disturb helper.
     """
-    DoctorCommand().run()
+    from focus_time_app.cli.commands.doctor_command import DoctorCommand
+
+    try:
+        use_sync_daemon = Persistence.load_configuration().use_sync_daemon
+    except Exception:  # there might not be any (valid) configuration yet
+        use_sync_daemon = False
+
+    DoctorCommand(use_sync_daemon).run()
 
 
 def get_version() -> str:
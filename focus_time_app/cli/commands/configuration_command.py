@@ -20,11 +20,14 @@ from focus_time_app.utils.os_notification import OsNativeNotificationImpl
 
 class ConfigurationCommand:
     def __init__(self, configuration: Optional[ConfigurationV1], calendar_adapter: Optional[AbstractCalendarAdapter],
-                 skip_background_scheduler_setup: bool, skip_install_dnd_helper: bool):
+                 skip_background_scheduler_setup: bool, skip_install_dnd_helper: bool,
+                 use_sync_daemon: Optional[bool]):
         self._configuration = configuration
         self._calendar_adapter = calendar_adapter
         self._skip_background_scheduler_setup = skip_background_scheduler_setup
         self._skip_install_dnd_helper = skip_install_dnd_helper
+        # None if the user did not choose whether to use the sync daemon
+        self._use_sync_daemon = use_sync_daemon
 
     def run(self):
         if self._configuration and self._calendar_adapter:
@@ -42,6 +45,8 @@ class ConfigurationCommand:
                 typer.echo("Successfully established a test connection to your configured calendar")
 
         if not typer.confirm("Do you want to create a new configuration?", default=False, prompt_suffix='\n'):
+            if self._configuration and self._use_sync_daemon is not None:
+                self._apply_use_sync_daemon(self._configuration, self._use_sync_daemon)
             return
 
         if Persistence.get_config_file_path().exists():
@@ -55,7 +60,7 @@ class ConfigurationCommand:
                                         calendar_look_back_hours=0, focustime_event_name="Foo", start_commands=[],
                                         stop_commands=[], dnd_profile_name="foo",
                                         set_event_reminder=False, event_reminder_time_minutes=0,
-                                        show_notification=False)
+                                        show_notification=False, use_sync_daemon=bool(self._use_sync_daemon))
         calendar_adapter = create_calendar_adapter(configuration)
         while True:
             adapter_configuration = calendar_adapter.authenticate()
@@ -84,7 +89,8 @@ class ConfigurationCommand:
         self._configure_dnd_profile_name(configuration)
 
         if is_production_environment() and not self._skip_background_scheduler_setup:
-            BackgroundSchedulerImpl.install_or_repair_background_scheduler()
+            BackgroundSchedulerImpl.install_or_repair_background_scheduler(
+                run_as_daemon=configuration.use_sync_daemon)
 
         if is_production_environment() and not ShellAvailabilityImpl.is_available():
             if typer.confirm("Do you want to make the focus-time binary generally available on your shell (via the "
@@ -104,6 +110,25 @@ class ConfigurationCommand:
         typer.echo("Configuration completed. You can manually change the configuration by editing the "
                    f"file at '{Persistence.get_config_file_path()}'")
 
+    def _apply_use_sync_daemon(self, configuration: ConfigurationV1, use_sync_daemon: bool):
+        """
+        Applies the "--use-sync-daemon" (or "--no-use-sync-daemon") flag to the existing configuration, and re-installs
+        the background scheduler, which then keeps the daemon process alive (or starts the 'sync' command once per
+        minute).
+        """
+        if configuration.use_sync_daemon != use_sync_daemon:
+            configuration.use_sync_daemon = use_sync_daemon
+            Persistence.store_configuration(configuration)
+            typer.echo(f"{'Enabled' if use_sync_daemon else 'Disabled'} the 'use_sync_daemon' option in your existing "
+                       f"configuration")
+
+        if is_production_environment() and not self._skip_background_scheduler_setup:
+            BackgroundSchedulerImpl.install_or_repair_background_scheduler(run_as_daemon=use_sync_daemon)
+            if use_sync_daemon:
+                typer.echo("The background scheduler now keeps the daemon process alive")
+            else:
+                typer.echo("The background scheduler now starts the 'sync' command once per minute")
+
     @staticmethod
     def _configure_calendar_query_time_interval(configuration: ConfigurationV1):
         configuration.calendar_look_back_hours = \
@@ -0,0 +1,166 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from tendo.singleton import SingleInstance, SingleInstanceException
+
+from focus_time_app.cli.commands.sync_command import SyncCommand
+from focus_time_app.configuration.configuration import ConfigurationV1
+from focus_time_app.configuration.persistence import Persistence
+from focus_time_app.focus_time_calendar.adapter_factory import create_caching_calendar_adapter
+from focus_time_app.focus_time_calendar.caching_calendar_adapter import CachingCalendarAdapter
+from focus_time_app.focus_time_calendar import http_trace
+from focus_time_app.focus_time_calendar.circuit_breaker import ConnectivityCircuitBreaker, CalendarUnreachableError, \
+    is_connectivity_error
+from focus_time_app.focus_time_calendar.event import FocusTimeEvent
+from focus_time_app.focus_time_calendar.http_transport import get_transport_statistics
+from focus_time_app.focus_time_calendar.impl.keyring_credentials_store import KeyringCredentialsStore
+from focus_time_app.focus_time_calendar.utils import get_next_focustime_transition, \
+    compute_calendar_query_start_and_stop
+from focus_time_app.utils.deadline import Deadline
+from focus_time_app.utils.perf import record_run, PERF_HISTORY_FILE_NAME
+
+
+class DaemonCommand:
+    """
+    Long-running alternative to having the OS-specific background scheduler start the "sync" command once per minute.
+    The configuration and the calendar adapter (including its HTTP sessions and tokens) are loaded once and kept
+    alive between the individual synchronizations. The configuration is reloaded whenever the configuration file
+    changes on disk.
+
+    The events are refreshed from the calendar server every <interval_seconds> seconds. In between, the daemon
+    wakes up exactly when a known focus time event starts or ends, so that the start/stop commands are run on time
+    (rather than up to <interval_seconds> seconds late). On these wakeups, the daemon uses the events from the local
+    EventStore, which also contains the changes that CLI commands (such as "start" or "stop") made since the last
+    refresh.
+    """
+
+    def __init__(self, interval_seconds: int):
+        self._interval_seconds = interval_seconds
+        self._configuration: Optional[ConfigurationV1] = None
+        self._calendar_adapter: Optional[CachingCalendarAdapter] = None
+        self._circuit_breaker: Optional[ConnectivityCircuitBreaker] = None
+        self._configuration_mtime_ns: Optional[int] = None
+        self._adapter_is_connected = False
+        # Whether the most recent synchronization failed, in which case the connection is fully verified (rather than
+        # just prepared) when reconnecting
+        self._last_sync_failed = False
+        # The events retrieved by the most recent refresh
+        self._events: Optional[list[FocusTimeEvent]] = None
+        self._logger = logging.getLogger(type(self).__name__)
+
+    def run(self):
+        self._logger.info(f"Starting the sync daemon, refreshing the events every {self._interval_seconds} seconds")
+        next_refresh_time = datetime.now(ZoneInfo('UTC'))
+        while True:
+            refresh = datetime.now(ZoneInfo('UTC')) >= next_refresh_time
+            if refresh:
+                next_refresh_time = datetime.now(ZoneInfo('UTC')) + timedelta(seconds=self._interval_seconds)
+            try:
+                with record_run("daemon", Persistence.get_storage_directory() / PERF_HISTORY_FILE_NAME):
+                    self._run_once(refresh)
+                self._last_sync_failed = False
+            except CalendarUnreachableError as e:
+                # Note: the known events are kept, so that focus times still start and end on time while offline
+                self._logger.info(f"Skipping the refresh of the events: {e}")
+            except Exception:
+                self._logger.exception("Synchronization failed, will retry in the next iteration")
+                # The calendar server might have closed our session, or the token might have been revoked (e.g.
+                # because a CLI command refreshed it in the meantime), thus the credentials are reloaded, too
+                self._adapter_is_connected = False
+                KeyringCredentialsStore.clear_process_cache()
+                self._last_sync_failed = True
+                self._events = None
+
+            wakeup_time = next_refresh_time
+            if self._events and (next_transition := get_next_focustime_transition(self._events)):
+                wakeup_time = min(wakeup_time, next_transition)
+            self._sleep_until(wakeup_time)
+
+    def _run_once(self, refresh: bool):
+        if not self._reload_configuration_if_changed():
+            return
+
+        deadline = Deadline.from_seconds(self._configuration.sync_deadline_seconds)
+        self._calendar_adapter.set_deadline(deadline)
+
+        refreshed = refresh or self._events is None
+        if refreshed:
+            self._circuit_breaker.before_attempt()
+            try:
+                if not self._adapter_is_connected:
+                    if self._last_sync_failed:
+                        self._calendar_adapter.check_connection_and_credentials()
+                    else:
+                        self._calendar_adapter.prepare_connection()
+                    self._adapter_is_connected = True
+                self._events = self._calendar_adapter.get_events()
+            except Exception as e:
+                if is_connectivity_error(e):
+                    self._circuit_breaker.record_failure()
+                raise
+            self._circuit_breaker.record_success()
+            self._logger.debug(f"HTTP transport statistics: {get_transport_statistics()}")
+            http_trace.log_summary(self._logger)
+
+        # The daemon holds a dedicated lock for its entire lifetime (see main.py), but also needs to acquire the
+        # regular lock for each synchronization, so that it does not interfere with CLI commands (e.g. "start")
+        # the user runs in the meantime
+        try:
+            sync_lock = SingleInstance()
+        except SingleInstanceException:
+            self._logger.info("Another instance of the Focus time app is running, skipping this synchronization")
+            return
+
+        try:
+            if not refreshed:
+                # Note: CLI commands (e.g. "start" or "stop") may have changed the events since the last refresh, which
+                # they recorded in the EventStore (while holding the lock)
+                from_date, to_date = compute_calendar_query_start_and_stop(self._configuration)
+                self._events = self._calendar_adapter.event_store.get_events(from_date, to_date)
+            SyncCommand(self._configuration, self._calendar_adapter, deadline).run(events=self._events)
+        finally:
+            del sync_lock
+
+        if refresh:
+            # Note: refreshing the credentials only after the synchronization keeps the refresh off the critical path
+            # of the synchronization at the start or end of the next focus time
+            try:
+                self._calendar_adapter.refresh_credentials_if_expiring()
+            except Exception:
+                self._logger.warning("Unable to refresh the credentials ahead of their expiry", exc_info=True)
+
+    def _reload_configuration_if_changed(self) -> bool:
+        """
+        (Re-)loads the configuration and calendar adapter, if the configuration file changed since the last call.
+        Returns False if no valid configuration exists (yet), True otherwise.
+        """
+        try:
+            mtime_ns = Persistence.get_config_file_path().stat().st_mtime_ns
+        except FileNotFoundError:
+            self._logger.warning("There is no configuration file (yet), skipping the synchronization")
+            self._configuration = self._calendar_adapter = self._circuit_breaker = self._configuration_mtime_ns = None
+            self._events = None
+            return False
+
+        if mtime_ns != self._configuration_mtime_ns:
+            self._logger.info("Loading the (changed) configuration")
+            self._configuration = Persistence.load_configuration()
+            # Note: the "configure" command may also have changed the credentials
+            KeyringCredentialsStore.clear_process_cache()
+            self._calendar_adapter = create_caching_calendar_adapter(self._configuration)
+            self._circuit_breaker = ConnectivityCircuitBreaker(self._calendar_adapter.get_server_url(),
+                                                               self._configuration.connectivity_failure_threshold)
+            self._configuration_mtime_ns = mtime_ns
+            self._adapter_is_connected = False
+            self._events = None
+
+        return True
+
+    @staticmethod
+    def _sleep_until(wakeup_time: datetime):
+        # Note: time.sleep() may return slightly early on some platforms, thus we re-check the remaining time
+        while (remaining_seconds := (wakeup_time - datetime.now(ZoneInfo('UTC'))).total_seconds()) > 0:
+            time.sleep(remaining_seconds)
@@ -5,8 +5,11 @@ from focus_time_app.command_execution import CommandExecutorImpl
 
 
 class DoctorCommand:
+    def __init__(self, use_sync_daemon: bool):
+        self._use_sync_daemon = use_sync_daemon
+
     def run(self):
-        BackgroundSchedulerImpl.install_or_repair_background_scheduler()
+        BackgroundSchedulerImpl.install_or_repair_background_scheduler(run_as_daemon=self._use_sync_daemon)
         typer.echo("Background scheduler has been reinstalled")
 
         CommandExecutorImpl.uninstall_dnd_helpers()
@@ -0,0 +1,34 @@
+from pathlib import Path
+from typing import Optional
+
+import typer
+
+from focus_time_app.utils.perf import load_history, summarize_phases, percentile
+
+
+class PerfCommand:
+    """
+    Prints the 50th, 95th and 99th percentile of the duration of each phase (e.g. loading the configuration, or
+    retrieving the events), over the most recent runs of the "sync", "start", "stop" and "daemon" commands.
+    """
+
+    def __init__(self, history_file_path: Path, max_runs: int, command: Optional[str] = None):
+        self._history_file_path = history_file_path
+        self._max_runs = max_runs
+        self._command = command
+
+    def run(self):
+        runs = load_history(self._history_file_path, self._max_runs, self._command)
+        if not runs:
+            typer.echo("No runs have been recorded yet")
+            return
+
+        failed_runs = sum(1 for run in runs if not run.succeeded)
+        typer.echo(f"Durations (in milliseconds) of the last {len(runs)} runs"
+                   f"{f' of the {self._command!r} command' if self._command else ''} ({failed_runs} failed):")
+        typer.echo(f"{'Phase':<22}{'Runs':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for phase, durations in summarize_phases(runs).items():
+            typer.echo(f"{phase:<22}{len(durations):>6}" +
+                       "".join(f"{percentile(durations, p):>10.1f}" for p in (50, 95, 99)) +
+                       f"{durations[-1]:>10.1f}")
+        typer.echo("Note: the phases may overlap, e.g. credential_load is part of connection_check")
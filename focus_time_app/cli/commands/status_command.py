@@ -0,0 +1,41 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import typer
+
+from focus_time_app.focus_time_calendar.event_store import EventStore
+from focus_time_app.utils import human_readable_timedelta
+
+STATUS_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+
+class StatusCommand:
+    """
+    Prints the active and the next focus time event, as stored in the local EventStore. Does not contact the calendar
+    server.
+    """
+
+    def __init__(self, event_store: EventStore):
+        self._event_store = event_store
+
+    def run(self):
+        now = datetime.now(ZoneInfo('UTC'))
+
+        if active_event := self._event_store.get_active_event(now):
+            typer.echo(f"Focus time is active until {active_event.end.astimezone().strftime(STATUS_TIME_FORMAT)} "
+                       f"(time remaining: {human_readable_timedelta(active_event.end - now)})")
+        else:
+            typer.echo("No focus time is active")
+
+        if next_event := self._event_store.get_next_event(now):
+            typer.echo(f"Next focus time: {next_event.start.astimezone().strftime(STATUS_TIME_FORMAT)} - "
+                       f"{next_event.end.astimezone().strftime(STATUS_TIME_FORMAT)}")
+        else:
+            typer.echo("No upcoming focus time is known")
+
+        if last_refresh_time := self._event_store.get_last_refresh_time():
+            typer.echo(f"Events were last retrieved from your calendar at "
+                       f"{last_refresh_time.astimezone().strftime(STATUS_TIME_FORMAT)} "
+                       f"({human_readable_timedelta(now - last_refresh_time)} ago)")
+        else:
+            typer.echo("Events have not been retrieved from your calendar yet, run the 'sync' command first")
@@ -2,6 +2,7 @@ import logging
 import time
 from _zoneinfo import ZoneInfo
 from datetime import datetime
+from typing import Optional
 
 import typer
 
@@ -9,23 +10,39 @@ from focus_time_app.command_execution import CommandExecutorImpl
 from focus_time_app.configuration.configuration import ConfigurationV1
 from focus_time_app.configuration.persistence import Persistence
 from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter
-from focus_time_app.focus_time_calendar.event import FocusTimeEvent
+from focus_time_app.focus_time_calendar.event import FocusTimeEvent, FocusTimeEventUpdate
 from focus_time_app.focus_time_calendar.utils import get_active_focustime_event
 from focus_time_app.utils import human_readable_timedelta
+from focus_time_app.utils.deadline import Deadline
+from focus_time_app.utils.perf import span, PHASE_GET_EVENTS, PHASE_REMINDER_ADJUSTMENT, PHASE_COMMAND_EXECUTION, \
+    PHASE_NOTIFICATION
 from focus_time_app.utils.os_notification import OsNativeNotificationImpl
 
 NOTIFICATION_TIME_FORMAT = "%H:%M"
 
 
 class SyncCommand:
-    def __init__(self, configuration: ConfigurationV1, calendar_adapter: AbstractCalendarAdapter):
+    def __init__(self, configuration: ConfigurationV1, calendar_adapter: AbstractCalendarAdapter,
+                 deadline: Optional[Deadline] = None):
+        """
+        :param deadline: optional deadline by which the start or stop commands must have finished. Note that the
+            deadline of the calendar requests is set separately, see AbstractCalendarAdapter.set_deadline()
+        """
         self._calendar_adapter = calendar_adapter
         self._configuration = configuration
+        self._deadline = deadline
         self._logger = logging.getLogger(type(self).__name__)
 
-    def run(self):
-        events = self._calendar_adapter.get_events()
-        self._adjust_reminder_time_if_necessary(events)
+    def run(self, events: Optional[list[FocusTimeEvent]] = None):
+        """
+        Synchronizes the focus time state with the provided events, or (if None) with the events retrieved from the
+        calendar adapter.
+        """
+        if events is None:
+            with span(PHASE_GET_EVENTS):
+                events = self._calendar_adapter.get_events()
+        with span(PHASE_REMINDER_ADJUSTMENT):
+            self._adjust_reminder_time_if_necessary(events)
         marker_file_exists = Persistence.ongoing_focustime_markerfile_exists()
         if active_focustime := get_active_focustime_event(events):
             if marker_file_exists:
@@ -38,15 +55,17 @@ class SyncCommand:
                     remaining_minutes = human_readable_timedelta(active_focustime.end - datetime.now(ZoneInfo('UTC')))
                     message = f"Time remaining: {remaining_minutes} " \
                               f"(until {active_focustime.end.astimezone().strftime(NOTIFICATION_TIME_FORMAT)})"
-                    OsNativeNotificationImpl.send_notification(title, message)
+                    with span(PHASE_NOTIFICATION):
+                        OsNativeNotificationImpl.send_notification(title, message)
 
                 msg = f"Found a new focus time (from {active_focustime.start} to {active_focustime.end}), " \
                       f"calling start command(s) ..."
                 typer.echo(msg)
                 self._logger.info(msg)
                 try:
-                    CommandExecutorImpl.execute_commands(self._configuration.start_commands,
-                                                         self._configuration.dnd_profile_name)
+                    with span(PHASE_COMMAND_EXECUTION):
+                        CommandExecutorImpl.execute_commands(self._configuration.start_commands,
+                                                             self._configuration.dnd_profile_name, self._deadline)
                 finally:
                     Persistence.set_ongoing_focustime(ongoing=True)
 
@@ -56,13 +75,15 @@ class SyncCommand:
                 typer.echo(msg)
                 self._logger.info(msg)
                 try:
-                    CommandExecutorImpl.execute_commands(self._configuration.stop_commands,
-                                                         self._configuration.dnd_profile_name)
+                    with span(PHASE_COMMAND_EXECUTION):
+                        CommandExecutorImpl.execute_commands(self._configuration.stop_commands,
+                                                             self._configuration.dnd_profile_name, self._deadline)
 
                     if self._configuration.show_notification:
                         title = "Focus time has ended"
                         message = "Your configured stop-commands have been called"
-                        OsNativeNotificationImpl.send_notification(title, message)
+                        with span(PHASE_NOTIFICATION):
+                            OsNativeNotificationImpl.send_notification(title, message)
                 finally:
                     Persistence.set_ongoing_focustime(ongoing=False)
             else:
@@ -73,9 +94,16 @@ class SyncCommand:
     def _adjust_reminder_time_if_necessary(self, events: list[FocusTimeEvent]):
         configured_reminder_time = self._configuration.event_reminder_time_minutes \
             if self._configuration.set_event_reminder else 0
-        for event in events:
-            if configured_reminder_time != event.reminder_in_minutes:
-                self._logger.debug(f"Adjusting reminder time of existing focus time event "
-                                   f"(start={event.start}, end={event.end}) from {event.reminder_in_minutes} "
-                                   f"to {configured_reminder_time} minutes")
-                self._calendar_adapter.update_event(event, reminder_in_minutes=configured_reminder_time)
+        events_to_update = [event for event in events if configured_reminder_time != event.reminder_in_minutes]
+        for event in events_to_update:
+            self._logger.debug(f"Adjusting reminder time of existing focus time event "
+                               f"(start={event.start}, end={event.end}) from {event.reminder_in_minutes} "
+                               f"to {configured_reminder_time} minutes")
+        if not events_to_update:
+            return
+
+        self._calendar_adapter.update_events([FocusTimeEventUpdate(event, reminder_in_minutes=configured_reminder_time)
+                                              for event in events_to_update])
+        # Avoids adjusting the reminders again, should the caller pass the same events to run() again
+        for event in events_to_update:
+            event.reminder_in_minutes = configured_reminder_time
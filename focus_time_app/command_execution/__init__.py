@@ -13,5 +13,5 @@ elif sys.platform == "darwin":
     from focus_time_app.command_execution.impl.macos_command_executor import MacOsCommandExecutor
 
     CommandExecutorImpl = MacOsCommandExecutor()
-else:
-    raise NotImplementedError
+# Note: on other platforms (which the app does not support, see check_os_compatibility()), CommandExecutorImpl remains
+# None, so that this package can still be imported, e.g. by the hermetic tests, which replace it with a fake
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
+
+from focus_time_app.utils.deadline import Deadline
 
 
 class CommandExecutorConstants:
@@ -18,9 +20,11 @@ class AbstractCommandExecutor(ABC):
     """
 
     @abstractmethod
-    def execute_commands(self, commands: List[str], dnd_profile_name: str):
+    def execute_commands(self, commands: List[str], dnd_profile_name: str, deadline: Optional[Deadline] = None):
         """
-        Executes all specified shell commands, using subprocess.check_call(), raising if something goes wrong.
+        Executes all specified shell commands, using subprocess.check_call(), raising if something goes wrong. If a
+        deadline is provided, commands that are still running when it expires are killed (raising a
+        subprocess.TimeoutExpired error), and no further commands are started.
 
         If a command matches CommandExecutorConstants.DND_START_COMMAND/DND_STOP_COMMAND, then instead the
         operating system's underlying Do-Not-Disturb / Focus-Mode mechanism is (de)activated.
@@ -28,6 +32,7 @@ class AbstractCommandExecutor(ABC):
         :param commands: the commands to execute, e.g. "echo test"
         :param dnd_profile_name: the OS-specific name of the Focus-Mode/DND profile,
             e.g. WINDOWS_FOCUS_ASSIST_PRIORITY_ONLY_PROFILE
+        :param deadline: optional deadline by which all commands must have finished
         """
 
     @abstractmethod
@@ -53,7 +58,8 @@ class AbstractCommandExecutor(ABC):
         Returns whether any DND / Focus Mode is currently active.
         """
 
-    def set_dnd_active(self, active: bool, dnd_profile_name: str):
+    def set_dnd_active(self, active: bool, dnd_profile_name: str, timeout: Optional[float] = None):
         """
-        Enables the requested DND profile (if active=True), or disables the DND mode.
+        Enables the requested DND profile (if active=True), or disables the DND mode. The optional timeout (in seconds)
+        limits how long the underlying OS-specific command may run.
         """
@@ -2,25 +2,27 @@ import subprocess
 import sys
 import time
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 import typer
 
 from focus_time_app.command_execution.abstract_command_executor import AbstractCommandExecutor
 from focus_time_app.command_execution.abstract_command_executor import CommandExecutorConstants
 from focus_time_app.utils import is_production_environment
+from focus_time_app.utils.deadline import Deadline
 
 
 class MacOsCommandExecutor(AbstractCommandExecutor):
 
-    def execute_commands(self, commands: List[str], dnd_profile_name: str):
+    def execute_commands(self, commands: List[str], dnd_profile_name: str, deadline: Optional[Deadline] = None):
         for command in commands:
+            timeout = deadline.get_timeout() if deadline else None
             if command == CommandExecutorConstants.DND_START_COMMAND:
-                self.set_dnd_active(active=True, dnd_profile_name="unused")
+                self.set_dnd_active(active=True, dnd_profile_name="unused", timeout=timeout)
             elif command == CommandExecutorConstants.DND_STOP_COMMAND:
-                self.set_dnd_active(active=False, dnd_profile_name="unused")
+                self.set_dnd_active(active=False, dnd_profile_name="unused", timeout=timeout)
             else:
-                subprocess.check_call(command, shell=True)
+                subprocess.check_call(command, shell=True, timeout=timeout)
 
     def install_dnd_helpers(self):
         while not self.is_dnd_helper_installed():
@@ -31,10 +33,10 @@ class MacOsCommandExecutor(AbstractCommandExecutor):
                 typer.prompt("Could not detect that the shortcut has been installed. Press Enter to try again.",
                              default='', prompt_suffix='\n')
 
-    def set_dnd_active(self, active: bool, dnd_profile_name: str):
+    def set_dnd_active(self, active: bool, dnd_profile_name: str, timeout: Optional[float] = None):
         arg = "on" if active else "off"
         subprocess.check_call(f"shortcuts run '{CommandExecutorConstants.MACOS_FOCUS_MODE_SHORTCUT_NAME}' <<< {arg}",
-                              shell=True)
+                              shell=True, timeout=timeout)
 
     def is_dnd_helper_installed(self) -> bool:
         output_bytes = subprocess.check_output(["/usr/bin/shortcuts", "list"], shell=True)
@@ -1,26 +1,28 @@
 import subprocess
 import sys
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from focus_time_app.command_execution.abstract_command_executor import AbstractCommandExecutor
 from focus_time_app.command_execution.abstract_command_executor import CommandExecutorConstants
 from focus_time_app.utils import is_production_environment
+from focus_time_app.utils.deadline import Deadline
 
 
 class WindowsCommandExecutor(AbstractCommandExecutor):
     DND_HELPER_BINARY_NAME = "windows-dnd.exe"
 
-    def execute_commands(self, commands: List[str], dnd_profile_name: str):
+    def execute_commands(self, commands: List[str], dnd_profile_name: str, deadline: Optional[Deadline] = None):
         self._validate_dnd_profile_name(dnd_profile_name)
 
         for command in commands:
+            timeout = deadline.get_timeout() if deadline else None
             if command == CommandExecutorConstants.DND_START_COMMAND:
-                self.set_dnd_active(active=True, dnd_profile_name=dnd_profile_name)
+                self.set_dnd_active(active=True, dnd_profile_name=dnd_profile_name, timeout=timeout)
             elif command == CommandExecutorConstants.DND_STOP_COMMAND:
-                self.set_dnd_active(active=False, dnd_profile_name=dnd_profile_name)
+                self.set_dnd_active(active=False, dnd_profile_name=dnd_profile_name, timeout=timeout)
             else:
-                subprocess.check_call(command, shell=True)
+                subprocess.check_call(command, shell=True, timeout=timeout)
 
     def install_dnd_helpers(self):
         pass  # Nothing to do
@@ -37,16 +39,16 @@ class WindowsCommandExecutor(AbstractCommandExecutor):
             raise RuntimeError(f"Unexpected reported Focus assist mode: {output}")
         return output in ["priority-only", "alarms-only"]
 
-    def set_dnd_active(self, active: bool, dnd_profile_name: str):
+    def set_dnd_active(self, active: bool, dnd_profile_name: str, timeout: Optional[float] = None):
         if active:
             self._validate_dnd_profile_name(dnd_profile_name)
             if dnd_profile_name == CommandExecutorConstants.WINDOWS_FOCUS_ASSIST_PRIORITY_ONLY_PROFILE:
                 dnd_command = "set-priority-only"
             else:
                 dnd_command = "set-alarms-only"
-            self._run_dnd_helper_with_arg(dnd_command)
+            self._run_dnd_helper_with_arg(dnd_command, timeout=timeout)
         else:
-            self._run_dnd_helper_with_arg("set-off")
+            self._run_dnd_helper_with_arg("set-off", timeout=timeout)
 
     @staticmethod
     def _validate_dnd_profile_name(dnd_profile_name):
@@ -57,9 +59,9 @@ class WindowsCommandExecutor(AbstractCommandExecutor):
                              f"'{CommandExecutorConstants.WINDOWS_FOCUS_ASSIST_PRIORITY_ONLY_PROFILE}' are supported")
 
     @staticmethod
-    def _run_dnd_helper_with_arg(arg: str) -> str:
+    def _run_dnd_helper_with_arg(arg: str, timeout: Optional[float] = None) -> str:
         if is_production_environment():
             path = str(Path(getattr(sys, "_MEIPASS")) / WindowsCommandExecutor.DND_HELPER_BINARY_NAME)
         else:
             path = str(Path(__file__).parent.parent.parent.parent / WindowsCommandExecutor.DND_HELPER_BINARY_NAME)
-        return subprocess.check_output([path, arg]).decode("utf-8")
+        return subprocess.check_output([path, arg], timeout=timeout).decode("utf-8")
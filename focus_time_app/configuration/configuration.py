@@ -1,3 +1,4 @@
+import functools
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 
@@ -16,6 +17,8 @@ class Outlook365ConfigurationV1:
     client_id: UUID
     tenant_id: Optional[UUID]
     calendar_name: str = field(metadata={"validate": marshmallow.validate.Length(min=1)})
+    # Whether to retrieve only the changed events (using Microsoft Graph delta queries), instead of querying all events
+    use_delta_queries: bool = field(default=False)
 
 
 @dataclass
@@ -35,8 +38,38 @@ class ConfigurationV1:
     set_event_reminder: bool
     event_reminder_time_minutes: int = field(metadata={"validate": marshmallow.validate.Range(min=0)})
     show_notification: bool = field(default=False)
+    use_sync_daemon: bool = field(default=False)
+    # Number of seconds for which the locally stored events (see EventStore) are used instead of querying the calendar
+    # server again. 0 means that the calendar server is always queried.
+    event_cache_max_age_seconds: int = field(default=0, metadata={"validate": marshmallow.validate.Range(min=0)})
+    # Number of seconds after which a sync run (including the start/stop commands) is aborted, so that a stalled
+    # calendar server or command cannot block the subsequent runs. 0 means that there is no time limit.
+    sync_deadline_seconds: int = field(default=45, metadata={"validate": marshmallow.validate.Range(min=0)})
+    # Maximum number of keep-alive connections that are kept open to the calendar server
+    http_connection_pool_size: int = field(default=10, metadata={"validate": marshmallow.validate.Range(min=1)})
+    # Maximum number of requests per second that the app sends to the calendar server. 0 means that there is no limit.
+    http_max_requests_per_second: int = field(default=10, metadata={"validate": marshmallow.validate.Range(min=0)})
+    # Number of consecutive failed attempts to reach the calendar server after which further attempts are skipped for a
+    # (growing) cool-down period, so that synchronizations fail fast while offline. 0 disables this circuit breaker.
+    connectivity_failure_threshold: int = field(default=3, metadata={"validate": marshmallow.validate.Range(min=0)})
+    # Number of minutes before the expiry of the calendar's access token (e.g. of Outlook 365) within which the token is
+    # refreshed at the end of a synchronization, so that the next synchronization does not have to refresh it before
+    # retrieving the events. 0 means that the token is only refreshed once it has expired.
+    token_refresh_margin_minutes: int = field(default=10, metadata={"validate": marshmallow.validate.Range(min=0)})
+    # Whether to additionally cache the calendar credentials in an encrypted file (whose key is stored in the OS
+    # credentials manager), which reduces the number of slow calls of the OS credentials manager
+    cache_credentials_on_disk: bool = field(default=False)
     adapter_configuration: Optional[Dict[str, Any]] = field(default=None)
     version: int = field(default=1)
 
 
-ConfigurationV1Schema = marshmallow_dataclass.class_schema(ConfigurationV1)
+@functools.cache
+def get_configuration_schema(configuration_class: type) -> marshmallow.Schema:
+    """
+    Returns the marshmallow schema (instance) for the provided configuration dataclass, e.g. ConfigurationV1 or
+    CaldavConfigurationV1.
+
+    Note: the schemas are built lazily (and only once), because building them is slow, and not necessary if the
+    configuration is loaded from the cache (see Persistence.load_configuration()).
+    """
+    return marshmallow_dataclass.class_schema(configuration_class)()
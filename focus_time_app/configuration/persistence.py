@@ -1,36 +1,60 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import os
 from pathlib import Path
+from typing import Optional
 
 import typer
-import yaml
 
-from focus_time_app.configuration.configuration import ConfigurationV1, ConfigurationV1Schema
+from focus_time_app.configuration.configuration import ConfigurationV1, get_configuration_schema
+from focus_time_app.focus_time_calendar.event import CalendarType
 from focus_time_app.utils import get_environment_suffix
 
-configuration_v1_schema = ConfigurationV1Schema()
-
 
 class Persistence:
     APP_NAME = "FocusTimeApp"
     MARKER_FILE_NAME = "start_command_was_recently_called"
     CONFIG_FILE_NAME = "configuration.yaml"
+    CONFIG_CACHE_FILE_NAME = "configuration-cache.json"
 
     @staticmethod
     def load_configuration() -> ConfigurationV1:
-        with Persistence.get_config_file_path().open("rt", encoding="utf-8") as f:
-            config_as_dict: dict = yaml.safe_load(f)
+        """
+        Loads and validates the configuration file. The validated configuration is cached in a JSON file (keyed by the
+        modification time, size and hash of the configuration file), so that subsequent calls do not have to parse the
+        YAML file and build the marshmallow schema again, as long as the configuration file does not change.
+        """
+        config_file_path = Persistence.get_config_file_path()
+        config_bytes = config_file_path.read_bytes()
+        config_stat = config_file_path.stat()
+        cache_key = {"mtime_ns": config_stat.st_mtime_ns, "size": config_stat.st_size,
+                     "sha256": hashlib.sha256(config_bytes).hexdigest(),
+                     "fingerprint": Persistence._get_configuration_class_fingerprint()}
+        if configuration := Persistence._load_cached_configuration(cache_key):
+            return configuration
+
+        # Note: yaml is imported lazily, because importing it is slow, and not necessary if the cache is used
+        import yaml
+        config_as_dict: dict = yaml.load(config_bytes, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
 
         if v := config_as_dict["version"] != 1:
             raise ValueError(f"Detected invalid version {v} of the configuration file. Supported versions are: 1")
-        configuration = configuration_v1_schema.load(config_as_dict)
+        configuration = get_configuration_schema(ConfigurationV1).load(config_as_dict)
         # Note: once the configuration schema evolves, we can do configuration migrations here
+        Persistence._store_cached_configuration(cache_key, configuration)
         return configuration
 
     @staticmethod
     def store_configuration(configuration: ConfigurationV1):
-        config_as_dict = configuration_v1_schema.dump(configuration)
+        import yaml
+
+        config_as_dict = get_configuration_schema(ConfigurationV1).dump(configuration)
         Persistence.get_config_file_path().parent.mkdir(parents=True, exist_ok=True)
         with Persistence.get_config_file_path().open("wt", encoding="utf-8") as f:
             yaml.dump(config_as_dict, f)
+        Persistence._get_config_cache_file_path().unlink(missing_ok=True)
 
     @staticmethod
     def ongoing_focustime_markerfile_exists() -> bool:
@@ -55,3 +79,46 @@ class Persistence:
     @staticmethod
     def _get_marker_file_path() -> Path:
         return Persistence.get_storage_directory() / Persistence.MARKER_FILE_NAME
+
+    @staticmethod
+    def _get_config_cache_file_path() -> Path:
+        return Persistence.get_storage_directory() / Persistence.CONFIG_CACHE_FILE_NAME
+
+    @staticmethod
+    def _get_configuration_class_fingerprint() -> str:
+        """
+        Returns a string that changes whenever the fields of ConfigurationV1 (or their defaults) change, e.g. due to an
+        update of this app, which invalidates the cached configuration.
+        """
+        return repr([(f.name, None if f.default is dataclasses.MISSING else f.default)
+                     for f in dataclasses.fields(ConfigurationV1)])
+
+    @staticmethod
+    def _load_cached_configuration(cache_key: dict) -> Optional[ConfigurationV1]:
+        try:
+            cache = json.loads(Persistence._get_config_cache_file_path().read_text(encoding="utf-8"))
+            if cache["key"] != cache_key:
+                return None
+            config_as_dict = cache["configuration"]
+            config_as_dict["calendar_type"] = CalendarType[config_as_dict["calendar_type"]]
+            return ConfigurationV1(**config_as_dict)
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError, KeyError) as e:
+            logging.getLogger("Persistence").warning(f"Ignoring the invalid configuration cache: {e}")
+            return None
+
+    @staticmethod
+    def _store_cached_configuration(cache_key: dict, configuration: ConfigurationV1):
+        cache_file_path = Persistence._get_config_cache_file_path()
+        config_as_dict = dataclasses.asdict(configuration)
+        config_as_dict["calendar_type"] = configuration.calendar_type.name
+        # Note: writing to a temporary file first avoids that concurrent invocations read a partially written cache
+        temp_file_path = cache_file_path.with_name(f"{cache_file_path.name}.{os.getpid()}.tmp")
+        try:
+            temp_file_path.write_text(json.dumps({"key": cache_key, "configuration": config_as_dict}),
+                                      encoding="utf-8")
+            os.replace(temp_file_path, cache_file_path)
+        except OSError as e:
+            logging.getLogger("Persistence").warning(f"Unable to write the configuration cache: {e}")
+            temp_file_path.unlink(missing_ok=True)
@@ -2,7 +2,14 @@ from abc import ABC, abstractmethod
 from datetime import datetime
 from typing import Optional, Dict, Any
 
-from focus_time_app.focus_time_calendar.event import FocusTimeEvent
+from focus_time_app.focus_time_calendar.event import FocusTimeEvent, FocusTimeEventUpdate
+from focus_time_app.utils.deadline import Deadline
+
+
+class CredentialsError(Exception):
+    """
+    Raised by calendar adapters if the stored credentials are missing or invalid (e.g. could not be decoded).
+    """
 
 
 class AbstractCalendarAdapter(ABC):
@@ -30,6 +37,43 @@ class AbstractCalendarAdapter(ABC):
         still valid. Raises an error if something goes wrong.
         """
 
+    def set_deadline(self, deadline: Optional[Deadline]):
+        """
+        Sets the deadline by which all subsequent calendar operations must have finished (None removes the deadline).
+        Adapters limit the timeouts of their requests to the remaining time, and raise a DeadlineExceededError instead
+        of sending requests once the deadline has expired.
+
+        The default implementation ignores the deadline.
+        """
+
+    def prepare_connection(self):
+        """
+        Prepares the adapter for the calendar operations (e.g. get_events()), by loading the cached credentials and
+        setting up the client, ideally WITHOUT contacting the calendar server. Unlike
+        check_connection_and_credentials(), it does not verify that the server accepts the credentials, which is left
+        to the first actual calendar operation. Raises an error if something goes wrong.
+
+        Adapters should override this method, the default implementation just calls check_connection_and_credentials().
+        """
+        self.check_connection_and_credentials()
+
+    def refresh_credentials_if_expiring(self):
+        """
+        Refreshes the cached credentials (e.g. an OAuth access token) if they expire within the configured
+        <token_refresh_margin_minutes>, so that the next calendar operation (which might be time-critical, e.g. at the
+        start of a focus time) does not have to refresh them first. Callers should call this method only once the
+        time-critical work is done, e.g. at the end of a synchronization. Raises an error if something goes wrong.
+
+        The default implementation does nothing, which is suitable for credentials that do not expire.
+        """
+
+    def get_server_url(self) -> Optional[str]:
+        """
+        Returns the URL of the calendar server, which is used to cheaply probe whether the server is reachable at all
+        (see ConnectivityCircuitBreaker), or None if it is not known (yet).
+        """
+        return None
+
     @abstractmethod
     def get_events(self, date_range: Optional[tuple[datetime, datetime]] = None) -> list[FocusTimeEvent]:
         """
@@ -64,3 +108,29 @@ class AbstractCalendarAdapter(ABC):
 
         :param event: the event to delete
         """
+
+    def create_events(self, date_ranges: list[tuple[datetime, datetime]]) -> list[FocusTimeEvent]:
+        """
+        Creates several focus time calendar events (see create_event()), one for each (from_date, to_date) tuple.
+        Adapters should override this method if their calendar server supports bulk operations.
+
+        :return: the created events, in the same order as the date_ranges
+        """
+        return [self.create_event(from_date, to_date) for from_date, to_date in date_ranges]
+
+    def update_events(self, updates: list[FocusTimeEventUpdate]):
+        """
+        Updates several existing focus time calendar events (see update_event()). Adapters should override this method
+        if their calendar server supports bulk operations.
+        """
+        for update in updates:
+            self.update_event(update.event, from_date=update.from_date, to_date=update.to_date,
+                              reminder_in_minutes=update.reminder_in_minutes)
+
+    def remove_events(self, events: list[FocusTimeEvent]):
+        """
+        Deletes several existing focus time calendar events (see remove_event()). Adapters should override this method
+        if their calendar server supports bulk operations.
+        """
+        for event in events:
+            self.remove_event(event)
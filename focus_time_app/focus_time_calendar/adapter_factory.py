@@ -1,12 +1,48 @@
+from typing import Callable, Dict, Type, Optional
+
 from focus_time_app.configuration.configuration import ConfigurationV1
 from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter
+from focus_time_app.focus_time_calendar.caching_calendar_adapter import CachingCalendarAdapter
 from focus_time_app.focus_time_calendar.event import CalendarType
-from focus_time_app.focus_time_calendar.impl.outlook365_calendar_adapter import Outlook365CalendarAdapter
-from focus_time_app.focus_time_calendar.impl.caldav_calendar_adapter import CaldavCalendarAdapter
+from focus_time_app.focus_time_calendar.event_store import EventStore
+
+
+def _load_outlook365_calendar_adapter_class() -> Type[AbstractCalendarAdapter]:
+    from focus_time_app.focus_time_calendar.impl.outlook365_calendar_adapter import Outlook365CalendarAdapter
+    return Outlook365CalendarAdapter
+
+
+def _load_caldav_calendar_adapter_class() -> Type[AbstractCalendarAdapter]:
+    from focus_time_app.focus_time_calendar.impl.caldav_calendar_adapter import CaldavCalendarAdapter
+    return CaldavCalendarAdapter
+
+
+# Registry of functions that import (and return) the adapter implementation of a calendar type. Importing lazily avoids
+# that every CLI invocation pays for importing the (slow-to-import) libraries of ALL calendar providers (e.g. O365, or
+# caldav+lxml), even though only the library of the configured calendar type is needed.
+# Note: we deliberately use regular import statements (instead of importlib), so that PyInstaller detects the modules.
+_ADAPTER_CLASS_LOADERS: Dict[CalendarType, Callable[[], Type[AbstractCalendarAdapter]]] = {
+    CalendarType.Outlook365: _load_outlook365_calendar_adapter_class,
+    CalendarType.CalDAV: _load_caldav_calendar_adapter_class,
+}
+
+
+def create_calendar_adapter(configuration: ConfigurationV1,
+                            event_store: Optional[EventStore] = None) -> AbstractCalendarAdapter:
+    """
+    Creates the calendar adapter for the configured calendar type. If an EventStore is provided, the adapter may use
+    it to persist synchronization state (e.g. sync tokens) between invocations of the app.
+    """
+    adapter_class_loader = _ADAPTER_CLASS_LOADERS.get(configuration.calendar_type)
+    if adapter_class_loader is None:
+        raise ValueError(f"Unsupported calendar type {configuration.calendar_type}")
+    adapter_class = adapter_class_loader()
+    return adapter_class(configuration=configuration, event_store=event_store)
 
 
-def create_calendar_adapter(configuration: ConfigurationV1) -> AbstractCalendarAdapter:
-    if configuration.calendar_type is CalendarType.Outlook365:
-        return Outlook365CalendarAdapter(configuration=configuration)
-    if configuration.calendar_type is CalendarType.CalDAV:
-        return CaldavCalendarAdapter(configuration=configuration)
+def create_caching_calendar_adapter(configuration: ConfigurationV1) -> CachingCalendarAdapter:
+    """
+    Creates the calendar adapter for the configured calendar type, which records all events in the local EventStore.
+    """
+    event_store = EventStore(configuration)
+    return CachingCalendarAdapter(configuration, create_calendar_adapter(configuration, event_store), event_store)
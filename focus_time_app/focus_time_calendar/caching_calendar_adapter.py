@@ -0,0 +1,118 @@
+import dataclasses
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any
+
+from focus_time_app.configuration.configuration import ConfigurationV1
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter
+from focus_time_app.focus_time_calendar.event import FocusTimeEvent, FocusTimeEventUpdate
+from focus_time_app.focus_time_calendar.event_store import EventStore
+from focus_time_app.focus_time_calendar.http_trace import adapter_operation
+from focus_time_app.focus_time_calendar.utils import compute_calendar_query_start_and_stop
+from focus_time_app.utils.deadline import Deadline
+
+
+class CachingCalendarAdapter(AbstractCalendarAdapter):
+    """
+    Decorates a concrete calendar adapter, recording all events it returns (or creates, updates, removes) in the local
+    EventStore. get_events() answers from the EventStore (without contacting the calendar server) if the stored events
+    were refreshed less than <event_cache_max_age_seconds> seconds ago, for a time window that contains the requested
+    one.
+
+    The HTTP requests sent by the concrete adapter are attributed to the operation (e.g. "get_events") that sent
+    them, see http_trace.
+    """
+
+    def __init__(self, configuration: ConfigurationV1, calendar_adapter: AbstractCalendarAdapter,
+                 event_store: EventStore):
+        self._configuration = configuration
+        self._calendar_adapter = calendar_adapter
+        self._event_store = event_store
+
+    @property
+    def event_store(self) -> EventStore:
+        return self._event_store
+
+    def authenticate(self) -> Optional[Dict[str, Any]]:
+        with adapter_operation("authenticate"):
+            return self._calendar_adapter.authenticate()
+
+    def check_connection_and_credentials(self):
+        with adapter_operation("check_connection_and_credentials"):
+            self._calendar_adapter.check_connection_and_credentials()
+
+    def prepare_connection(self):
+        with adapter_operation("prepare_connection"):
+            self._calendar_adapter.prepare_connection()
+
+    def set_deadline(self, deadline: Optional[Deadline]):
+        self._calendar_adapter.set_deadline(deadline)
+
+    def refresh_credentials_if_expiring(self):
+        with adapter_operation("refresh_credentials_if_expiring"):
+            self._calendar_adapter.refresh_credentials_if_expiring()
+
+    def get_server_url(self) -> Optional[str]:
+        return self._calendar_adapter.get_server_url()
+
+    def get_events(self, date_range: Optional[tuple[datetime, datetime]] = None) -> list[FocusTimeEvent]:
+        if date_range:
+            from_date, to_date = date_range
+        else:
+            from_date, to_date = compute_calendar_query_start_and_stop(self._configuration)
+
+        max_age = timedelta(seconds=self._configuration.event_cache_max_age_seconds)
+        if max_age and self._event_store.is_fresh(from_date, to_date, max_age):
+            return self._event_store.get_events(from_date, to_date)
+
+        with adapter_operation("get_events"):
+            events = self._calendar_adapter.get_events(date_range=(from_date, to_date))
+        self._event_store.store_events(from_date, to_date, events)
+        return events
+
+    def create_event(self, from_date: datetime, to_date: datetime) -> FocusTimeEvent:
+        with adapter_operation("create_event"):
+            event = self._calendar_adapter.create_event(from_date, to_date)
+        self._event_store.upsert_event(event)
+        return event
+
+    def update_event(self, event: FocusTimeEvent, from_date: Optional[datetime] = None,
+                     to_date: Optional[datetime] = None, reminder_in_minutes: Optional[int] = None):
+        with adapter_operation("update_event"):
+            self._calendar_adapter.update_event(event, from_date=from_date, to_date=to_date,
+                                                reminder_in_minutes=reminder_in_minutes)
+        self._record_update(FocusTimeEventUpdate(event, from_date=from_date, to_date=to_date,
+                                                 reminder_in_minutes=reminder_in_minutes))
+
+    def remove_event(self, event: FocusTimeEvent):
+        with adapter_operation("remove_event"):
+            self._calendar_adapter.remove_event(event)
+        self._event_store.remove_event(event)
+
+    def create_events(self, date_ranges: list[tuple[datetime, datetime]]) -> list[FocusTimeEvent]:
+        with adapter_operation("create_events"):
+            events = self._calendar_adapter.create_events(date_ranges)
+        for event in events:
+            self._event_store.upsert_event(event)
+        return events
+
+    def update_events(self, updates: list[FocusTimeEventUpdate]):
+        with adapter_operation("update_events"):
+            self._calendar_adapter.update_events(updates)
+        for update in updates:
+            self._record_update(update)
+
+    def remove_events(self, events: list[FocusTimeEvent]):
+        with adapter_operation("remove_events"):
+            self._calendar_adapter.remove_events(events)
+        for event in events:
+            self._event_store.remove_event(event)
+
+    def _record_update(self, update: FocusTimeEventUpdate):
+        event = update.event
+        updated_event = dataclasses.replace(
+            event, start=update.from_date or event.start, end=update.to_date or event.end,
+            reminder_in_minutes=event.reminder_in_minutes if update.reminder_in_minutes is None
+            else update.reminder_in_minutes,
+            etag=None)  # the server assigned a new (unknown) etag
+        self._event_store.remove_event(event)
+        self._event_store.upsert_event(updated_event)
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import socket
+import sys
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+
+from focus_time_app.configuration.persistence import Persistence
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import CredentialsError
+from focus_time_app.focus_time_calendar.http_transport import RequestDeadlineExceededError
+from focus_time_app.utils.deadline import DeadlineExceededError
+
+
+class CalendarUnreachableError(ConnectionError):
+    """
+    Raised by ConnectivityCircuitBreaker.before_attempt() if the calendar server is known to be unreachable.
+    """
+
+
+def is_connectivity_error(e: Optional[BaseException]) -> bool:
+    """
+    Returns True if the provided error (or one of the errors it was caused by) indicates that the calendar server
+    could not be reached at all (e.g. DNS resolution failures, refused connections, or timeouts), as opposed to errors
+    reported BY the server (such as HTTP 401). Of the DeadlineExceededErrors, only those raised by the HTTP transport
+    count, but not those raised e.g. because slow start/stop commands used up the time budget.
+    """
+    while e is not None:
+        if isinstance(e, requests.HTTPError):
+            return False
+        if isinstance(e, DeadlineExceededError):
+            return isinstance(e, RequestDeadlineExceededError)
+        if isinstance(e, (requests.ConnectionError, requests.Timeout, ConnectionError, socket.gaierror,
+                          socket.timeout)):
+            return True
+        e = e.__cause__ or e.__context__
+    return False
+
+
+def is_authentication_error(e: Optional[BaseException]) -> bool:
+    """
+    Returns True if the provided error (or one of the errors it was caused by) indicates that the stored credentials
+    are missing or invalid, or that the calendar server rejected them (e.g. HTTP 401 or 403, or an OAuth error while
+    refreshing the token).
+    """
+    while e is not None:
+        if isinstance(e, CredentialsError):
+            return True
+        if isinstance(e, requests.HTTPError):
+            return e.response is not None and e.response.status_code in (401, 403)
+        # Note: the calendar libraries are only imported if the configured adapter uses them
+        if (caldav_errors := sys.modules.get("caldav.lib.error")) and isinstance(e, caldav_errors.AuthorizationError):
+            return True
+        if (oauth2_errors := sys.modules.get("oauthlib.oauth2.rfc6749.errors")) and \
+                isinstance(e, oauth2_errors.OAuth2Error):
+            return True
+        e = e.__cause__ or e.__context__
+    return False
+
+
+@dataclass
+class CircuitBreakerState:
+    consecutive_failures: int = 0
+    # Wall clock time (seconds since the epoch) until which no connection attempts are made
+    open_until: float = 0.0
+
+
+class ConnectivityCircuitBreaker:
+    """
+    Avoids that every synchronization waits for DNS or TCP timeouts while the calendar server is unreachable (e.g.
+    because the machine is offline, or the VPN is down).
+
+    After <failure_threshold> consecutive connectivity failures, the circuit "opens": before_attempt() then fails
+    immediately during a cool-down period, which doubles with every further failure (up to MAX_COOLDOWN_SECONDS).
+    Once the cool-down has passed, before_attempt() first probes the server with a cheap TCP connect (including the
+    DNS resolution) with a short timeout, and only lets the caller proceed if the probe succeeds. A successful
+    connection closes the circuit again. If the requests to the server go through a proxy (configured via environment
+    variables or the OS settings, which the requests library honors), the probe is skipped, because a direct TCP
+    connect says nothing about whether the server is reachable via the proxy.
+
+    The state is persisted in the storage directory (next to the focus time marker file), because each
+    synchronization typically runs in a new process.
+    """
+    STATE_FILE_NAME = "circuit_breaker.json"
+    BASE_COOLDOWN_SECONDS = 60
+    MAX_COOLDOWN_SECONDS = 15 * 60
+    PROBE_TIMEOUT_SECONDS = 3
+
+    def __init__(self, server_url: Optional[str], failure_threshold: int, state_path: Optional[Path] = None):
+        """
+        :param server_url: URL of the calendar server, whose host is probed. If None, no probe is made.
+        :param failure_threshold: number of consecutive failures after which the circuit opens, 0 disables the circuit
+            breaker (before_attempt() never raises an error)
+        """
+        self._server_url = server_url
+        self._failure_threshold = failure_threshold
+        self._state_path = state_path or Persistence.get_storage_directory() / self.STATE_FILE_NAME
+        self._logger = logging.getLogger(type(self).__name__)
+
+    def before_attempt(self):
+        """
+        Raises a CalendarUnreachableError if the circuit is open, or if the probe of the server fails.
+        """
+        if self._failure_threshold == 0:
+            return
+        state = self._load_state()
+        if state.consecutive_failures < self._failure_threshold:
+            return
+
+        remaining_cooldown_seconds = state.open_until - time.time()
+        if remaining_cooldown_seconds > 0:
+            raise CalendarUnreachableError(f"The calendar server was unreachable in the last "
+                                           f"{state.consecutive_failures} attempts, skipping connection attempts for "
+                                           f"another {round(remaining_cooldown_seconds)} seconds")
+
+        if not self._probe():
+            self.record_failure()
+            raise CalendarUnreachableError("The calendar server is still unreachable")
+
+    def record_success(self):
+        if self._load_state().consecutive_failures > 0:
+            self._logger.info("The calendar server is reachable again, closing the circuit")
+            self._state_path.unlink(missing_ok=True)
+
+    def record_failure(self):
+        if self._failure_threshold == 0:
+            return
+        state = self._load_state()
+        state.consecutive_failures += 1
+        if state.consecutive_failures >= self._failure_threshold:
+            cooldown_exponent = state.consecutive_failures - self._failure_threshold
+            cooldown_seconds = min(self.BASE_COOLDOWN_SECONDS * 2 ** cooldown_exponent, self.MAX_COOLDOWN_SECONDS)
+            state.open_until = time.time() + cooldown_seconds
+            self._logger.info(f"The calendar server was unreachable {state.consecutive_failures} times in a row, "
+                              f"skipping connection attempts for {cooldown_seconds} seconds")
+        self._save_state(state)
+
+    def _probe(self) -> bool:
+        if not self._server_url:
+            return True  # nothing to probe, let the caller try
+        if requests.utils.get_environ_proxies(self._server_url):
+            return True  # let the caller's (proxied) connection attempt decide
+        url = urlparse(self._server_url)
+        port = url.port or (443 if url.scheme == "https" else 80)
+        try:
+            with socket.create_connection((url.hostname, port), timeout=self.PROBE_TIMEOUT_SECONDS):
+                return True
+        except OSError as e:
+            self._logger.info(f"Probing the calendar server {url.hostname}:{port} failed: {e}")
+            return False
+
+    def _load_state(self) -> CircuitBreakerState:
+        try:
+            return CircuitBreakerState(**json.loads(self._state_path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return CircuitBreakerState()
+        except (ValueError, TypeError):
+            self._logger.warning("Ignoring the corrupt circuit breaker state file")
+            return CircuitBreakerState()
+
+    def _save_state(self, state: CircuitBreakerState):
+        self._state_path.parent.mkdir(parents=True, exist_ok=True)
+        # Note: writing to a temporary file first avoids that concurrent invocations (e.g. the daemon and a CLI command)
+        # read a partially written state file, which they would ignore as corrupt
+        temp_path = self._state_path.with_name(f"{self._state_path.name}.{os.getpid()}.tmp")
+        try:
+            temp_path.write_text(json.dumps(asdict(state)), encoding="utf-8")
+            os.replace(temp_path, self._state_path)
+        except OSError:
+            temp_path.unlink(missing_ok=True)
+            raise
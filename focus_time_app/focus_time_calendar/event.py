@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from typing import Optional
 
 
 class CalendarType(Enum):
@@ -14,3 +15,19 @@ class FocusTimeEvent:
     start: datetime
     end: datetime
     reminder_in_minutes: int
+    # Version identifier of the event on the calendar server (e.g. the CalDAV ETag), if the adapter provides one
+    etag: Optional[str] = None
+    # Identifier of the calendar resource that contains the event (e.g. the CalDAV href), if the adapter provides one
+    resource_id: Optional[str] = None
+
+
+@dataclass
+class FocusTimeEventUpdate:
+    """
+    Describes the changes that should be made to an existing focus time event. Only fields that are not None are
+    changed (see AbstractCalendarAdapter.update_event()).
+    """
+    event: FocusTimeEvent
+    from_date: Optional[datetime] = None
+    to_date: Optional[datetime] = None
+    reminder_in_minutes: Optional[int] = None
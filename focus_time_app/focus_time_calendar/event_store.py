@@ -0,0 +1,182 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, List
+from zoneinfo import ZoneInfo
+
+from focus_time_app.configuration.configuration import ConfigurationV1
+from focus_time_app.configuration.persistence import Persistence
+from focus_time_app.focus_time_calendar.event import FocusTimeEvent
+
+EPOCH = datetime(1970, 1, 1, tzinfo=ZoneInfo('UTC'))
+
+
+def _to_micros(date: datetime) -> int:
+    return (date - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class EventStore:
+    """
+    SQLite-backed local copy of the focus time events that the calendar adapter has seen, stored in the storage
+    directory. It allows answering questions such as "which focus time is active / comes next" without contacting the
+    calendar server.
+
+    The store remembers the time window (and time) of the last refresh from the calendar server, see is_fresh().
+    All events and metadata are discarded whenever the calendar-related configuration changes.
+    """
+    DATABASE_FILE_NAME = "events.sqlite3"
+    # Increment the version whenever the schema changes, which causes existing databases to be recreated
+    SCHEMA_VERSION = 2
+
+    _SOURCE_KEY_METADATA_KEY = "source_key"
+    _REFRESHED_AT_METADATA_KEY = "refreshed_at"
+    _REFRESHED_FROM_METADATA_KEY = "refreshed_from"
+    _REFRESHED_TO_METADATA_KEY = "refreshed_to"
+
+    def __init__(self, configuration: ConfigurationV1, database_path: Optional[Path] = None):
+        if database_path is None:
+            database_path = Persistence.get_storage_directory() / self.DATABASE_FILE_NAME
+        database_path.parent.mkdir(parents=True, exist_ok=True)
+        # Note: the timeout avoids failing immediately while another process (e.g. the daemon) writes to the database
+        self._connection = sqlite3.connect(str(database_path), timeout=10)
+        self._create_schema()
+        self._discard_if_source_changed(self._compute_source_key(configuration))
+
+    def store_events(self, from_date: datetime, to_date: datetime, events: List[FocusTimeEvent]):
+        """
+        Replaces all stored events within the given time window (start >= from_date and end <= to_date) with the
+        provided events, which were just retrieved from the calendar server for that time window.
+        """
+        now_micros = _to_micros(datetime.now(ZoneInfo('UTC')))
+        with self._connection:
+            self._connection.execute("DELETE FROM events WHERE start >= ? AND end <= ?",
+                                     (_to_micros(from_date), _to_micros(to_date)))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO events (id, start, end, reminder_in_minutes, etag, resource_id, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(e.id, _to_micros(e.start), _to_micros(e.end), e.reminder_in_minutes, e.etag, e.resource_id,
+                  now_micros) for e in events])
+            self._set_metadata_in_transaction(self._REFRESHED_AT_METADATA_KEY, str(now_micros))
+            self._set_metadata_in_transaction(self._REFRESHED_FROM_METADATA_KEY, str(_to_micros(from_date)))
+            self._set_metadata_in_transaction(self._REFRESHED_TO_METADATA_KEY, str(_to_micros(to_date)))
+
+    def upsert_event(self, event: FocusTimeEvent):
+        now_micros = _to_micros(datetime.now(ZoneInfo('UTC')))
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO events (id, start, end, reminder_in_minutes, etag, resource_id, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (event.id, _to_micros(event.start), _to_micros(event.end), event.reminder_in_minutes, event.etag,
+                 event.resource_id, now_micros))
+
+    def remove_event(self, event: FocusTimeEvent):
+        with self._connection:
+            self._connection.execute("DELETE FROM events WHERE id = ? AND start = ?",
+                                     (event.id, _to_micros(event.start)))
+
+    def get_events(self, from_date: datetime, to_date: datetime) -> List[FocusTimeEvent]:
+        """
+        Returns the stored events with a start date >= from_date and end date <= to_date, sorted by ascending start
+        time (just like AbstractCalendarAdapter.get_events()).
+        """
+        rows = self._connection.execute(
+            "SELECT id, start, end, reminder_in_minutes, etag, resource_id FROM events "
+            "WHERE start >= ? AND end <= ? ORDER BY start", (_to_micros(from_date), _to_micros(to_date))).fetchall()
+        return [self._event_from_row(row) for row in rows]
+
+    def get_active_event(self, now: Optional[datetime] = None) -> Optional[FocusTimeEvent]:
+        now_micros = _to_micros(now or datetime.now(ZoneInfo('UTC')))
+        row = self._connection.execute(
+            "SELECT id, start, end, reminder_in_minutes, etag, resource_id FROM events "
+            "WHERE start <= ? AND end >= ? ORDER BY start LIMIT 1", (now_micros, now_micros)).fetchone()
+        return self._event_from_row(row) if row else None
+
+    def get_next_event(self, now: Optional[datetime] = None) -> Optional[FocusTimeEvent]:
+        now_micros = _to_micros(now or datetime.now(ZoneInfo('UTC')))
+        row = self._connection.execute(
+            "SELECT id, start, end, reminder_in_minutes, etag, resource_id FROM events WHERE start > ? "
+            "ORDER BY start LIMIT 1", (now_micros,)).fetchone()
+        return self._event_from_row(row) if row else None
+
+    def get_last_refresh_time(self) -> Optional[datetime]:
+        refreshed_at = self.get_metadata(self._REFRESHED_AT_METADATA_KEY)
+        return _from_micros(int(refreshed_at)) if refreshed_at else None
+
+    def is_fresh(self, from_date: datetime, to_date: datetime, max_age: timedelta) -> bool:
+        """
+        Returns True if the stored events were refreshed from the calendar server within the last <max_age>, for a
+        time window that contains the provided one.
+        """
+        refreshed_at = self.get_metadata(self._REFRESHED_AT_METADATA_KEY)
+        refreshed_from = self.get_metadata(self._REFRESHED_FROM_METADATA_KEY)
+        refreshed_to = self.get_metadata(self._REFRESHED_TO_METADATA_KEY)
+        if refreshed_at is None or refreshed_from is None or refreshed_to is None:
+            return False
+
+        now_micros = _to_micros(datetime.now(ZoneInfo('UTC')))
+        if now_micros - int(refreshed_at) > max_age // timedelta(microseconds=1):
+            return False
+        return int(refreshed_from) <= _to_micros(from_date) and _to_micros(to_date) <= int(refreshed_to)
+
+    def get_metadata(self, key: str) -> Optional[str]:
+        row = self._connection.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_metadata(self, key: str, value: Optional[str]):
+        with self._connection:
+            self._set_metadata_in_transaction(key, value)
+
+    def close(self):
+        self._connection.close()
+
+    def _set_metadata_in_transaction(self, key: str, value: Optional[str]):
+        if value is None:
+            self._connection.execute("DELETE FROM metadata WHERE key = ?", (key,))
+        else:
+            self._connection.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)", (key, value))
+
+    def _create_schema(self):
+        # Note: the database only contains data that can be retrieved again from the calendar server, so there is no
+        # need to migrate it
+        if self._connection.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            with self._connection:
+                self._connection.execute("DROP TABLE IF EXISTS events")
+                self._connection.execute("DROP TABLE IF EXISTS metadata")
+                self._connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+        with self._connection:
+            # Note: "start" and "end" are stored as microseconds since the (UTC) epoch
+            self._connection.execute("CREATE TABLE IF NOT EXISTS events ("
+                                     "id TEXT NOT NULL, start INTEGER NOT NULL, end INTEGER NOT NULL, "
+                                     "reminder_in_minutes INTEGER NOT NULL, etag TEXT, resource_id TEXT, "
+                                     "last_seen INTEGER NOT NULL, PRIMARY KEY (id, start))")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS events_start ON events (start)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS events_end ON events (end)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _discard_if_source_changed(self, source_key: str):
+        if self.get_metadata(self._SOURCE_KEY_METADATA_KEY) == source_key:
+            return
+        with self._connection:
+            self._connection.execute("DELETE FROM events")
+            self._connection.execute("DELETE FROM metadata")
+            self._set_metadata_in_transaction(self._SOURCE_KEY_METADATA_KEY, source_key)
+
+    @staticmethod
+    def _compute_source_key(configuration: ConfigurationV1) -> str:
+        """
+        Returns a string that identifies the calendar (and the kind of events) that the stored events come from.
+        """
+        return json.dumps([configuration.calendar_type.name, configuration.adapter_configuration,
+                           configuration.focustime_event_name], sort_keys=True)
+
+    @staticmethod
+    def _event_from_row(row: tuple) -> FocusTimeEvent:
+        event_id, start, end, reminder_in_minutes, etag, resource_id = row
+        return FocusTimeEvent(id=event_id, start=_from_micros(start), end=_from_micros(end),
+                              reminder_in_minutes=reminder_in_minutes, etag=etag, resource_id=resource_id)
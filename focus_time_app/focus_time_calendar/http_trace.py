@@ -0,0 +1,142 @@
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional, List, Callable, Iterator, Dict
+from urllib.parse import urlsplit, parse_qsl
+
+# Operation to which requests are attributed that were not sent within adapter_operation()
+NO_OPERATION = "(none)"
+
+# Path segments that identify individual objects (e.g. Graph event IDs, CalDAV object names or UUIDs) are replaced by
+# placeholders, so that the requests of the same kind share the same URL template
+_ID_SEGMENT_PATTERN = re.compile(r"^(?=.*\d)[A-Za-z0-9_\-=+.%]{16,}$")
+_NUMBER_SEGMENT_PATTERN = re.compile(r"^\d+$")
+
+
+@dataclass
+class HttpRequestRecord:
+    operation: str
+    method: str
+    url_template: str
+    status: Optional[int]  # None if no response was received
+    request_bytes: int
+    response_bytes: int
+    latency_ms: float
+
+    def __str__(self) -> str:
+        return f"[{self.operation}] {self.method} {self.url_template} -> {self.status or 'no response'} " \
+               f"({self.request_bytes} B sent, {self.response_bytes} B received, {self.latency_ms:.0f} ms)"
+
+
+_records: List[HttpRequestRecord] = []
+_current_operation: Optional[str] = None
+_listener: Optional[Callable[[HttpRequestRecord], None]] = None
+_lock = threading.Lock()
+
+
+def get_url_template(url: str) -> str:
+    """
+    Returns the URL without the IDs of individual objects and without query parameter values, e.g.
+    "https://graph.microsoft.com/v1.0/me/calendars/{id}/events?$filter".
+    """
+    parts = urlsplit(url)
+    segments = []
+    for segment in parts.path.split("/"):
+        if segment.endswith(".ics") and len(segment) > 4:
+            segments.append("{id}.ics")
+        elif _ID_SEGMENT_PATTERN.match(segment):
+            segments.append("{id}")
+        elif _NUMBER_SEGMENT_PATTERN.match(segment):
+            segments.append("{n}")
+        else:
+            segments.append(segment)
+    template = f"{parts.scheme}://{parts.netloc}{'/'.join(segments)}"
+    if parts.query:
+        template += "?" + "&".join(key for key, _ in parse_qsl(parts.query, keep_blank_values=True))
+    return template
+
+
+@contextmanager
+def adapter_operation(name: str) -> Iterator[None]:
+    """
+    Attributes all HTTP requests sent within the enclosed block (also by other threads) to the calendar adapter
+    operation <name>, e.g. "get_events". If operations are nested, the requests are attributed to the outermost one.
+    """
+    global _current_operation
+    with _lock:
+        is_outermost = _current_operation is None
+        if is_outermost:
+            _current_operation = name
+    try:
+        yield
+    finally:
+        if is_outermost:
+            with _lock:
+                _current_operation = None
+
+
+def record_request(method: str, url: str, status: Optional[int], request_bytes: int, response_bytes: int,
+                   latency_ms: float):
+    with _lock:
+        record = HttpRequestRecord(operation=_current_operation or NO_OPERATION, method=method,
+                                   url_template=get_url_template(url), status=status, request_bytes=request_bytes,
+                                   response_bytes=response_bytes, latency_ms=latency_ms)
+        _records.append(record)
+        listener = _listener
+    if listener is not None:
+        listener(record)
+
+
+def set_listener(listener: Optional[Callable[[HttpRequestRecord], None]]):
+    """
+    Sets a function that is called for every recorded request (e.g. to print it), or removes it (None).
+    """
+    global _listener
+    with _lock:
+        _listener = listener
+
+
+def pop_records() -> List[HttpRequestRecord]:
+    """
+    Returns the requests recorded since the last call, and discards them.
+    """
+    with _lock:
+        records = list(_records)
+        _records.clear()
+        return records
+
+
+def summarize(records: List[HttpRequestRecord]) -> List[str]:
+    """
+    Returns one line per adapter operation, with the number of requests, the transferred bytes and the summed-up
+    latency, followed by the URL templates that caused the most requests.
+    """
+    lines = []
+    records_by_operation: Dict[str, List[HttpRequestRecord]] = {}
+    for record in records:
+        records_by_operation.setdefault(record.operation, []).append(record)
+    for operation, operation_records in records_by_operation.items():
+        counts_by_template: Dict[str, int] = {}
+        for record in operation_records:
+            key = f"{record.method} {record.url_template}"
+            counts_by_template[key] = counts_by_template.get(key, 0) + 1
+        top_templates = sorted(counts_by_template.items(), key=lambda item: -item[1])[:3]
+        lines.append(f"{operation}: {len(operation_records)} requests, "
+                     f"{sum(r.request_bytes for r in operation_records)} B sent, "
+                     f"{sum(r.response_bytes for r in operation_records)} B received, "
+                     f"{sum(r.latency_ms for r in operation_records):.0f} ms "
+                     f"(most frequent: {', '.join(f'{count}x {key}' for key, count in top_templates)})")
+    return lines
+
+
+def log_summary(logger: logging.Logger) -> List[str]:
+    """
+    Logs the summary (see summarize()) of the requests recorded since the last call (or pop_records() call), discards
+    the records, and returns the summary lines.
+    """
+    lines = summarize(pop_records())
+    for line in lines:
+        logger.info(f"HTTP requests of {line}")
+    return lines
@@ -0,0 +1,307 @@
+import dataclasses
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional, Dict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, Retry
+
+from focus_time_app.focus_time_calendar import http_trace
+from focus_time_app.utils.deadline import Deadline, DeadlineExceededError
+
+DEFAULT_CONNECTION_POOL_SIZE = 10
+
+
+class RequestDeadlineExceededError(DeadlineExceededError):
+    """
+    Raised by the shared HTTP transport if a request would be sent after the Deadline has expired (e.g. because the
+    calendar server responded slowly), as opposed to a DeadlineExceededError raised elsewhere (e.g. by slow start/stop
+    commands).
+    """
+
+# Status codes with which servers reject requests they did not process (e.g. due to rate limiting), thus requests of
+# any method can be retried
+THROTTLING_STATUS_CODES = frozenset({429, 503})
+# Status codes of transient server errors, after which only idempotent requests are retried
+TRANSIENT_ERROR_STATUS_CODES = frozenset({500, 502, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "PROPFIND", "REPORT"})
+
+
+@dataclass
+class TransportStatistics:
+    """
+    Counters of the HTTP requests sent by all sessions that use the shared transport (see configure_session()),
+    since the start of the process.
+    """
+    requests: int = 0
+    # Number of connections (and thus TCP/TLS handshakes) that had to be established
+    new_connections: int = 0
+    # Number of responses whose body was transferred in compressed form (e.g. gzip)
+    compressed_responses: int = 0
+    # Number of responses with which the server rejected a request due to rate limiting (see THROTTLING_STATUS_CODES)
+    throttled_responses: int = 0
+    # Number of requests that were repeated (see RetryPolicy)
+    retries: int = 0
+    # Number of requests that had to wait because the process exceeded the configured request rate
+    rate_limited_requests: int = 0
+
+    @property
+    def reused_connections(self) -> int:
+        """
+        Number of requests that were sent over an already established (keep-alive) connection.
+        """
+        return max(self.requests - self.new_connections, 0)
+
+    def __str__(self) -> str:
+        return f"{self.requests} requests, {self.new_connections} new connections, {self.reused_connections} " \
+               f"reused connections, {self.compressed_responses} compressed responses, {self.throttled_responses} " \
+               f"throttled responses, {self.retries} retries, {self.rate_limited_requests} rate-limited requests"
+
+
+_statistics = TransportStatistics()
+_statistics_lock = threading.Lock()
+
+
+def get_transport_statistics() -> TransportStatistics:
+    """
+    Returns a snapshot of the counters of the shared transport.
+    """
+    with _statistics_lock:
+        return dataclasses.replace(_statistics)
+
+
+def record_retry(throttled: bool):
+    """
+    Updates the counters for a request that is retried by the caller (rather than by the transport itself), e.g. a
+    sub-request of a batch request that the server rejected.
+    """
+    with _statistics_lock:
+        _statistics.retries += 1
+        if throttled:
+            _statistics.throttled_responses += 1
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Jittered exponential backoff for requests that the server rejected (or failed to process) temporarily. A
+    Retry-After header sent by the server takes precedence over the computed backoff.
+    """
+    max_retries: int = 3
+    backoff_base_seconds: float = 0.5
+    backoff_max_seconds: float = 30.0
+
+    def get_delay_seconds(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Returns the number of seconds to wait before the retry that follows the <attempt>-th (0-based) failed attempt.
+        """
+        if (retry_after_seconds := self._parse_retry_after(retry_after)) is not None:
+            return retry_after_seconds
+        # "Full jitter" avoids that many clients that were throttled at the same time retry at the same time
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+
+    def is_retryable(self, method: str, status_code: int) -> bool:
+        return status_code in THROTTLING_STATUS_CODES or \
+            (status_code in TRANSIENT_ERROR_STATUS_CODES and method.upper() in IDEMPOTENT_METHODS)
+
+    def create_connection_retry(self) -> Retry:
+        """
+        Returns the urllib3 retry configuration that repeats requests whose connection could not be established (which
+        is safe for any method, because the server never saw the request). Read errors are not retried, because the
+        server might have processed the request. Responses are retried by the PooledHTTPAdapter instead.
+        """
+        return Retry(total=self.max_retries, connect=self.max_retries, read=False, status=0, other=0, redirect=False,
+                     backoff_factor=self.backoff_base_seconds, backoff_max=self.backoff_max_seconds,
+                     backoff_jitter=self.backoff_base_seconds, allowed_methods=None, raise_on_status=False)
+
+    @staticmethod
+    def _parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+        """
+        Parses the value of a Retry-After header, which contains either a number of seconds, or an HTTP date.
+        """
+        if not retry_after:
+            return None
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_date = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        return max((retry_date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class _TokenBucket:
+    """
+    Limits the request rate to <rate> requests per second, allowing bursts of up to <rate> requests.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes a token, returning the number of seconds the caller has to wait before it may send its request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            # Note: a negative number of tokens represents the requests that are currently waiting
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+_token_buckets: Dict[str, _TokenBucket] = {}
+_token_buckets_lock = threading.Lock()
+
+
+def _get_token_bucket(host: str, rate: float) -> _TokenBucket:
+    with _token_buckets_lock:
+        if (bucket := _token_buckets.get(host)) is None:
+            bucket = _token_buckets[host] = _TokenBucket(rate)
+        bucket.rate = rate
+        return bucket
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        with _statistics_lock:
+            _statistics.new_connections += 1
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        with _statistics_lock:
+            _statistics.new_connections += 1
+        return super()._new_conn()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    Transport adapter for the requests library that keeps up to <pool_size> keep-alive connections per host, and
+    updates the counters of the shared TransportStatistics. Every request (attempt) is recorded in the http_trace.
+
+    Responses that indicate throttling or transient server errors are retried according to the RetryPolicy. If
+    max_requests_per_second is larger than 0, requests are delayed so that the process (across all sessions) does not
+    send more requests per second to any host.
+
+    If the deadline_provider returns a Deadline, each request's connect and read timeouts are limited to the time
+    remaining until the deadline, and no request is sent (or retried) once the deadline has expired (see
+    Deadline.get_timeout()).
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_CONNECTION_POOL_SIZE, retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+                 max_requests_per_second: float = 0,
+                 deadline_provider: Optional[Callable[[], Optional[Deadline]]] = None):
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size,
+                         max_retries=retry_policy.create_connection_retry())
+        self._retry_policy = retry_policy
+        self._max_requests_per_second = max_requests_per_second
+        self._deadline_provider = deadline_provider
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CountingHTTPConnectionPool,
+                                                   "https": _CountingHTTPSConnectionPool}
+
+    def send(self, request, timeout=None, **kwargs):
+        deadline = self._deadline_provider() if self._deadline_provider is not None else None
+        attempt = 0
+        while True:
+            self._wait_for_rate_limit(request.url, deadline)
+            request_timeout = timeout
+            if deadline:
+                try:
+                    request_timeout = deadline.get_timeout(timeout)
+                except DeadlineExceededError as e:
+                    raise RequestDeadlineExceededError(str(e)) from None
+            response = self._send_and_trace(request, timeout=request_timeout, **kwargs)
+            throttled = response.status_code in THROTTLING_STATUS_CODES
+            with _statistics_lock:
+                _statistics.requests += 1
+                if throttled:
+                    _statistics.throttled_responses += 1
+                if response.headers.get("Content-Encoding", "identity") != "identity":
+                    _statistics.compressed_responses += 1
+
+            if attempt >= self._retry_policy.max_retries or \
+                    not self._retry_policy.is_retryable(request.method, response.status_code):
+                return response
+            delay_seconds = self._retry_policy.get_delay_seconds(attempt, response.headers.get("Retry-After"))
+            if deadline and delay_seconds >= deadline.remaining_seconds():
+                return response  # there is no time left for a retry, let the caller handle the error response
+
+            response.close()
+            with _statistics_lock:
+                _statistics.retries += 1
+            time.sleep(delay_seconds)
+            attempt += 1
+
+    def _send_and_trace(self, request, **kwargs):
+        """
+        Sends the request, and records it (see http_trace), including the time it took to receive the response body.
+        """
+        request_bytes = len(request.body) if request.body is not None and not hasattr(request.body, "read") else 0
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            http_trace.record_request(request.method, request.url, None, request_bytes, 0,
+                                      (time.perf_counter() - start) * 1000)
+            raise
+        # Note: reading the body of streamed responses is left to the caller, thus only their Content-Length is known
+        body_length = len(response.content) if not kwargs.get("stream") else 0
+        content_length = response.headers.get("Content-Length", "")
+        # The Content-Length is the (possibly compressed) number of bytes that were actually transferred
+        response_bytes = int(content_length) if content_length.isdigit() else body_length
+        http_trace.record_request(request.method, request.url, response.status_code, request_bytes, response_bytes,
+                                  (time.perf_counter() - start) * 1000)
+        return response
+
+    def _wait_for_rate_limit(self, url: str, deadline: Optional[Deadline]):
+        if self._max_requests_per_second <= 0:
+            return
+        wait_seconds = _get_token_bucket(urlparse(url).netloc, self._max_requests_per_second).reserve()
+        if wait_seconds > 0:
+            if deadline and wait_seconds >= deadline.remaining_seconds():
+                raise RequestDeadlineExceededError("The deadline would be exceeded while waiting for the request rate "
+                                                   "limit")
+            with _statistics_lock:
+                _statistics.rate_limited_requests += 1
+            time.sleep(wait_seconds)
+
+
+def configure_session(session: requests.Session, pool_size: int = DEFAULT_CONNECTION_POOL_SIZE,
+                      max_requests_per_second: float = 0,
+                      deadline_provider: Optional[Callable[[], Optional[Deadline]]] = None) -> requests.Session:
+    """
+    Configures the provided session (created by a calendar library, e.g. caldav or O365) to use the shared transport:
+    a PooledHTTPAdapter for all HTTP(S) URLs, with keep-alive connections, compressed responses, the shared retry
+    policy, an optional request rate limit, and (optionally) deadline-based timeouts.
+
+    Note: the retry configuration of the adapter that the library had mounted (if any) is replaced, so that requests
+    are not retried by two layers.
+    """
+    adapter = PooledHTTPAdapter(pool_size=pool_size, max_requests_per_second=max_requests_per_second,
+                                deadline_provider=deadline_provider)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Note: these are also the defaults of the requests library, but calendar libraries might have changed them
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    session.headers["Connection"] = "keep-alive"
+    return session
@@ -1,46 +1,120 @@
+import json
+import logging
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, ClassVar, Callable, TypeVar
 
 import caldav
 import icalendar
-import marshmallow_dataclass
 import pwinput
 import typer
+from caldav.elements import dav, cdav
+from caldav.elements.base import BaseElement
+from caldav.lib import error
+from caldav.lib.url import URL
+from caldav.lib.vcal import create_ical
 from click import Choice
+from lxml import etree
 
-from focus_time_app.configuration.configuration import ConfigurationV1, CaldavConfigurationV1
-from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter
-from focus_time_app.focus_time_calendar.event import FocusTimeEvent
+from focus_time_app.configuration.configuration import ConfigurationV1, CaldavConfigurationV1, get_configuration_schema
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter, CredentialsError
+from focus_time_app.focus_time_calendar.event import FocusTimeEvent, FocusTimeEventUpdate
+from focus_time_app.focus_time_calendar.event_store import EventStore
+from focus_time_app.focus_time_calendar.http_transport import configure_session
 from focus_time_app.focus_time_calendar.impl.keyring_credentials_store import KeyringCredentialsStore
 from focus_time_app.focus_time_calendar.utils import compute_calendar_query_start_and_stop
 from focus_time_app.utils import CI_ENV_VAR_NAME
+from focus_time_app.utils.deadline import Deadline
 
-caldav_configuration_v1_schema = marshmallow_dataclass.class_schema(CaldavConfigurationV1)()
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class PreconditionFailedError(RuntimeError):
+    """
+    Raised if a conditional (If-Match) request fails, because the calendar object was modified in the meantime.
+    """
+
+
+class GetCTag(BaseElement):
+    """
+    The (non-standard, but widely supported) collection tag, which changes whenever any object of the calendar changes.
+    """
+    tag: ClassVar[str] = "{http://calendarserver.org/ns/}getctag"
+
+
+@dataclass
+class CaldavSyncState:
+    """
+    The focus time calendar objects (raw iCalendar data and ETag by href) of a calendar, as of the point in time
+    identified by the ctag and sync-token. The objects are complete for the time window <from_date>-<to_date>.
+    """
+    from_date: datetime
+    to_date: datetime
+    ctag: Optional[str] = None
+    sync_token: Optional[str] = None
+    objects: Dict[str, Dict[str, Optional[str]]] = field(default_factory=dict)
+
+    def covers(self, from_date: datetime, to_date: datetime) -> bool:
+        return self.from_date <= from_date and to_date <= self.to_date
+
+    def to_json(self) -> str:
+        return json.dumps({"from_date": self.from_date.isoformat(), "to_date": self.to_date.isoformat(),
+                           "ctag": self.ctag, "sync_token": self.sync_token, "objects": self.objects})
+
+    @staticmethod
+    def from_json(value: str) -> "CaldavSyncState":
+        d = json.loads(value)
+        return CaldavSyncState(from_date=datetime.fromisoformat(d["from_date"]),
+                               to_date=datetime.fromisoformat(d["to_date"]), ctag=d["ctag"],
+                               sync_token=d["sync_token"], objects=d["objects"])
 
 
 class CaldavCalendarAdapter(AbstractCalendarAdapter):
     """
     Calendar adapter for the CalDAV protocol. The user needs to provide the server URL, username and password.
+
+    If an EventStore is provided, get_events() avoids the expensive search REPORT: it checks whether the calendar
+    changed since the last call (using the ctag or sync-token of the calendar collection), and if so, retrieves only
+    the changed objects (RFC 6578 sync-collection REPORT). It falls back to a full search whenever the server does not
+    support this, or the sync-token has become invalid.
     """
     _CREDENTIALS_SEPARATOR = "||"
-
-    def __init__(self, configuration: ConfigurationV1, environment_namespace_override: Optional[str] = None):
+    _SYNC_STATE_METADATA_KEY = "caldav_sync_state"
+    # The time window of a full search is extended into the future by this duration, so that the synchronization state
+    # remains usable for a while, even though the (requested) look-ahead time window moves along with the current time
+    _SYNC_WINDOW_EXTENSION = timedelta(days=1)
+    # Maximum number of requests that the bulk operations (e.g. update_events()) send concurrently. Additionally limited
+    # to the configured connection pool size, so that all requests reuse pooled connections
+    _MAX_CONCURRENT_REQUESTS = 8
+
+    def __init__(self, configuration: ConfigurationV1, environment_namespace_override: Optional[str] = None,
+                 event_store: Optional[EventStore] = None):
         self._configuration = configuration
+        self._event_store = event_store
         self._caldav_configuration: Optional[CaldavConfigurationV1] = None
         if configuration.adapter_configuration is not None:
-            self._caldav_configuration: CaldavConfigurationV1 = caldav_configuration_v1_schema.load(
+            self._caldav_configuration: CaldavConfigurationV1 = get_configuration_schema(CaldavConfigurationV1).load(
                 configuration.adapter_configuration)
         self._username = ""
         self._password = ""
         self._caldav_calendar: Optional[caldav.Calendar] = None
-        self._credentials_store = KeyringCredentialsStore(namespace_override=environment_namespace_override)
+        # Identity map of the (non-recurring) calendar objects that this adapter most recently retrieved or saved, by
+        # event ID (UID), which lets update_event() and remove_event() write directly to the object's href (and ETag)
+        self._caldav_objects_by_id: Dict[str, caldav.CalendarObjectResource] = {}
+        self._deadline: Optional[Deadline] = None
+        self._credentials_store = KeyringCredentialsStore(namespace_override=environment_namespace_override,
+                                                          use_disk_cache=configuration.cache_credentials_on_disk)
+        self._logger = logging.getLogger(type(self).__name__)
 
     def authenticate(self) -> Optional[Dict[str, Any]]:
         server_url = self._get_server_url()
         self._username, self._password = self._get_credentials()
 
-        client = caldav.DAVClient(url=server_url, username=self._username, password=self._password)
+        client = self._create_client(server_url)
         try:
             principal = client.principal()
             calendars = principal.calendars()
@@ -57,7 +131,7 @@ class CaldavCalendarAdapter(AbstractCalendarAdapter):
 
             self._save_credentials()
             self._caldav_configuration = CaldavConfigurationV1(calendar_url=calendar_url)
-            return caldav_configuration_v1_schema.dump(self._caldav_configuration)
+            return get_configuration_schema(CaldavConfigurationV1).dump(self._caldav_configuration)
         except Exception as e:
             # TODO check for more specific errors
             typer.echo(f"Unable to authenticate: {e}")
@@ -69,61 +143,333 @@ class CaldavCalendarAdapter(AbstractCalendarAdapter):
             raise ValueError("Cannot check connection, CalDAV configuration is missing")
 
         self._load_credentials()
-        client = caldav.DAVClient(url=self._caldav_configuration.calendar_url, username=self._username,
-                                  password=self._password)
+        client = self._create_client(self._caldav_configuration.calendar_url)
         principal = client.principal()  # verifies the credentials
         self._caldav_calendar = principal.calendar(cal_url=self._caldav_configuration.calendar_url)
         self._caldav_calendar.get_supported_components()  # verifies the calendar URL
 
+    def prepare_connection(self):
+        if not self._caldav_configuration:
+            raise ValueError("Cannot prepare connection, CalDAV configuration is missing")
+
+        self._load_credentials()
+        # Note: we skip the principal discovery, because the URL of the calendar is already known
+        self._caldav_calendar = caldav.Calendar(client=self._create_client(self._caldav_configuration.calendar_url),
+                                                url=self._caldav_configuration.calendar_url)
+
+    def set_deadline(self, deadline: Optional[Deadline]):
+        self._deadline = deadline
+
+    def get_server_url(self) -> Optional[str]:
+        return self._caldav_configuration.calendar_url if self._caldav_configuration else None
+
     def get_events(self, date_range: Optional[tuple[datetime, datetime]] = None) -> list[FocusTimeEvent]:
         if date_range:
             from_date, to_date = date_range
         else:
             from_date, to_date = compute_calendar_query_start_and_stop(self._configuration)
 
-        caldav_events = self._caldav_calendar.search(start=from_date, end=to_date, event=True, expand=True,
-                                                     sort_keys=("dtstart",))
-        events_filtered = [e for e in caldav_events if
-                           self._get_event_subject(e) == self._configuration.focustime_event_name]
-
-        events: List[FocusTimeEvent] = []
-
-        for caldav_event in events_filtered:
-            events.append(self._get_focustime_event_from_caldav(caldav_event))
-
+        # Note: all objects are retrieved again, thus the identity map is rebuilt, which also drops the objects of
+        # events that no longer exist (or are no longer within the time window)
+        self._caldav_objects_by_id.clear()
+        if self._event_store is not None:
+            return self._get_events_incrementally(from_date, to_date)
+
+        # Note: the search does not let the server expand recurring events (which are expanded locally instead),
+        # because servers return expanded objects in a different form (e.g. converted to UTC, without VTIMEZONE), which
+        # update_event() would then write back to the event's href
+        caldav_objects = self._caldav_calendar.search(start=from_date, end=to_date, event=True, props=[dav.GetEtag()])
+        caldav_events = []
+        for caldav_object in caldav_objects:
+            if self._get_event_subject(caldav_object) == self._configuration.focustime_event_name:
+                self._remember_caldav_object(caldav_object)
+                caldav_events.extend(self._expand_caldav_event(caldav_object, from_date, to_date))
+
+        events: List[FocusTimeEvent] = [self._get_focustime_event_from_caldav(e) for e in caldav_events]
+        events.sort(key=lambda e: e.start)
         return events
 
     def create_event(self, from_date: datetime, to_date: datetime) -> FocusTimeEvent:
-        event = self._caldav_calendar.save_event(dtstart=from_date, dtend=to_date,
-                                                 summary=self._configuration.focustime_event_name)
+        # Note: the complete event (including the reminder) is built locally, with a client-generated UID, and stored
+        # with a single PUT request
+        uid = str(uuid.uuid4())
+        data = create_ical(objtype="VEVENT", uid=uid, dtstart=from_date, dtend=to_date,
+                           summary=self._configuration.focustime_event_name)
+        event = caldav.Event(self._caldav_calendar.client, url=self._caldav_calendar.url.join(uid + ".ics"),
+                             data=data, parent=self._caldav_calendar)
 
         reminder_in_minutes = 0
         if self._configuration.set_event_reminder and self._configuration.event_reminder_time_minutes > 0:
-            self._add_reminder_to_event_and_save(event,
-                                                 reminder_time_minutes=self._configuration.event_reminder_time_minutes)
+            self._add_reminder_to_event(event, reminder_time_minutes=self._configuration.event_reminder_time_minutes)
             reminder_in_minutes = self._configuration.event_reminder_time_minutes
+        self._save_caldav_event(event, is_new=True)
 
         return FocusTimeEvent(id=event.icalendar_component["uid"], start=from_date, end=to_date,
-                              reminder_in_minutes=reminder_in_minutes)
+                              reminder_in_minutes=reminder_in_minutes, etag=event.props.get(dav.GetEtag.tag),
+                              resource_id=str(event.url.canonical()))
 
     def update_event(self, event: FocusTimeEvent, from_date: Optional[datetime] = None,
                      to_date: Optional[datetime] = None, reminder_in_minutes: Optional[int] = None):
-        caldav_event = self._caldav_calendar.event_by_uid(event.id)
+        try:
+            self._update_caldav_event(self._get_caldav_event(event), from_date, to_date, reminder_in_minutes)
+        except PreconditionFailedError:
+            self._logger.info(f"Event {event.id} was modified on the server in the meantime, retrying the update")
+            self._caldav_objects_by_id.pop(event.id, None)
+            self._update_caldav_event(self._caldav_calendar.event_by_uid(event.id), from_date, to_date,
+                                      reminder_in_minutes)
 
+    def remove_event(self, event: FocusTimeEvent):
+        try:
+            self._delete_caldav_event(self._get_caldav_event(event))
+        except PreconditionFailedError:
+            self._logger.info(f"Event {event.id} was modified on the server in the meantime, retrying the removal")
+            self._caldav_objects_by_id.pop(event.id, None)
+            self._delete_caldav_event(self._caldav_calendar.event_by_uid(event.id))
+
+    def create_events(self, date_ranges: list[tuple[datetime, datetime]]) -> list[FocusTimeEvent]:
+        return self._run_concurrently(lambda date_range: self.create_event(*date_range), date_ranges)
+
+    def update_events(self, updates: list[FocusTimeEventUpdate]):
+        self._load_unknown_caldav_events([u.event for u in updates])
+        self._run_concurrently(lambda u: self.update_event(u.event, from_date=u.from_date, to_date=u.to_date,
+                                                           reminder_in_minutes=u.reminder_in_minutes), updates)
+
+    def remove_events(self, events: list[FocusTimeEvent]):
+        self._load_unknown_caldav_events(events)
+        self._run_concurrently(self.remove_event, events)
+
+    def _create_client(self, url: str) -> caldav.DAVClient:
+        client = caldav.DAVClient(url=url, username=self._username, password=self._password)
+        configure_session(client.session, pool_size=self._configuration.http_connection_pool_size,
+                          max_requests_per_second=self._configuration.http_max_requests_per_second,
+                          deadline_provider=lambda: self._deadline)
+        return client
+
+    def _get_caldav_event(self, event: FocusTimeEvent) -> caldav.CalendarObjectResource:
+        """
+        Returns the calendar object that contains the provided event, preferably without querying the server.
+        """
+        if caldav_event := self._caldav_objects_by_id.get(event.id):
+            return caldav_event
+        if event.resource_id:
+            return caldav.Event(self._caldav_calendar.client, url=event.resource_id,
+                                parent=self._caldav_calendar).load()
+        return self._caldav_calendar.event_by_uid(event.id)
+
+    def _load_unknown_caldav_events(self, events: list[FocusTimeEvent]):
+        """
+        Retrieves the calendar objects of those events (whose href is known) that are missing in the identity map,
+        using a single calendar-multiget REPORT.
+        """
+        hrefs = {e.resource_id for e in events if e.id not in self._caldav_objects_by_id and e.resource_id}
+        if len(hrefs) > 1:
+            for caldav_object in self._multiget([URL.objectify(href) for href in hrefs]):
+                if caldav_object.data:
+                    self._remember_caldav_object(caldav_object)
+
+    def _multiget(self, urls: list[URL]) -> list[caldav.CalendarObjectResource]:
+        """
+        Like caldav.Calendar.calendar_multiget(), but also retrieves the ETags of the calendar objects.
+        """
+        query = cdav.CalendarMultiGet() + (dav.Prop() + [dav.GetEtag(), cdav.CalendarData()]) + \
+            [dav.Href(value=url.path) for url in urls]
+        body = etree.tostring(query.xmlelement(), encoding="utf-8", xml_declaration=True)
+        response = self._caldav_calendar.client.report(str(self._caldav_calendar.url), body, depth=1)
+        if response.status >= 400:
+            raise error.ReportError(f"calendar-multiget failed: {response.status} {response.reason}")
+        results = response.expand_simple_props([cdav.CalendarData(), dav.GetEtag()])
+        return [caldav.Event(self._caldav_calendar.client, url=self._caldav_calendar.url.join(href),
+                             data=props[cdav.CalendarData.tag], parent=self._caldav_calendar,
+                             props={dav.GetEtag.tag: props[dav.GetEtag.tag]})
+                for href, props in results.items()]
+
+    def _remember_caldav_object(self, caldav_object: caldav.CalendarObjectResource):
+        component = caldav_object.icalendar_component
+        # Writing an instance of a recurring event to the href would overwrite the entire series
+        if not any(key in component for key in ["recurrence-id", "exdate", "exrule", "rdate", "rrule"]):
+            self._caldav_objects_by_id[str(component["uid"])] = caldav_object
+
+    def _update_caldav_event(self, caldav_event: caldav.CalendarObjectResource, from_date: Optional[datetime],
+                             to_date: Optional[datetime], reminder_in_minutes: Optional[int]):
         if from_date:
             caldav_event.icalendar_component["dtstart"].dt = from_date
         if to_date:
             caldav_event.icalendar_component["dtend"].dt = to_date
         if reminder_in_minutes is not None:
-            self._remove_all_reminders_and_save(caldav_event)
+            self._remove_all_reminders(caldav_event)
             if reminder_in_minutes > 0:
-                self._add_reminder_to_event_and_save(caldav_event, reminder_time_minutes=reminder_in_minutes)
+                self._add_reminder_to_event(caldav_event, reminder_time_minutes=reminder_in_minutes)
 
-        caldav_event.save()
+        try:
+            self._save_caldav_event(caldav_event)
+        except Exception:
+            # The (already modified) object no longer matches the one stored on the server
+            self._caldav_objects_by_id.pop(str(caldav_event.icalendar_component["uid"]), None)
+            raise
+
+    def _save_caldav_event(self, caldav_event: caldav.CalendarObjectResource, is_new: bool = False):
+        """
+        PUTs the calendar object to its href. If its ETag is known, the request is conditional (If-Match), failing with
+        a PreconditionFailedError if the object was modified on the server in the meantime. For new objects
+        (is_new=True), the request fails with a PreconditionFailedError if an object already exists at the href.
+        """
+        headers = {"Content-Type": 'text/calendar; charset="utf-8"'}
+        if is_new:
+            headers["If-None-Match"] = "*"
+        elif etag := caldav_event.props.get(dav.GetEtag.tag):
+            headers["If-Match"] = etag
+        response = self._caldav_calendar.client.put(str(caldav_event.url), caldav_event.data, headers)
+        if response.status == 412:
+            raise PreconditionFailedError(f"Calendar object {caldav_event.url} was modified (or created) in the "
+                                          f"meantime")
+        if response.status not in (200, 201, 204):
+            raise error.PutError(f"Unable to save calendar object {caldav_event.url}: {response.status} "
+                                 f"{response.reason}")
+
+        # Servers only return the new ETag if they stored the object unmodified. Otherwise, the local object is outdated
+        # and (lacking an ETag) would be written unconditionally, thus it is retrieved again when it is needed next
+        if new_etag := response.headers.get("ETag"):
+            caldav_event.props[dav.GetEtag.tag] = new_etag
+            self._remember_caldav_object(caldav_event)
+        else:
+            caldav_event.props.pop(dav.GetEtag.tag, None)
+            self._caldav_objects_by_id.pop(str(caldav_event.icalendar_component["uid"]), None)
+
+    def _delete_caldav_event(self, caldav_event: caldav.CalendarObjectResource):
+        headers = {}
+        if etag := caldav_event.props.get(dav.GetEtag.tag):
+            headers["If-Match"] = etag
+        response = self._caldav_calendar.client.request(str(caldav_event.url), "DELETE", "", headers)
+        if response.status == 404:
+            raise error.NotFoundError(f"Calendar object {caldav_event.url} does not exist")
+        if response.status == 412:
+            raise PreconditionFailedError(f"Calendar object {caldav_event.url} was modified in the meantime")
+        if response.status not in (200, 204):
+            raise error.DeleteError(f"Unable to delete calendar object {caldav_event.url}: {response.status} "
+                                    f"{response.reason}")
+        self._caldav_objects_by_id.pop(str(caldav_event.icalendar_component["uid"]), None)
+
+    def _run_concurrently(self, function: Callable[[T], R], items: list[T]) -> list[R]:
+        """
+        Calls the function for each item, using several threads, and returns the results in the order of the items.
+        Since all threads use the same DAVClient (and thus the same requests session), the requests are sent
+        concurrently over the session's pooled (keep-alive) connections. If any call fails, the first error is raised.
+        """
+        results = []
+        # Note: the DAVClient determines the authentication method (e.g. Basic or Digest) from the first response with
+        # status 401, which is not thread-safe: threads whose requests are rejected concurrently fail with an
+        # AuthorizationError. Hence, the first item is processed alone, until the authentication method is known.
+        if items and self._caldav_calendar.client.auth is None:
+            results.append(function(items[0]))
+            items = items[1:]
+        if len(items) <= 1:
+            return results + [function(item) for item in items]
+        max_workers = min(len(items), self._MAX_CONCURRENT_REQUESTS, self._configuration.http_connection_pool_size)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return results + list(executor.map(function, items))
+
+    def _get_events_incrementally(self, from_date: datetime, to_date: datetime) -> list[FocusTimeEvent]:
+        sync_state: Optional[CaldavSyncState] = None
+        if serialized_sync_state := self._event_store.get_metadata(self._SYNC_STATE_METADATA_KEY):
+            sync_state = CaldavSyncState.from_json(serialized_sync_state)
+
+        if sync_state is None or not sync_state.covers(from_date, to_date) or not self._update_sync_state(sync_state):
+            sync_state = self._create_sync_state(from_date, to_date + self._SYNC_WINDOW_EXTENSION)
+
+        if sync_state.ctag is not None or sync_state.sync_token is not None:
+            self._event_store.set_metadata(self._SYNC_STATE_METADATA_KEY, sync_state.to_json())
+        else:
+            # The server supports neither ctags nor sync-tokens, we have no way to detect changes
+            self._event_store.set_metadata(self._SYNC_STATE_METADATA_KEY, None)
+
+        caldav_events = []
+        for href, caldav_object in sync_state.objects.items():
+            caldav_event = caldav.Event(self._caldav_calendar.client, url=href, data=caldav_object["data"],
+                                        parent=self._caldav_calendar,
+                                        props={dav.GetEtag.tag: caldav_object["etag"]})
+            self._remember_caldav_object(caldav_event)
+            caldav_events.extend(self._expand_caldav_event(caldav_event, from_date, to_date))
+
+        events = [self._get_focustime_event_from_caldav(e) for e in caldav_events]
+        events.sort(key=lambda e: e.start)
+        return events
 
-    def remove_event(self, event: FocusTimeEvent):
-        caldav_event = self._caldav_calendar.event_by_uid(event.id)
-        caldav_event.delete()
+    def _create_sync_state(self, from_date: datetime, to_date: datetime) -> CaldavSyncState:
+        """
+        Retrieves all focus time calendar objects of the provided time window, with a full search.
+        """
+        # Note: the ctag and sync-token must be retrieved BEFORE the search, so that changes made in between are
+        # detected by the next call of _update_sync_state()
+        ctag, sync_token = self._get_ctag_and_sync_token()
+        caldav_objects = self._caldav_calendar.search(start=from_date, end=to_date, event=True,
+                                                      props=[dav.GetEtag()])
+        sync_state = CaldavSyncState(from_date=from_date, to_date=to_date, ctag=ctag, sync_token=sync_token)
+        for caldav_object in caldav_objects:
+            if self._get_event_subject(caldav_object) == self._configuration.focustime_event_name:
+                sync_state.objects[str(caldav_object.url.canonical())] = {
+                    "etag": caldav_object.props.get(dav.GetEtag.tag), "data": caldav_object.data}
+        return sync_state
+
+    def _update_sync_state(self, sync_state: CaldavSyncState) -> bool:
+        """
+        Updates the provided synchronization state with those calendar objects that changed since it was created (or
+        last updated). Returns False if this is not possible, in which case a full search is necessary.
+        """
+        ctag, sync_token = self._get_ctag_and_sync_token()
+        if (ctag is not None and ctag == sync_state.ctag) or \
+                (sync_token is not None and sync_token == sync_state.sync_token):
+            return True  # nothing has changed
+
+        if sync_state.sync_token is None:
+            return False
+
+        try:
+            changed_objects = self._caldav_calendar.objects_by_sync_token(sync_token=sync_state.sync_token,
+                                                                          load_objects=False)
+            changed_hrefs = {str(o.url.canonical()) for o in changed_objects}
+            loaded_objects = self._multiget([o.url for o in changed_objects]) if changed_hrefs else []
+        except error.DAVError:
+            # e.g. because the server no longer knows the sync-token
+            self._logger.info("Unable to retrieve the changed calendar objects, falling back to a full search",
+                              exc_info=True)
+            return False
+
+        # Objects that were deleted in the meantime are not returned by the calendar-multiget REPORT
+        for href in changed_hrefs:
+            sync_state.objects.pop(href, None)
+        for caldav_object in loaded_objects:
+            if not caldav_object.data:
+                continue
+            if self._get_event_subject(caldav_object) == self._configuration.focustime_event_name:
+                sync_state.objects[str(caldav_object.url.canonical())] = {
+                    "etag": caldav_object.props.get(dav.GetEtag.tag), "data": caldav_object.data}
+
+        sync_state.ctag = ctag
+        sync_state.sync_token = changed_objects.sync_token
+        return True
+
+    def _get_ctag_and_sync_token(self) -> tuple[Optional[str], Optional[str]]:
+        properties = self._caldav_calendar.get_properties([GetCTag(), dav.SyncToken()])
+        return properties.get(GetCTag.tag), properties.get(dav.SyncToken.tag)
+
+    @staticmethod
+    def _expand_caldav_event(caldav_event: caldav.Event, from_date: datetime,
+                             to_date: datetime) -> list[caldav.Event]:
+        """
+        Returns the (instances of the) provided event that overlap with the provided time window, similar to what
+        the server returns for an expanded search.
+        """
+        component = caldav_event.icalendar_component
+        if any(key in component for key in ["exdate", "exrule", "rdate", "rrule"]):
+            caldav_event.expand_rrule(from_date, to_date)
+            instances = caldav_event.split_expanded()
+            for instance in instances:
+                instance.props = caldav_event.props
+            return instances
+
+        if component["dtstart"].dt < to_date and component["dtend"].dt > from_date:
+            return [caldav_event]
+        return []
 
     def _get_server_url(self) -> str:
         return typer.prompt("Provide the CalDAV URL", prompt_suffix='\n')
@@ -157,12 +503,13 @@ class CaldavCalendarAdapter(AbstractCalendarAdapter):
     def _load_credentials(self):
         credentials = self._credentials_store.load_credentials()
         if not credentials:
-            raise ValueError("CalDAV credentials are missing")
+            raise CredentialsError("CalDAV credentials are missing")
 
         creds_list = credentials.split(self._CREDENTIALS_SEPARATOR, maxsplit=1)
         if len(creds_list) != 2:
             self._credentials_store.delete_credentials()
-            raise ValueError(f"Invalid CalDAV credentials, number of elements is {len(creds_list)} but expected two")
+            raise CredentialsError(f"Invalid CalDAV credentials, number of elements is {len(creds_list)} but expected "
+                                   f"two")
 
         self._username, self._password = creds_list
 
@@ -177,24 +524,26 @@ class CaldavCalendarAdapter(AbstractCalendarAdapter):
             if isinstance(subcomponent, icalendar.Alarm):
                 reminder_minutes_td: timedelta = subcomponent["TRIGGER"].dt
                 reminder_minutes = -1 * reminder_minutes_td.total_seconds() // 60
+        # Note: instances of expanded recurring events returned by search() are copies that do not carry the
+        # properties (such as the ETag)
+        etag = e.props.get(dav.GetEtag.tag)
         return FocusTimeEvent(id=e.icalendar_component["uid"], start=e.icalendar_component["dtstart"].dt,
-                              end=e.icalendar_component["dtend"].dt, reminder_in_minutes=reminder_minutes)
+                              end=e.icalendar_component["dtend"].dt, reminder_in_minutes=reminder_minutes, etag=etag,
+                              resource_id=str(e.url.canonical()))
 
-    def _add_reminder_to_event_and_save(self, event: caldav.CalendarObjectResource, reminder_time_minutes: int):
+    @staticmethod
+    def _add_reminder_to_event(event: caldav.CalendarObjectResource, reminder_time_minutes: int):
         ia = icalendar.Alarm()
         ia.add("action", "DISPLAY")
         ia.add("trigger", timedelta(minutes=-1 * reminder_time_minutes))
         event.icalendar_component.add_component(ia)
-        event.save()
 
     @staticmethod
-    def _remove_all_reminders_and_save(event: caldav.CalendarObjectResource):
+    def _remove_all_reminders(event: caldav.CalendarObjectResource):
         alarm_subcomponents = []
         for subcomponent in event.icalendar_component.subcomponents:
             if isinstance(subcomponent, icalendar.Alarm):
                 alarm_subcomponents.append(subcomponent)
 
-        if alarm_subcomponents:
-            for alarm_subcomponent in alarm_subcomponents:
-                event.icalendar_component.subcomponents.remove(alarm_subcomponent)
-            event.save()
+        for alarm_subcomponent in alarm_subcomponents:
+            event.icalendar_component.subcomponents.remove(alarm_subcomponent)
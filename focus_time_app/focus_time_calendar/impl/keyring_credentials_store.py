@@ -1,61 +1,282 @@
-import math
+import hashlib
+import json
+import logging
+import os
 import sys
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple
 
 import keyring
 from keyring.errors import PasswordDeleteError
 
+from focus_time_app.configuration.persistence import Persistence
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import CredentialsError
 from focus_time_app.utils import get_environment_suffix
+from focus_time_app.utils.perf import span, PHASE_CREDENTIAL_LOAD
+
+# Credentials loaded (or saved) by this process, by keyring service name, which avoids repeated (slow) keyring calls,
+# e.g. when the sync daemon re-creates the calendar adapter after a configuration change. Each entry also holds the
+# version (see KeyringCredentialsStore._get_disk_cache_version()) of the disk cache file at that time, if any
+_credentials_cache: Dict[str, Tuple[str, Optional[Tuple[int, int]]]] = {}
 
 
 class KeyringCredentialsStore:
+    """
+    Stores the credentials of a calendar adapter in the credentials manager of the OS (via the keyring library).
+
+    Loaded credentials are cached in the process. If use_disk_cache is True, the credentials are also cached in a file
+    in the storage directory, encrypted with a key that is the only thing kept in the keyring. This reduces the number
+    of keyring calls of a new process to one, which matters on Windows, where the credentials are split into several
+    chunks (see PASSWORD_LENGTH_LIMITATION), each of which costs one (slow) keyring call.
+
+    Because other processes (e.g. the "configure" command, or a "start" command that refreshes the Outlook 365 token)
+    may change the credentials at any time, an entry of the process cache is only reused if it is still current: if
+    the disk cache file has not been replaced since, or (if there is no disk cache file) if the hash in the manifest
+    entry still matches. Without either of them, checking the entry would cost as much as loading the credentials
+    again, thus long-running processes (e.g. the sync daemon) need to call clear_process_cache() before they reconnect.
+
+    Split credentials are accompanied by a manifest entry that contains the number of chunks, the hash of each chunk,
+    and the hash of the entire credentials. It lets load_credentials() fetch exactly the existing chunks (in parallel),
+    save_credentials() skip the chunks that did not change, and delete_credentials() delete the chunks without reading
+    them first. Credentials stored without a manifest (by older versions of this app) are still loaded by probing the
+    chunks one after another. If the chunks do not match the manifest (because another process is saving new
+    credentials), the manifest is read again, see _MANIFEST_MISMATCH_RETRY_DELAYS_SECONDS.
+    """
     PASSWORD_LENGTH_LIMITATION = {
         "win32": 500,
         "darwin": 0  # unlimited
     }
+    DISK_CACHE_FILE_NAME_PREFIX = "credentials_cache"
+    _MAX_PARALLEL_KEYRING_CALLS = 8
+    # Delays before re-reading the manifest (and the chunks), if the loaded chunks do not match it. Other processes
+    # write the new chunks before the new manifest, thus a mismatch is resolved once they have finished saving
+    _MANIFEST_MISMATCH_RETRY_DELAYS_SECONDS = [0.1, 0.3, 1.0]
 
-    def __init__(self, namespace_override: Optional[str] = None):
+    def __init__(self, namespace_override: Optional[str] = None, use_disk_cache: bool = False):
         namespace_suffix = f"-{namespace_override}" if namespace_override else get_environment_suffix()
         self._SERVICE_NAME = "FocusTimeApp" + namespace_suffix
         self._USERNAME = "FocusTimeApp" + namespace_suffix
+        self._CACHE_KEY_USERNAME = self._USERNAME + "-cache-key"
+        self._MANIFEST_USERNAME = self._USERNAME + "-manifest"
+        self._use_disk_cache = use_disk_cache
+        self._disk_cache_path = Persistence.get_storage_directory() / \
+            f"{self.DISK_CACHE_FILE_NAME_PREFIX}{namespace_suffix}.bin"
+        self._logger = logging.getLogger(type(self).__name__)
+
+    @staticmethod
+    def clear_process_cache():
+        """
+        Discards the credentials cached by this process, such that the next load_credentials() call behaves as in a
+        new process.
+        """
+        _credentials_cache.clear()
 
     def load_credentials(self) -> str:
-        pw_length_limit = self.PASSWORD_LENGTH_LIMITATION[sys.platform]
-        credentials_string = ""
-        if pw_length_limit:
-            for i in range(999999):
-                password_substring = keyring.get_password(self._SERVICE_NAME, f"{self._USERNAME}-{i}")
-                if not password_substring:
-                    break
-                credentials_string += password_substring
-        else:
-            credentials_string = keyring.get_password(self._SERVICE_NAME, self._USERNAME)
+        if (cache_entry := _credentials_cache.get(self._SERVICE_NAME)) and self._is_current(*cache_entry):
+            return cache_entry[0]
+
+        with span(PHASE_CREDENTIAL_LOAD):
+            credentials_string = self._load_credentials_from_disk_cache() if self._use_disk_cache else None
+            if not credentials_string:
+                credentials_string = self._load_credentials_from_keyring()
+                if credentials_string and self._use_disk_cache:
+                    self._save_credentials_to_disk_cache(credentials_string)
 
+        if credentials_string:
+            _credentials_cache[self._SERVICE_NAME] = (credentials_string, self._get_disk_cache_version())
+        else:
+            _credentials_cache.pop(self._SERVICE_NAME, None)
         return credentials_string
 
     def save_credentials(self, credentials: str):
         pw_length_limit = self.PASSWORD_LENGTH_LIMITATION[sys.platform]
         if pw_length_limit:
-            offset = 0
-            for offset in range(math.ceil(len(credentials) / pw_length_limit)):
-                password_subset = credentials[offset * pw_length_limit: offset * pw_length_limit + pw_length_limit]
-                keyring.set_password(self._SERVICE_NAME, f"{self._USERNAME}-{offset}", password_subset)
-
-            # Make sure to break the sequence of older (not-properly deleted) passwords, if they exist
-            try:
-                keyring.delete_password(self._SERVICE_NAME, f"{self._USERNAME}-{offset + 1}")
-            except PasswordDeleteError:
-                pass
+            self._save_chunks(credentials, pw_length_limit)
         else:
             keyring.set_password(self._SERVICE_NAME, self._USERNAME, credentials)
 
+        if self._use_disk_cache:
+            self._save_credentials_to_disk_cache(credentials)
+        else:
+            # Note: a cache file written while the disk cache was still enabled would be outdated from now on
+            self._disk_cache_path.unlink(missing_ok=True)
+        _credentials_cache[self._SERVICE_NAME] = (credentials, self._get_disk_cache_version())
+
     def delete_credentials(self):
+        _credentials_cache.pop(self._SERVICE_NAME, None)
+        self._disk_cache_path.unlink(missing_ok=True)
+
         pw_length_limit = self.PASSWORD_LENGTH_LIMITATION[sys.platform]
         if pw_length_limit:
-            for i in range(999999):
-                password_substring = keyring.get_password(self._SERVICE_NAME, f"{self._USERNAME}-{i}")
-                if not password_substring:
-                    break
-                keyring.delete_password(self._SERVICE_NAME, f"{self._USERNAME}-{i}")
+            self._delete_chunks()
         else:
             keyring.delete_password(self._SERVICE_NAME, self._USERNAME)
+
+    def _is_current(self, credentials: str, disk_cache_version: Optional[Tuple[int, int]]) -> bool:
+        """
+        Returns whether the credentials cached in the process (at the provided version of the disk cache file) are
+        still the stored ones.
+        """
+        if disk_cache_version is not None:
+            # Note: other processes replace the disk cache file whenever they save credentials, and delete it when they
+            # delete the credentials
+            return disk_cache_version == self._get_disk_cache_version()
+        if self.PASSWORD_LENGTH_LIMITATION[sys.platform]:
+            # Costs one keyring call (instead of one call per chunk)
+            manifest = self._load_manifest()
+            return manifest is not None and manifest["hash"] == self._hash(credentials)
+        return True
+
+    def _get_disk_cache_version(self) -> Optional[Tuple[int, int]]:
+        if not self._use_disk_cache:
+            return None
+        try:
+            stat_result = self._disk_cache_path.stat()
+        except OSError:
+            return None
+        return stat_result.st_ino, stat_result.st_mtime_ns
+
+    def _load_credentials_from_keyring(self) -> str:
+        pw_length_limit = self.PASSWORD_LENGTH_LIMITATION[sys.platform]
+        if pw_length_limit:
+            return self._load_chunks()
+        return keyring.get_password(self._SERVICE_NAME, self._USERNAME)
+
+    def _get_chunk_username(self, index: int) -> str:
+        return f"{self._USERNAME}-{index}"
+
+    @staticmethod
+    def _hash(value: str) -> str:
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+    def _load_manifest(self) -> Optional[Dict]:
+        manifest_string = keyring.get_password(self._SERVICE_NAME, self._MANIFEST_USERNAME)
+        if not manifest_string:
+            return None
+        try:
+            manifest = json.loads(manifest_string)
+            if isinstance(manifest, dict) and isinstance(manifest.get("chunks"), int) and "hash" in manifest:
+                return manifest
+        except ValueError:
+            pass
+        self._logger.warning("Ignoring the invalid manifest of the stored credentials")
+        return None
+
+    def _load_chunks(self) -> str:
+        for delay_seconds in [None] + self._MANIFEST_MISMATCH_RETRY_DELAYS_SECONDS:
+            if delay_seconds is not None:
+                time.sleep(delay_seconds)
+            manifest = self._load_manifest()
+            if manifest is None:
+                return self._probe_chunks()
+            chunk_count = manifest["chunks"]
+            with ThreadPoolExecutor(max_workers=max(min(chunk_count, self._MAX_PARALLEL_KEYRING_CALLS), 1)) as executor:
+                chunks = list(executor.map(lambda i: keyring.get_password(self._SERVICE_NAME,
+                                                                          self._get_chunk_username(i)),
+                                           range(chunk_count)))
+            if all(chunks) and self._hash(credentials_string := "".join(chunks)) == manifest["hash"]:
+                return credentials_string
+            self._logger.info("The stored credentials do not match their manifest (another process may be saving "
+                              "them), reading them again")
+
+        # Note: the credentials are not deleted, because they might still become consistent (e.g. once another process
+        # has finished saving them)
+        raise CredentialsError("The stored credentials do not match their manifest")
+
+    def _probe_chunks(self) -> str:
+        """
+        Loads credentials stored without a manifest, by probing the chunks until there is no further one.
+        """
+        credentials_string = ""
+        for i in range(999999):
+            password_substring = keyring.get_password(self._SERVICE_NAME, self._get_chunk_username(i))
+            if not password_substring:
+                break
+            credentials_string += password_substring
+        return credentials_string
+
+    def _save_chunks(self, credentials: str, pw_length_limit: int):
+        chunks = [credentials[offset: offset + pw_length_limit]
+                  for offset in range(0, len(credentials), pw_length_limit)]
+        chunk_hashes = [self._hash(chunk)[:16] for chunk in chunks]
+        old_manifest = self._load_manifest()
+        old_chunk_hashes: List[str] = old_manifest.get("chunk_hashes", []) if old_manifest else []
+
+        for i, chunk in enumerate(chunks):
+            if i < len(old_chunk_hashes) and old_chunk_hashes[i] == chunk_hashes[i]:
+                continue  # the chunk did not change
+            keyring.set_password(self._SERVICE_NAME, self._get_chunk_username(i), chunk)
+
+        if old_manifest:
+            # Note: the number of (now superfluous) old chunks is known, thus they can be deleted without probing
+            for i in range(len(chunks), old_manifest["chunks"]):
+                self._delete_password_if_exists(self._get_chunk_username(i))
+        # Make sure to break the sequence of older (not-properly deleted) passwords, if they exist, because the chunks
+        # are probed (instead of using the manifest) if the manifest is lost
+        if not old_manifest or old_manifest["chunks"] <= len(chunks):
+            self._delete_password_if_exists(self._get_chunk_username(len(chunks)))
+
+        manifest = {"chunks": len(chunks), "hash": self._hash(credentials), "chunk_hashes": chunk_hashes}
+        if len(json.dumps(manifest)) > pw_length_limit:
+            del manifest["chunk_hashes"]  # too many chunks, future saves have to write all chunks
+        keyring.set_password(self._SERVICE_NAME, self._MANIFEST_USERNAME, json.dumps(manifest))
+
+    def _delete_chunks(self):
+        if manifest := self._load_manifest():
+            for i in range(manifest["chunks"]):
+                self._delete_password_if_exists(self._get_chunk_username(i))
+            self._delete_password_if_exists(self._MANIFEST_USERNAME)
+            return
+
+        for i in range(999999):
+            password_substring = keyring.get_password(self._SERVICE_NAME, self._get_chunk_username(i))
+            if not password_substring:
+                break
+            keyring.delete_password(self._SERVICE_NAME, self._get_chunk_username(i))
+
+    def _delete_password_if_exists(self, username: str):
+        try:
+            keyring.delete_password(self._SERVICE_NAME, username)
+        except PasswordDeleteError:
+            pass
+
+    def _load_credentials_from_disk_cache(self) -> Optional[str]:
+        if not self._disk_cache_path.is_file():
+            return None
+        try:
+            from cryptography.fernet import Fernet, InvalidToken
+        except ImportError:
+            self._logger.warning("The 'cryptography' package is missing, thus the credentials are not cached on disk")
+            return None
+
+        key = keyring.get_password(self._SERVICE_NAME, self._CACHE_KEY_USERNAME)
+        if not key:
+            return None
+        try:
+            return Fernet(key.encode()).decrypt(self._disk_cache_path.read_bytes()).decode("utf-8")
+        except (InvalidToken, ValueError, OSError) as e:
+            self._logger.warning(f"Ignoring the unreadable credentials cache file: {e}")
+            return None
+
+    def _save_credentials_to_disk_cache(self, credentials: str):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            self._logger.warning("The 'cryptography' package is missing, thus the credentials are not cached on disk")
+            return
+
+        key = keyring.get_password(self._SERVICE_NAME, self._CACHE_KEY_USERNAME)
+        if not key:
+            key = Fernet.generate_key().decode()
+            keyring.set_password(self._SERVICE_NAME, self._CACHE_KEY_USERNAME, key)
+
+        self._disk_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Note: the file is only readable by the current user (on POSIX systems), even though its content is encrypted.
+        # Replacing (rather than overwriting) it ensures that other processes never read a partially written file, and
+        # that they notice the change (see _get_disk_cache_version())
+        temp_path = self._disk_cache_path.with_name(f"{self._disk_cache_path.name}.{os.getpid()}.tmp")
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(Fernet(key.encode()).encrypt(credentials.encode("utf-8")))
+        os.replace(temp_path, self._disk_cache_path)
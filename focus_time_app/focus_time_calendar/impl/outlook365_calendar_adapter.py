@@ -1,43 +1,138 @@
+import json
+import logging
 import os
+import time
 import zoneinfo
-from datetime import datetime
-from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Tuple, Callable
 
-import marshmallow_dataclass
 import typer
 from O365 import Account
+from O365.connection import Connection
 from O365.calendar import Schedule, Calendar, Event
 from click import Choice
+from requests import HTTPError
 
-from focus_time_app.configuration.configuration import ConfigurationV1, Outlook365ConfigurationV1
-from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter
-from focus_time_app.focus_time_calendar.event import FocusTimeEvent
+from focus_time_app.configuration.configuration import ConfigurationV1, Outlook365ConfigurationV1, \
+    get_configuration_schema
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter, CredentialsError
+from focus_time_app.focus_time_calendar.event import FocusTimeEvent, FocusTimeEventUpdate
+from focus_time_app.focus_time_calendar.event_store import EventStore
+from focus_time_app.focus_time_calendar.http_transport import configure_session, DEFAULT_CONNECTION_POOL_SIZE, \
+    DEFAULT_RETRY_POLICY, THROTTLING_STATUS_CODES, record_retry
 from focus_time_app.focus_time_calendar.impl.outlook365_keyring_backend import Outlook365KeyringBackend
 from focus_time_app.focus_time_calendar.utils import compute_calendar_query_start_and_stop
 from focus_time_app.utils import CI_ENV_VAR_NAME
+from focus_time_app.utils.deadline import Deadline
 
 OUTLOOK365_REDIRECT_URL = "https://focus-time.github.io/focus-time-app"
 OUTLOOK365_OAUTH_COMMON_TENANT = "common"
+OUTLOOK365_GRAPH_URL = "https://graph.microsoft.com/"
 
-outlook_configuration_v1_schema = marshmallow_dataclass.class_schema(Outlook365ConfigurationV1)()
+
+@dataclass
+class Outlook365DeltaState:
+    """
+    The focus time events (by Graph event ID) of the time window <from_date>-<to_date>, as of the point in time
+    identified by the deltaLink, which returns all changes made since then.
+    """
+    from_date: datetime
+    to_date: datetime
+    delta_link: Optional[str] = None
+    events: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def covers(self, from_date: datetime, to_date: datetime) -> bool:
+        return self.from_date <= from_date and to_date <= self.to_date
+
+    def to_json(self) -> str:
+        return json.dumps({"from_date": self.from_date.isoformat(), "to_date": self.to_date.isoformat(),
+                           "delta_link": self.delta_link, "events": self.events})
+
+    @staticmethod
+    def from_json(value: str) -> "Outlook365DeltaState":
+        d = json.loads(value)
+        return Outlook365DeltaState(from_date=datetime.fromisoformat(d["from_date"]),
+                                    to_date=datetime.fromisoformat(d["to_date"]), delta_link=d["delta_link"],
+                                    events=d["events"])
+
+
+class BatchRequestError(RuntimeError):
+    """
+    Raised if some sub-requests of a Graph JSON batch request failed, while the others succeeded.
+    """
+
+    def __init__(self, message: str, failed_indices: list[int]):
+        super().__init__(message)
+        # The indices of the failed sub-requests, in the order of the requests passed to _send_batch_requests()
+        self.failed_indices = failed_indices
+
+
+class _PooledConnection(Connection):
+    """
+    O365 connection whose (lazily created) sessions use the shared HTTP transport, see http_transport.py.
+    """
+    connection_pool_size = DEFAULT_CONNECTION_POOL_SIZE
+    max_requests_per_second = 0
+    deadline_provider: Optional[Callable[[], Optional[Deadline]]] = None
+
+    def get_session(self, **kwargs):
+        return self._configure_session(super().get_session(**kwargs))
+
+    def get_naive_session(self):
+        return self._configure_session(super().get_naive_session())
+
+    def _configure_session(self, session):
+        return configure_session(session, pool_size=self.connection_pool_size,
+                                 max_requests_per_second=self.max_requests_per_second,
+                                 deadline_provider=self.deadline_provider)
+
+
+class _PooledAccount(Account):
+    connection_constructor = _PooledConnection
 
 
 class Outlook365CalendarAdapter(AbstractCalendarAdapter):
+    """
+    Calendar adapter for Outlook 365 (Microsoft Graph). The user needs to provide the client ID of an Azure App
+    registration and grant it access to the calendar.
+
+    If use_delta_queries is enabled and an EventStore is provided, get_events() uses Graph delta queries (on the
+    calendarView of the configured calendar), which return only the events that changed since the previous call. The
+    deltaLink and the focus time events are kept in the EventStore.
 
-    def __init__(self, configuration: ConfigurationV1, environment_namespace_override: Optional[str] = None):
+    The ID of the configured calendar is resolved (by its name) only once, and then kept in the EventStore (if
+    provided), which saves one request per invocation of the app.
+    """
+    _DELTA_STATE_METADATA_KEY = "outlook365_delta_state"
+    _CALENDAR_ID_METADATA_KEY = "outlook365_calendar_id"
+    # The time window of a delta query is extended into the future by this duration, so that the deltaLink remains
+    # usable for a while, even though the (requested) look-ahead time window moves along with the current time
+    _DELTA_WINDOW_EXTENSION = timedelta(days=1)
+    # Maximum number of sub-requests that Microsoft Graph accepts in one JSON batch request
+    _GRAPH_BATCH_MAX_REQUESTS = 20
+
+    def __init__(self, configuration: ConfigurationV1, environment_namespace_override: Optional[str] = None,
+                 event_store: Optional[EventStore] = None):
         self._configuration = configuration
+        self._event_store = event_store
         self._outlook_configuration: Optional[Outlook365ConfigurationV1] = None
         if configuration.adapter_configuration is not None:
-            self._outlook_configuration: Outlook365ConfigurationV1 = outlook_configuration_v1_schema.load(
-                configuration.adapter_configuration)
+            self._outlook_configuration: Outlook365ConfigurationV1 = \
+                get_configuration_schema(Outlook365ConfigurationV1).load(configuration.adapter_configuration)
         self._account: Optional[Account] = None
-        self._backend = Outlook365KeyringBackend(environment_namespace_override)
+        self._calendar: Optional[Calendar] = None
+        self._deadline: Optional[Deadline] = None
+        self._backend = Outlook365KeyringBackend(environment_namespace_override,
+                                                 use_disk_cache=configuration.cache_credentials_on_disk)
+        self._logger = logging.getLogger(type(self).__name__)
 
     def authenticate(self) -> Optional[Dict[str, Any]]:
         client_id = self._get_client_id()
         tenant_id = self._get_tenant_id()
-        self._account = Account(client_id, auth_flow_type="public", token_backend=self._backend,
-                                tenant_id=tenant_id or OUTLOOK365_OAUTH_COMMON_TENANT)
+        self._account = _PooledAccount(client_id, auth_flow_type="public", token_backend=self._backend,
+                                       tenant_id=tenant_id or OUTLOOK365_OAUTH_COMMON_TENANT)
+        self._configure_connection(self._account.con)
         if self._account.authenticate(scopes=["basic", "calendar_all"], handle_consent=self._get_consent_callback,
                                       redirect_uri=OUTLOOK365_REDIRECT_URL):
             typer.echo("Retrieving the list of calendars ...")
@@ -54,23 +149,48 @@ class Outlook365CalendarAdapter(AbstractCalendarAdapter):
 
             self._outlook_configuration = Outlook365ConfigurationV1(client_id=client_id, tenant_id=tenant_id,
                                                                     calendar_name=calendar_name)
-            return outlook_configuration_v1_schema.dump(self._outlook_configuration)
+            return get_configuration_schema(Outlook365ConfigurationV1).dump(self._outlook_configuration)
         else:
             return None
 
     def check_connection_and_credentials(self):
         if not self._outlook_configuration:
             raise ValueError("Cannot check connection, Outlook configuration is missing")
-        # Note: we set the "timezone=pytz.UTC" argument only to avoid PytzUsageWarning that point to
-        # https://pytz-deprecation-shim.readthedocs.io/en/latest/migration.html
-        # The issue is known (https://github.com/O365/python-o365/issues/753) but unlikely to be fixed soon
-        self._account = Account(str(self._outlook_configuration.client_id), auth_flow_type="public",
-                                token_backend=self._backend, timezone=zoneinfo.ZoneInfo("UTC"),
-                                tenant_id=self._outlook_configuration.tenant_id or OUTLOOK365_OAUTH_COMMON_TENANT)
+        # Note: the token kept in memory (e.g. by a long-running daemon) may have been refreshed (thus revoked) by
+        # another process in the meantime, thus it is loaded again
+        self._backend.token = None
+        self._account = self._create_account()
         if not self._account.is_authenticated:
-            raise RuntimeError("Unable to load auth token")
-        schedule: Schedule = self._account.schedule()
-        schedule.list_calendars()
+            raise CredentialsError("Unable to load auth token")
+        # Resolving the calendar (again) verifies the credentials, and also replaces a possibly outdated calendar ID
+        self._calendar = self._resolve_calendar(self._account.schedule())
+
+    def prepare_connection(self):
+        if not self._outlook_configuration:
+            raise ValueError("Cannot prepare connection, Outlook configuration is missing")
+        self._account = self._create_account()
+        # Note: this only loads the (cached) token from the keyring, without contacting the server
+        if not self._account.is_authenticated:
+            raise CredentialsError("Unable to load auth token")
+
+    def set_deadline(self, deadline: Optional[Deadline]):
+        self._deadline = deadline
+
+    def refresh_credentials_if_expiring(self):
+        margin_minutes = self._configuration.token_refresh_margin_minutes
+        if margin_minutes == 0 or self._account is None:
+            return
+        token = self._backend.token
+        # Note: O365 computes the (naive, local) expiry time from the "expires_at" timestamp of the token
+        if not token or not token.is_long_lived or \
+                token.access_expiration_datetime - timedelta(minutes=margin_minutes) > datetime.now():
+            return
+        self._logger.info(f"Refreshing the access token, which expires at {token.access_expiration_datetime}")
+        if not self._account.con.refresh_token():
+            raise RuntimeError("Unable to refresh the access token")
+
+    def get_server_url(self) -> Optional[str]:
+        return OUTLOOK365_GRAPH_URL
 
     def get_events(self, date_range: Optional[tuple[datetime, datetime]] = None) -> list[FocusTimeEvent]:
         schedule, calendar = self._get_schedule_and_calendar()
@@ -79,6 +199,9 @@ class Outlook365CalendarAdapter(AbstractCalendarAdapter):
         else:
             from_date, to_date = compute_calendar_query_start_and_stop(self._configuration)
 
+        if self._event_store is not None and self._outlook_configuration.use_delta_queries:
+            return self._get_events_with_delta_query(calendar, from_date, to_date)
+
         q = calendar.new_query("start").greater_equal(from_date).order_by("start", ascending=True)
         q.chain("and").on_attribute("end").less_equal(to_date)
         q.chain("and").on_attribute("subject").equals(self._configuration.focustime_event_name)
@@ -88,50 +211,212 @@ class Outlook365CalendarAdapter(AbstractCalendarAdapter):
         for o365_event in o365_events:
             reminder_in_minutes = o365_event.remind_before_minutes if o365_event.is_reminder_on else 0
             event = FocusTimeEvent(id=o365_event.ical_uid, start=o365_event.start, end=o365_event.end,
-                                   reminder_in_minutes=reminder_in_minutes)
+                                   reminder_in_minutes=reminder_in_minutes, resource_id=o365_event.object_id)
             events.append(event)
 
         return events
 
     def create_event(self, from_date: datetime, to_date: datetime) -> FocusTimeEvent:
         schedule, calendar = self._get_schedule_and_calendar()
-        o365_event = calendar.new_event(subject=self._configuration.focustime_event_name)
-        o365_event.start = from_date
-        o365_event.end = to_date
-        if self._configuration.set_event_reminder and self._configuration.event_reminder_time_minutes > 0:
-            o365_event.remind_before_minutes = self._configuration.event_reminder_time_minutes
-        else:
-            o365_event.is_reminder_on = False
-
-        success = o365_event.save()
-        if not success:
-            raise RuntimeError("Something went wrong trying to save the Outlook 365 event")
-
-        return FocusTimeEvent(id=o365_event.ical_uid, start=from_date, end=to_date,
-                              reminder_in_minutes=self._configuration.event_reminder_time_minutes)
+        reminder_in_minutes = self._get_reminder_in_minutes_for_new_events()
+        response = self._account.con.post(
+            calendar.build_url(f"/calendars/{calendar.calendar_id}/events"),
+            data=self._build_graph_event_body(subject=self._configuration.focustime_event_name, from_date=from_date,
+                                              to_date=to_date, reminder_in_minutes=reminder_in_minutes))
+        graph_event = response.json()
+        return FocusTimeEvent(id=graph_event["iCalUId"], start=from_date, end=to_date,
+                              reminder_in_minutes=reminder_in_minutes, etag=graph_event.get("changeKey"),
+                              resource_id=graph_event["id"])
 
     def update_event(self, event: FocusTimeEvent, from_date: Optional[datetime] = None,
                      to_date: Optional[datetime] = None, reminder_in_minutes: Optional[int] = None):
-        o365_event = self._find_event(event)
-        if from_date:
-            o365_event.start = from_date
-        if to_date:
-            o365_event.end = to_date
-        if reminder_in_minutes is not None:
-            if reminder_in_minutes > 0:
-                o365_event.remind_before_minutes = reminder_in_minutes
-            else:
-                o365_event.is_reminder_on = False
-
-        success = o365_event.save()
-        if not success:
-            raise RuntimeError("Something went wrong trying to update the Outlook 365 event")
+        self._send_event_request(event, "patch", self._build_graph_event_body(
+            from_date=from_date, to_date=to_date, reminder_in_minutes=reminder_in_minutes))
 
     def remove_event(self, event: FocusTimeEvent):
-        o365_event = self._find_event(event)
-        success = o365_event.delete()
-        if not success:
-            raise RuntimeError("Something went wrong trying to delete the Outlook 365 event")
+        self._send_event_request(event, "delete")
+
+    def create_events(self, date_ranges: list[tuple[datetime, datetime]]) -> list[FocusTimeEvent]:
+        schedule, calendar = self._get_schedule_and_calendar()
+        reminder_in_minutes = self._get_reminder_in_minutes_for_new_events()
+        responses = self._send_batch_requests([
+            {"method": "POST", "url": f"/{self._account.main_resource}/calendars/{calendar.calendar_id}/events",
+             "body": self._build_graph_event_body(subject=self._configuration.focustime_event_name,
+                                                  from_date=from_date, to_date=to_date,
+                                                  reminder_in_minutes=reminder_in_minutes)}
+            for from_date, to_date in date_ranges])
+
+        return [FocusTimeEvent(id=response["body"]["iCalUId"], start=from_date, end=to_date,
+                               reminder_in_minutes=reminder_in_minutes, etag=response["body"].get("changeKey"),
+                               resource_id=response["body"]["id"])
+                for (from_date, to_date), response in zip(date_ranges, responses)]
+
+    def update_events(self, updates: list[FocusTimeEventUpdate]):
+        self._send_batch_requests([
+            {"method": "PATCH", "url": f"/{self._account.main_resource}/events/{self._get_graph_event_id(u.event)}",
+             "body": self._build_graph_event_body(from_date=u.from_date, to_date=u.to_date,
+                                                  reminder_in_minutes=u.reminder_in_minutes),
+             **self._build_if_match_headers(u.event)}
+            for u in updates], events=[u.event for u in updates])
+
+    def remove_events(self, events: list[FocusTimeEvent]):
+        self._send_batch_requests([
+            {"method": "DELETE", "url": f"/{self._account.main_resource}/events/{self._get_graph_event_id(event)}",
+             **self._build_if_match_headers(event)}
+            for event in events], events=events)
+
+    def _send_batch_requests(self, requests: list[Dict[str, Any]],
+                             events: Optional[list[FocusTimeEvent]] = None) -> list[Dict[str, Any]]:
+        """
+        Sends the provided Graph sub-requests (dicts with "method", "url" relative to the Graph version, and optional
+        "headers" and JSON "body") as JSON batch requests, each containing up to _GRAPH_BATCH_MAX_REQUESTS
+        sub-requests. Sub-requests that Graph throttled are sent again, according to the shared retry policy (see
+        http_transport.py), because Graph throttles each sub-request individually. If the events that the
+        sub-requests address are provided, conditional sub-requests that failed because the event was modified in the
+        meantime are handled like in _send_event_request().
+
+        :return: the sub-responses (dicts with "status" and "body"), in the same order as the requests
+        :raises BatchRequestError: if any sub-request failed, which does not undo the other sub-requests
+        """
+        if not self._account:
+            raise ValueError("You need to call check_connection_and_credentials() first")
+
+        responses_by_index: Dict[int, Dict[str, Any]] = {}
+        pending_indices = list(range(len(requests)))
+        attempt = 0
+        while True:
+            for chunk_start in range(0, len(pending_indices), self._GRAPH_BATCH_MAX_REQUESTS):
+                batch_requests = []
+                for index in pending_indices[chunk_start:chunk_start + self._GRAPH_BATCH_MAX_REQUESTS]:
+                    batch_request = {"id": str(index), **requests[index]}
+                    if "body" in requests[index]:
+                        batch_request["headers"] = {**requests[index].get("headers", {}),
+                                                    "Content-Type": "application/json"}
+                    batch_requests.append(batch_request)
+
+                response = self._account.con.post(self._account.protocol.service_url + "$batch",
+                                                  data={"requests": batch_requests})
+                for sub_response in response.json()["responses"]:
+                    responses_by_index[int(sub_response["id"])] = sub_response
+
+            throttled_indices = [i for i in pending_indices
+                                 if responses_by_index[i]["status"] in THROTTLING_STATUS_CODES]
+            if not throttled_indices or attempt >= DEFAULT_RETRY_POLICY.max_retries:
+                break
+            delay_seconds = max(DEFAULT_RETRY_POLICY.get_delay_seconds(
+                attempt, responses_by_index[i].get("headers", {}).get("Retry-After")) for i in throttled_indices)
+            if self._deadline and delay_seconds >= self._deadline.remaining_seconds():
+                break
+            self._logger.info(f"{len(throttled_indices)} batched requests were throttled, retrying them in "
+                              f"{delay_seconds:.1f} seconds")
+            for _ in throttled_indices:
+                record_retry(throttled=True)
+            time.sleep(delay_seconds)
+            pending_indices = throttled_indices
+            attempt += 1
+
+        failures: Dict[int, str] = {}
+        for index in range(len(requests)):
+            status = responses_by_index[index]["status"]
+            if status == 412 and events is not None:
+                try:
+                    self._resolve_conflict(events[index], requests[index]["method"].lower(),
+                                           requests[index].get("body"))
+                except HTTPError as e:
+                    failures[index] = str(e)
+            elif status >= 400:
+                failures[index] = f"status {status}: {responses_by_index[index].get('body')}"
+        if failures:
+            raise BatchRequestError(
+                f"{len(failures)} of {len(requests)} Outlook 365 requests failed (the others succeeded): " +
+                "; ".join(f"{requests[i]['method']} {requests[i]['url']} ({failure})"
+                          for i, failure in failures.items()),
+                failed_indices=list(failures))
+        return [responses_by_index[index] for index in range(len(requests))]
+
+    def _send_event_request(self, event: FocusTimeEvent, method: str, body: Optional[Dict[str, Any]] = None):
+        """
+        Sends one request to the Graph URL of the provided event, addressing it by its Graph event ID. If the event's
+        changeKey is known, the request is conditional (If-Match). Should the event have been modified on the server
+        in the meantime, it is retrieved again, and the request is repeated (conditional on the new changeKey) only if
+        the modification does not conflict with it: the event must still be a focus time event, and it must not have
+        been moved, if it is to be deleted. Otherwise, the request is skipped, leaving the other client's change intact.
+        """
+        if not self._account:
+            raise ValueError("You need to call check_connection_and_credentials() first")
+
+        url = self._account.protocol.service_url + \
+            f"{self._account.main_resource}/events/{self._get_graph_event_id(event)}"
+        headers = self._build_if_match_headers(event).get("headers", {})
+        try:
+            self._account.con.oauth_request(url, method, data=body, headers=headers)
+            return
+        except HTTPError as e:
+            if not headers or e.response is None or e.response.status_code != 412:
+                raise
+        self._resolve_conflict(event, method, body)
+
+    def _resolve_conflict(self, event: FocusTimeEvent, method: str, body: Optional[Dict[str, Any]]):
+        """
+        Handles a conditional request (see _send_event_request()) that failed because the event was modified on the
+        server in the meantime: the request is repeated only if it does not conflict with the modification.
+        """
+        url = self._account.protocol.service_url + \
+            f"{self._account.main_resource}/events/{self._get_graph_event_id(event)}"
+        # The "Prefer" header causes the dates to be returned in UTC (instead of the time zone of the calendar)
+        graph_event = self._account.con.get(url, params={"$select": "subject,start,end,changeKey"},
+                                            headers={"Prefer": 'outlook.timezone="UTC"'}).json()
+        utc = zoneinfo.ZoneInfo("UTC")
+        was_moved = (datetime.fromisoformat(graph_event["start"]["dateTime"]).replace(tzinfo=utc),
+                     datetime.fromisoformat(graph_event["end"]["dateTime"]).replace(tzinfo=utc)) != \
+            (event.start, event.end)
+        if graph_event.get("subject") != self._configuration.focustime_event_name or (method == "delete" and was_moved):
+            self._logger.info(f"Event {event.id} was changed on the server in the meantime, in a way that conflicts "
+                              f"with the {method.upper()} request, which is therefore skipped")
+            return
+        self._logger.info(f"Event {event.id} was modified on the server in the meantime, repeating the "
+                          f"{method.upper()} request")
+        self._account.con.oauth_request(url, method, data=body, headers={"If-Match": f'W/"{graph_event["changeKey"]}"'})
+
+    @staticmethod
+    def _build_if_match_headers(event: FocusTimeEvent) -> Dict[str, Any]:
+        """
+        Returns the "headers" (of a request, or of a batch sub-request) that make the request conditional on the
+        event's changeKey, if it is known.
+        """
+        return {"headers": {"If-Match": f'W/"{event.etag}"'}} if event.etag else {}
+
+    def _get_reminder_in_minutes_for_new_events(self) -> int:
+        if self._configuration.set_event_reminder:
+            return self._configuration.event_reminder_time_minutes
+        return 0
+
+    def _get_graph_event_id(self, event: FocusTimeEvent) -> str:
+        # Note: events created by older versions of this app, or retrieved from the EventStore, may lack the Graph
+        # event ID, thus we fall back to searching the event (which costs an additional request)
+        if event.resource_id:
+            return event.resource_id
+        return self._find_event(event).object_id
+
+    @staticmethod
+    def _build_graph_event_body(subject: Optional[str] = None, from_date: Optional[datetime] = None,
+                                to_date: Optional[datetime] = None,
+                                reminder_in_minutes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Builds the JSON representation of a Graph event that only contains the properties that are not None.
+        """
+        body: Dict[str, Any] = {}
+        if subject is not None:
+            body["subject"] = subject
+        for key, date in [("start", from_date), ("end", to_date)]:
+            if date is not None:
+                body[key] = {"dateTime": date.astimezone(zoneinfo.ZoneInfo("UTC")).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+                             "timeZone": "UTC"}
+        if reminder_in_minutes is not None:
+            body["isReminderOn"] = reminder_in_minutes > 0
+            if reminder_in_minutes > 0:
+                body["reminderMinutesBeforeStart"] = reminder_in_minutes
+        return body
 
     def _find_event(self, event: FocusTimeEvent) -> Event:
         schedule, calendar = self._get_schedule_and_calendar()
@@ -150,8 +435,111 @@ class Outlook365CalendarAdapter(AbstractCalendarAdapter):
             raise ValueError("You need to call check_connection_and_credentials() first")
 
         schedule: Schedule = self._account.schedule()
+        if self._calendar is None:
+            calendar_id = self._event_store.get_metadata(self._CALENDAR_ID_METADATA_KEY) if self._event_store else None
+            if calendar_id:
+                # Note: the EventStore is discarded whenever the calendar name (or any other configuration of the
+                # calendar) changes, so the cached ID belongs to the configured calendar
+                self._calendar = schedule.calendar_constructor(parent=schedule, **{schedule._cloud_data_key: {
+                    "id": calendar_id, "name": self._outlook_configuration.calendar_name}})
+            else:
+                self._calendar = self._resolve_calendar(schedule)
+        return schedule, self._calendar
+
+    def _resolve_calendar(self, schedule: Schedule) -> Calendar:
+        """
+        Retrieves the configured calendar by its name, remembering its ID in the EventStore.
+        """
         calendar = schedule.get_calendar(calendar_name=self._outlook_configuration.calendar_name)
-        return schedule, calendar
+        if calendar is None:
+            raise RuntimeError(f"Unable to find the calendar named '{self._outlook_configuration.calendar_name}'")
+        if self._event_store is not None:
+            self._event_store.set_metadata(self._CALENDAR_ID_METADATA_KEY, calendar.calendar_id)
+        return calendar
+
+    def _create_account(self) -> Account:
+        # Note: we set the "timezone=pytz.UTC" argument only to avoid PytzUsageWarning that point to
+        # https://pytz-deprecation-shim.readthedocs.io/en/latest/migration.html
+        # The issue is known (https://github.com/O365/python-o365/issues/753) but unlikely to be fixed soon
+        account = _PooledAccount(str(self._outlook_configuration.client_id), auth_flow_type="public",
+                                 token_backend=self._backend, timezone=zoneinfo.ZoneInfo("UTC"),
+                                 tenant_id=self._outlook_configuration.tenant_id or OUTLOOK365_OAUTH_COMMON_TENANT)
+        self._configure_connection(account.con)
+        return account
+
+    def _configure_connection(self, connection: _PooledConnection):
+        connection.connection_pool_size = self._configuration.http_connection_pool_size
+        connection.max_requests_per_second = self._configuration.http_max_requests_per_second
+        connection.deadline_provider = lambda: self._deadline
+
+    def _get_events_with_delta_query(self, calendar: Calendar, from_date: datetime,
+                                     to_date: datetime) -> list[FocusTimeEvent]:
+        delta_state: Optional[Outlook365DeltaState] = None
+        if serialized_delta_state := self._event_store.get_metadata(self._DELTA_STATE_METADATA_KEY):
+            delta_state = Outlook365DeltaState.from_json(serialized_delta_state)
+
+        if delta_state is None or not delta_state.covers(from_date, to_date):
+            delta_state = self._create_delta_state(calendar, from_date, to_date + self._DELTA_WINDOW_EXTENSION)
+        else:
+            try:
+                self._apply_delta(delta_state, delta_state.delta_link)
+            except HTTPError as e:
+                if e.response is None or e.response.status_code != 410:
+                    raise
+                # The deltaLink has expired (or the server has discarded its synchronization state)
+                self._logger.info("The deltaLink is no longer valid, retrieving all events again")
+                delta_state = self._create_delta_state(calendar, from_date, to_date + self._DELTA_WINDOW_EXTENSION)
+
+        self._event_store.set_metadata(self._DELTA_STATE_METADATA_KEY, delta_state.to_json())
+
+        events: List[FocusTimeEvent] = []
+        for graph_event_id, e in delta_state.events.items():
+            event = FocusTimeEvent(id=e["ical_uid"], start=datetime.fromisoformat(e["start"]),
+                                   end=datetime.fromisoformat(e["end"]), reminder_in_minutes=e["reminder_in_minutes"],
+                                   etag=e["change_key"], resource_id=graph_event_id)
+            if event.start >= from_date and event.end <= to_date:
+                events.append(event)
+        events.sort(key=lambda e: e.start)
+        return events
+
+    def _create_delta_state(self, calendar: Calendar, from_date: datetime,
+                            to_date: datetime) -> Outlook365DeltaState:
+        delta_state = Outlook365DeltaState(from_date=from_date, to_date=to_date)
+        url = calendar.build_url(f"/calendars/{calendar.calendar_id}/calendarView/delta")
+        params = {"startDateTime": from_date.astimezone(zoneinfo.ZoneInfo("UTC")).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                  "endDateTime": to_date.astimezone(zoneinfo.ZoneInfo("UTC")).strftime("%Y-%m-%dT%H:%M:%SZ")}
+        self._apply_delta(delta_state, url, params)
+        return delta_state
+
+    def _apply_delta(self, delta_state: Outlook365DeltaState, url: str, params: Optional[Dict[str, str]] = None):
+        """
+        Follows the nextLinks of the provided (delta query) URL, applying the returned changes to the delta_state,
+        until the server returns a new deltaLink.
+        """
+        while url:
+            # The "Prefer" header causes all dates to be returned in UTC (instead of the time zone of the calendar)
+            response = self._account.con.get(url, params=params, headers={"Prefer": 'outlook.timezone="UTC"'})
+            params = None  # nextLinks and deltaLinks already contain all query parameters
+            data = response.json()
+            for graph_event in data.get("value", []):
+                if "@removed" in graph_event or graph_event.get("subject") != self._configuration.focustime_event_name:
+                    delta_state.events.pop(graph_event["id"], None)
+                    continue
+
+                utc = zoneinfo.ZoneInfo("UTC")
+                delta_state.events[graph_event["id"]] = {
+                    "ical_uid": graph_event["iCalUId"],
+                    "start": datetime.fromisoformat(graph_event["start"]["dateTime"]).replace(tzinfo=utc).isoformat(),
+                    "end": datetime.fromisoformat(graph_event["end"]["dateTime"]).replace(tzinfo=utc).isoformat(),
+                    "reminder_in_minutes": graph_event["reminderMinutesBeforeStart"]
+                    if graph_event["isReminderOn"] else 0,
+                    "change_key": graph_event.get("changeKey")
+                }
+
+            if "@odata.deltaLink" in data:
+                delta_state.delta_link = data["@odata.deltaLink"]
+                return
+            url = data.get("@odata.nextLink")
 
     def _get_client_id(self) -> str:
         return typer.prompt("Provide the Client ID of your Azure App registration", prompt_suffix='\n')
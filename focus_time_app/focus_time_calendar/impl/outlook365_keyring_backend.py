@@ -9,9 +9,10 @@ from focus_time_app.focus_time_calendar.impl.keyring_credentials_store import Ke
 
 
 class Outlook365KeyringBackend(BaseTokenBackend):
-    def __init__(self, namespace_override: Optional[str] = None):
+    def __init__(self, namespace_override: Optional[str] = None, use_disk_cache: bool = False):
         super().__init__()
-        self._credentials_store = KeyringCredentialsStore(namespace_override=namespace_override)
+        self._credentials_store = KeyringCredentialsStore(namespace_override=namespace_override,
+                                                          use_disk_cache=use_disk_cache)
         self._logger = logging.getLogger(type(self).__name__)
 
     def load_token(self):
@@ -35,15 +36,9 @@ class Outlook365KeyringBackend(BaseTokenBackend):
             raise ValueError('You have to set the "token" first.')
 
         password_string = json.dumps(self.token)
-
-        try:
-            # Avoid problems in rare cases where save_token() would not override ALL slots, and load_token() would
-            # not detect it (via JSONDecodeError), causing errors such as
-            # "CompactToken parsing failed with error code: 80049217"
-            self.delete_token()
-        except:
-            pass
-
+        # Note: there is no need to delete the old token first, because KeyringCredentialsStore tracks the exact number
+        # of slots (and their hashes) in a manifest, so that a shorter token cannot be mixed with the leftover slots of
+        # the old one (which caused errors such as "CompactToken parsing failed with error code: 80049217")
         self._credentials_store.save_credentials(password_string)
         return True
 
@@ -18,3 +18,15 @@ def get_active_focustime_event(events: List[FocusTimeEvent]) -> Optional[FocusTi
     for event in events:
         if event.start <= now <= event.end:
             return event
+
+
+def get_next_focustime_transition(events: List[FocusTimeEvent], now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Returns the earliest point in time (after <now>) at which the result of get_active_focustime_event() changes for
+    the provided events, i.e., when a focus time event starts or ends. Returns None if there is no such transition.
+    """
+    now = now or datetime.now(ZoneInfo('UTC'))
+    transitions = [event.start for event in events if event.start > now]
+    # Note: get_active_focustime_event() considers an event to be active until (and including) its end
+    transitions.extend(event.end + timedelta(microseconds=1) for event in events if event.end >= now)
+    return min(transitions, default=None)
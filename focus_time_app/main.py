@@ -2,6 +2,7 @@ import logging
 import os.path
 import sys
 from logging.handlers import RotatingFileHandler
+from typing import List, Optional
 
 import typer
 
@@ -13,6 +14,9 @@ from focus_time_app.cli.cli import app
 from focus_time_app.configuration.persistence import Persistence
 from focus_time_app.utils.compatibility_checker import check_os_compatibility
 
+# The long-running "daemon" command uses a dedicated lock, so that it does not block the other commands
+DAEMON_SINGLE_INSTANCE_FLAVOR = "daemon"
+
 
 def configure_logging():
     log_file_path = Persistence.get_storage_directory() / "log.txt"
@@ -54,11 +58,22 @@ def configure_exception_hook():
     setattr(typer.main, "_original_except_hook", handle_unhandled_exception)
 
 
+def get_invoked_command(args: List[str]) -> Optional[str]:
+    """
+    Returns the name of the command that the provided command line arguments invoke. The command is the first
+    positional argument, because all global options (e.g. "--trace-http", see cli.main()) are flags without a value.
+    """
+    return next((arg for arg in args if not arg.startswith("-")), None)
+
+
 if __name__ == '__main__':
     configure_logging()
     configure_exception_hook()
+    # Note: the command might be preceded by global options, such as "--trace-http"
+    is_daemon = get_invoked_command(sys.argv[1:]) == "daemon"
     try:
-        SingleInstance()
+        # Note: we need to keep a reference, because the lock is released once the object is garbage-collected
+        single_instance = SingleInstance(flavor_id=DAEMON_SINGLE_INSTANCE_FLAVOR if is_daemon else "")
     except SingleInstanceException:
         print("Another instance of the Focus time app is already running")
         exit(1)
@@ -0,0 +1,49 @@
+import time
+from typing import Optional, Union, Tuple
+
+Timeout = Union[None, float, Tuple[Optional[float], Optional[float]]]
+
+
+class DeadlineExceededError(TimeoutError):
+    """
+    Raised if an operation is about to start after the Deadline has expired.
+    """
+
+
+class Deadline:
+    """
+    Point in time (measured with the monotonic clock) by which an operation, such as a sync run, must have finished.
+    Blocking calls (HTTP requests, subprocesses) use get_timeout() as their timeout, so that a stalled calendar server
+    or command cannot block the operation for longer than its time budget.
+    """
+
+    def __init__(self, seconds: float):
+        self._seconds = seconds
+        self._expires_at = time.monotonic() + seconds
+
+    @staticmethod
+    def from_seconds(seconds: float) -> Optional["Deadline"]:
+        """
+        Returns a Deadline that expires in <seconds> seconds, or None (meaning "no deadline") if seconds is 0.
+        """
+        return Deadline(seconds) if seconds > 0 else None
+
+    def remaining_seconds(self) -> float:
+        return max(self._expires_at - time.monotonic(), 0.0)
+
+    def is_expired(self) -> bool:
+        return self.remaining_seconds() == 0
+
+    def get_timeout(self, timeout: Timeout = None) -> Timeout:
+        """
+        Returns the timeout (in seconds) for a blocking call, which is the remaining time, or the provided timeout if it
+        is shorter. A (connect, read) tuple (as used by the requests library) is limited element-wise.
+
+        Raises a DeadlineExceededError if the deadline has already expired.
+        """
+        remaining_seconds = self.remaining_seconds()
+        if remaining_seconds == 0:
+            raise DeadlineExceededError(f"The deadline of {self._seconds} seconds has been exceeded")
+        if isinstance(timeout, tuple):
+            return tuple(remaining_seconds if t is None else min(t, remaining_seconds) for t in timeout)
+        return remaining_seconds if timeout is None else min(timeout, remaining_seconds)
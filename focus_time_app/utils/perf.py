@@ -0,0 +1,183 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Dict, Iterator, List
+
+# Names of the phases of a synchronization, in the order in which they (typically) happen
+PHASE_CONFIG_LOAD = "config_load"
+PHASE_CREDENTIAL_LOAD = "credential_load"
+PHASE_CONNECTION_CHECK = "connection_check"
+PHASE_GET_EVENTS = "get_events"
+PHASE_REMINDER_ADJUSTMENT = "reminder_adjustment"
+PHASE_COMMAND_EXECUTION = "command_execution"
+PHASE_NOTIFICATION = "notification"
+PHASE_TOTAL = "total"
+
+PERF_HISTORY_FILE_NAME = "perf-history.jsonl"
+# Number of runs that are kept in the history file
+MAX_RECORDED_RUNS = 1000
+# The history file is only trimmed (to the most recent MAX_RECORDED_RUNS runs) once it exceeds this size, so that not
+# every run has to rewrite the file
+_MAX_HISTORY_FILE_SIZE_BYTES = 512 * 1024
+
+
+@dataclass
+class RunRecord:
+    """
+    Durations (in milliseconds) of the phases of one run of a command. A phase that happened several times (e.g.
+    command_execution in the "start" command, which runs a sync internally) contains the sum of its durations.
+    """
+    command: str
+    started_at: float  # seconds since the epoch
+    succeeded: bool = True
+    spans: Dict[str, float] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps({"command": self.command, "started_at": round(self.started_at, 3),
+                           "succeeded": self.succeeded,
+                           "spans": {name: round(ms, 2) for name, ms in self.spans.items()}},
+                          separators=(",", ":"))
+
+    @staticmethod
+    def from_json(value: str) -> "RunRecord":
+        d = json.loads(value)
+        return RunRecord(command=d["command"], started_at=d["started_at"], succeeded=d["succeeded"], spans=d["spans"])
+
+
+_current_run: Optional[RunRecord] = None
+_lock = threading.Lock()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Measures the duration of the enclosed block (with the monotonic clock) as phase <name> of the current run. Does
+    nothing (except measuring the time) if no run is being recorded, see record_run().
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        with _lock:
+            if _current_run is not None:
+                _current_run.spans[name] = _current_run.spans.get(name, 0.0) + duration_ms
+
+
+@contextmanager
+def record_run(command: str, history_file_path: Path) -> Iterator[RunRecord]:
+    """
+    Records the spans of the enclosed block as one run of <command>, which is appended to the history file once the
+    block has finished (also if it failed). Nested calls record into the outer run.
+    """
+    global _current_run
+    with _lock:
+        if _current_run is not None:
+            outer_run = _current_run
+        else:
+            outer_run = None
+            _current_run = RunRecord(command=command, started_at=time.time())
+        run = _current_run
+
+    if outer_run is not None:
+        yield run
+        return
+
+    start = time.perf_counter()
+    try:
+        yield run
+    except BaseException as e:
+        # Note: typer.Exit(code=0) is raised by commands that successfully finished early
+        run.succeeded = getattr(e, "exit_code", 1) == 0
+        raise
+    finally:
+        run.spans[PHASE_TOTAL] = (time.perf_counter() - start) * 1000
+        with _lock:
+            _current_run = None
+        try:
+            _append_to_history(run, history_file_path)
+        except OSError as e:
+            logging.getLogger("perf").warning(f"Unable to record the timings of the run: {e}")
+
+
+def _append_to_history(run: RunRecord, history_file_path: Path):
+    history_file_path.parent.mkdir(parents=True, exist_ok=True)
+    with history_file_path.open("at", encoding="utf-8") as f:
+        f.write(run.to_json() + "\n")
+
+    if history_file_path.stat().st_size > _MAX_HISTORY_FILE_SIZE_BYTES:
+        _trim_history(history_file_path)
+
+
+def _trim_history(history_file_path: Path):
+    """
+    Reduces the history file to the most recent MAX_RECORDED_RUNS runs. Because other processes (e.g. the daemon and
+    the "sync" command) append to the file concurrently, the trimmed history is written to a temporary file, together
+    with the runs that were appended in the meantime, which then atomically replaces the history file.
+    """
+    content = history_file_path.read_bytes()
+    lines = content.splitlines(keepends=True)
+    temp_file_path = history_file_path.with_name(f"{history_file_path.name}.{os.getpid()}.tmp")
+    try:
+        with temp_file_path.open("wb") as f:
+            f.write(b"".join(lines[-MAX_RECORDED_RUNS:]))
+            with history_file_path.open("rb") as history_file:
+                history_file.seek(len(content))
+                f.write(history_file.read())
+        os.replace(temp_file_path, history_file_path)
+    except OSError:
+        temp_file_path.unlink(missing_ok=True)
+        raise
+
+
+def load_history(history_file_path: Path, max_runs: int, command: Optional[str] = None) -> List[RunRecord]:
+    """
+    Returns the most recent <max_runs> recorded runs (optionally only those of <command>), oldest first. Corrupt lines
+    (e.g. written by a run that was killed) are skipped.
+    """
+    try:
+        lines = history_file_path.read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return []
+
+    runs = []
+    for line in lines:
+        try:
+            run = RunRecord.from_json(line)
+        except (ValueError, KeyError, TypeError):
+            continue
+        if command is None or run.command == command:
+            runs.append(run)
+    return runs[-max_runs:] if max_runs > 0 else runs
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    Returns the p-th percentile (nearest-rank method) of the (ascending) values.
+    """
+    if not sorted_values:
+        raise ValueError("Cannot compute the percentile of an empty list")
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize_phases(runs: List[RunRecord]) -> Dict[str, List[float]]:
+    """
+    Returns the (ascending) durations of each phase that occurred in the provided runs, by phase name. The phases are
+    ordered by the order of their first occurrence, with the "total" phase last.
+    """
+    durations_by_phase: Dict[str, List[float]] = {}
+    for run in runs:
+        for name, duration_ms in run.spans.items():
+            if name != PHASE_TOTAL:
+                durations_by_phase.setdefault(name, []).append(duration_ms)
+    totals = [run.spans[PHASE_TOTAL] for run in runs if PHASE_TOTAL in run.spans]
+    if totals:
+        durations_by_phase[PHASE_TOTAL] = totals
+    return {name: sorted(durations) for name, durations in durations_by_phase.items()}
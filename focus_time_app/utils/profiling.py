@@ -0,0 +1,126 @@
+import cProfile
+import logging
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Optional, List, Dict
+
+# Keep the values in sync with the README. The environment variables allow profiling runs whose command line cannot be
+# changed easily, e.g. the "sync" command started by the background scheduler
+PROFILE_ENV_VAR_NAME = "FOCUS_TIME_APP_PROFILE"
+PROFILE_STACKS_ENV_VAR_NAME = "FOCUS_TIME_APP_PROFILE_STACKS"
+
+PROFILES_DIRECTORY_NAME = "profiles"
+# Number of profiles (each consisting of a .pstats and possibly a .collapsed file) that are kept in the profiles
+# directory, because the background job (see PROFILE_ENV_VAR_NAME) writes a new profile every minute
+MAX_KEPT_PROFILES = 100
+_PROFILE_FILE_SUFFIXES = (".pstats", ".collapsed")
+
+
+class _StackSampler:
+    """
+    Periodically samples the call stack of one thread, and counts how often each (collapsed) stack was seen. The
+    resulting file (one "frame;frame;frame <count>" line per stack) can be rendered by flamegraph tools, such as
+    flamegraph.pl or speedscope.
+    """
+    SAMPLING_INTERVAL_SECONDS = 0.005
+
+    def __init__(self, thread_id: int):
+        self._thread_id = thread_id
+        self._stack_counts: Counter = Counter()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="StackSampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self._thread.join()
+        return self._stack_counts
+
+    def _sample(self):
+        while not self._stop_event.wait(self.SAMPLING_INTERVAL_SECONDS):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._stack_counts[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame: Optional[FrameType]) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}:{code.co_firstlineno}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+class CommandProfiler:
+    """
+    Profiles the execution of a CLI command with cProfile (deterministic, in the calling thread only), and optionally
+    also samples its call stacks for flame graphs. The results are written to timestamped files in <directory>:
+    a ".pstats" file (to be inspected with "python -m pstats <file>", or tools like snakeviz), and a ".collapsed"
+    file. Only the most recent MAX_KEPT_PROFILES profiles are kept, older ones are deleted.
+
+    Both only rely on the standard library, thus they also work in the frozen (PyInstaller) build.
+    """
+
+    def __init__(self, command: str, directory: Path, sample_stacks: bool = False):
+        self._command = command
+        self._directory = directory
+        self._profile = cProfile.Profile()
+        self._stack_sampler = _StackSampler(threading.get_ident()) if sample_stacks else None
+        self._logger = logging.getLogger(type(self).__name__)
+
+    def start(self):
+        if self._stack_sampler:
+            self._stack_sampler.start()
+        self._profile.enable()
+
+    def stop(self) -> List[Path]:
+        """
+        Stops profiling and returns the paths of the written files.
+        """
+        self._profile.disable()
+        stack_counts = self._stack_sampler.stop() if self._stack_sampler else None
+
+        self._directory.mkdir(parents=True, exist_ok=True)
+        # Note: the process ID avoids collisions of concurrently running commands (e.g. "sync" and "daemon")
+        file_name_prefix = f"{self._command}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        pstats_path = self._directory / f"{file_name_prefix}.pstats"
+        self._profile.dump_stats(pstats_path)
+        written_paths = [pstats_path]
+
+        if stack_counts is not None:
+            collapsed_path = self._directory / f"{file_name_prefix}.collapsed"
+            collapsed_path.write_text("".join(f"{stack} {count}\n" for stack, count in stack_counts.items()),
+                                      encoding="utf-8")
+            written_paths.append(collapsed_path)
+
+        self._logger.info(f"Wrote the profile of the '{self._command}' command to "
+                          f"{', '.join(str(p) for p in written_paths)}")
+        self._delete_old_profiles()
+        return written_paths
+
+    def _delete_old_profiles(self):
+        profile_files_by_name: Dict[str, List[Path]] = defaultdict(list)
+        for path in self._directory.iterdir():
+            if path.suffix in _PROFILE_FILE_SUFFIXES:
+                profile_files_by_name[path.stem].append(path)
+        if len(profile_files_by_name) <= MAX_KEPT_PROFILES:
+            return
+
+        def get_modification_time(paths: List[Path]) -> float:
+            try:
+                return max(path.stat().st_mtime for path in paths)
+            except FileNotFoundError:
+                return 0  # deleted by a concurrently running command in the meantime
+
+        profiles = sorted(profile_files_by_name.values(), key=get_modification_time)
+        for paths in profiles[:-MAX_KEPT_PROFILES]:
+            for path in paths:
+                path.unlink(missing_ok=True)
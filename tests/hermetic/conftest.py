@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Union
+
+import pytest
+
+from focus_time_app.cli.commands import sync_command
+from focus_time_app.command_execution.abstract_command_executor import CommandExecutorConstants
+from focus_time_app.configuration.configuration import ConfigurationV1
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter
+from focus_time_app.focus_time_calendar.caching_calendar_adapter import CachingCalendarAdapter
+from focus_time_app.focus_time_calendar.event import CalendarType
+from focus_time_app.focus_time_calendar.event_store import EventStore
+from tests.utils.caldav_stand_in_server import CaldavStandInServer
+from tests.utils.fake_command_executor import FakeCommandExecutor
+from tests.utils.fake_os_notification import FakeOsNotification
+from tests.utils.graph_stand_in_server import GraphStandInServer
+from tests.utils.stand_in_calendar_adapters import create_stand_in_adapter, create_stand_in_configuration, \
+    store_stand_in_credentials, stand_in_environment
+
+STAND_IN_SERVER_CLASSES = {
+    CalendarType.Outlook365: GraphStandInServer,
+    CalendarType.CalDAV: CaldavStandInServer,
+}
+
+
+@dataclass
+class StandInCalendar:
+    server: Union[CaldavStandInServer, GraphStandInServer]
+    configuration: ConfigurationV1
+    # The adapter under test, which is wrapped in a CachingCalendarAdapter in the "incremental" mode (like in the CLI)
+    calendar_adapter: AbstractCalendarAdapter
+    # An adapter without EventStore, which plays the role of another calendar client (e.g. the user's calendar app)
+    other_client_adapter: AbstractCalendarAdapter
+
+
+@pytest.fixture(autouse=True)
+def hermetic_environment(tmp_path: Path) -> Iterator[None]:
+    """
+    Ensures that no test touches the storage directory (e.g. the configuration or the ongoing focus time marker file)
+    or the credentials of the installed app, which also allows running the tests in parallel (e.g. "pytest -n auto").
+    """
+    storage_directory = tmp_path / "storage"
+    storage_directory.mkdir()
+    with stand_in_environment(storage_directory):
+        yield
+
+
+@pytest.fixture(params=[CalendarType.Outlook365, CalendarType.CalDAV], ids=lambda t: t.name)
+def stand_in_server(request) -> Iterator[Union[CaldavStandInServer, GraphStandInServer]]:
+    with STAND_IN_SERVER_CLASSES[request.param]() as server:
+        store_stand_in_credentials(server)
+        yield server
+
+
+@pytest.fixture(params=["full", "incremental"])
+def stand_in_calendar(request, stand_in_server, tmp_path: Path) -> Iterator[StandInCalendar]:
+    incremental = request.param == "incremental"
+    configuration = create_stand_in_configuration(
+        stand_in_server, use_delta_queries=incremental, focustime_event_name="Focustime-hermetic",
+        start_commands=[CommandExecutorConstants.DND_START_COMMAND, "echo start"],
+        stop_commands=[CommandExecutorConstants.DND_STOP_COMMAND, "echo stop"], show_notification=True,
+        http_max_requests_per_second=0)  # the rate limit would only slow down the tests
+    event_store = EventStore(configuration, tmp_path / EventStore.DATABASE_FILE_NAME) if incremental else None
+    # Note: the delay that the O365 library enforces between requests would only slow down the tests
+    calendar_adapter = create_stand_in_adapter(configuration, stand_in_server, event_store, o365_requests_delay_ms=0)
+    if event_store:
+        calendar_adapter = CachingCalendarAdapter(configuration, calendar_adapter, event_store)
+    other_client_adapter = create_stand_in_adapter(configuration, stand_in_server, o365_requests_delay_ms=0)
+
+    yield StandInCalendar(server=stand_in_server, configuration=configuration, calendar_adapter=calendar_adapter,
+                          other_client_adapter=other_client_adapter)
+
+    if event_store:
+        event_store.close()
+
+
+@pytest.fixture
+def fake_command_executor(monkeypatch) -> FakeCommandExecutor:
+    command_executor = FakeCommandExecutor()
+    monkeypatch.setattr(sync_command, "CommandExecutorImpl", command_executor)
+    return command_executor
+
+
+@pytest.fixture
+def fake_os_notification(monkeypatch) -> FakeOsNotification:
+    os_notification = FakeOsNotification()
+    monkeypatch.setattr(sync_command, "OsNativeNotificationImpl", os_notification)
+    return os_notification
@@ -0,0 +1,277 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from focus_time_app.focus_time_calendar.event import FocusTimeEventUpdate, CalendarType
+from focus_time_app.focus_time_calendar.impl.outlook365_calendar_adapter import BatchRequestError
+from tests import now_without_micros
+from tests.hermetic.conftest import StandInCalendar
+from tests.utils.synthetic_calendar import SyntheticEvent, seed_calendar
+
+
+class TestCalendarAdapters:
+    """
+    Tests the calendar adapters (in the "full" and in the "incremental" mode) against the stand-in calendar servers,
+    like TestCalendar does against the real calendar servers.
+    """
+
+    def test_adapter_query_timeframes(self, stand_in_calendar: StandInCalendar):
+        adapter = stand_in_calendar.calendar_adapter
+        assert not adapter.get_events()
+
+        now = now_without_micros()
+        from_date = now + timedelta(minutes=30)
+        to_date = now + timedelta(minutes=60)
+        created_event = adapter.create_event(from_date, to_date)
+
+        events = adapter.get_events()
+        assert len(events) == 1
+        assert events[0].id == created_event.id
+        assert events[0].start == from_date
+        assert events[0].end == to_date
+        assert events[0].reminder_in_minutes == stand_in_calendar.configuration.event_reminder_time_minutes
+
+        empty_query_from = now + timedelta(hours=2)
+        assert not adapter.get_events(date_range=(empty_query_from, empty_query_from + timedelta(hours=5)))
+
+    def test_adapter_ignores_other_events(self, stand_in_calendar: StandInCalendar):
+        """
+        Verifies that get_events() only returns the focus time events (including the occurrences of recurring ones)
+        within the configured time window, but none of the other events.
+        """
+        now = now_without_micros()
+        focustime_event_name = stand_in_calendar.configuration.focustime_event_name
+        seed_calendar(stand_in_calendar.server, [
+            SyntheticEvent(uid="focus-now", subject=focustime_event_name, start=now - timedelta(minutes=30),
+                           end=now + timedelta(minutes=30), reminder_minutes=15, occurrences=1),
+            # Only the occurrence of today lies within the time window
+            SyntheticEvent(uid="focus-daily", subject=focustime_event_name, start=now - timedelta(days=2, hours=-1),
+                           end=now - timedelta(days=2, hours=-2), reminder_minutes=0, occurrences=5),
+            SyntheticEvent(uid="focus-tomorrow", subject=focustime_event_name, start=now + timedelta(days=1),
+                           end=now + timedelta(days=1, hours=1), reminder_minutes=15, occurrences=1),
+            SyntheticEvent(uid="meeting", subject="Meeting", start=now - timedelta(minutes=30),
+                           end=now + timedelta(minutes=30), reminder_minutes=15, occurrences=1),
+            SyntheticEvent(uid="daily-meeting", subject="Daily meeting", start=now - timedelta(days=1),
+                           end=now - timedelta(days=1, minutes=-15), reminder_minutes=0, occurrences=3),
+        ])
+
+        events = sorted(stand_in_calendar.calendar_adapter.get_events(), key=lambda e: e.start)
+        assert [(e.start, e.end, e.reminder_in_minutes) for e in events] == [
+            (now - timedelta(minutes=30), now + timedelta(minutes=30), 15),
+            (now + timedelta(hours=1), now + timedelta(hours=2), 0),
+        ]
+
+    def test_adapter_remove_event(self, stand_in_calendar: StandInCalendar):
+        adapter = stand_in_calendar.calendar_adapter
+        now = now_without_micros()
+        created_event1 = adapter.create_event(now + timedelta(minutes=30), now + timedelta(minutes=60))
+        created_event2 = adapter.create_event(now + timedelta(minutes=60), now + timedelta(minutes=90))
+
+        adapter.remove_event(created_event1)
+
+        events = adapter.get_events()
+        assert len(events) == 1
+        assert events[0].id == created_event2.id
+        assert events[0].start == now + timedelta(minutes=60)
+        assert events[0].end == now + timedelta(minutes=90)
+
+    def test_adapter_remove_non_existent_event(self, stand_in_calendar: StandInCalendar):
+        adapter = stand_in_calendar.calendar_adapter
+        now = now_without_micros()
+        created_event = adapter.create_event(now + timedelta(minutes=30), now + timedelta(minutes=60))
+
+        adapter.remove_event(created_event)
+
+        with pytest.raises(Exception):  # the concrete error depends on the implementation
+            adapter.remove_event(created_event)
+
+    def test_adapter_update_event(self, stand_in_calendar: StandInCalendar):
+        adapter = stand_in_calendar.calendar_adapter
+        now = now_without_micros()
+        from_date1 = now + timedelta(minutes=30)
+        to_date1 = now + timedelta(minutes=60)
+        created_event = adapter.create_event(from_date1, to_date1)
+
+        adapter.update_event(event=created_event, reminder_in_minutes=100)
+        events = adapter.get_events()
+        assert len(events) == 1
+        assert events[0].reminder_in_minutes == 100
+
+        from_date2 = now - timedelta(minutes=30)
+        adapter.update_event(event=created_event, from_date=from_date2)
+        events = adapter.get_events()
+        assert len(events) == 1
+        assert (events[0].start, events[0].end, events[0].reminder_in_minutes) == (from_date2, to_date1, 100)
+
+        adapter.update_event(event=created_event, to_date=now)
+        events = adapter.get_events()
+        assert len(events) == 1
+        assert (events[0].start, events[0].end, events[0].reminder_in_minutes) == (from_date2, now, 100)
+
+        adapter.update_event(event=created_event, reminder_in_minutes=0)
+        events = adapter.get_events()
+        assert len(events) == 1
+        assert events[0].reminder_in_minutes == 0
+
+    def test_adapter_bulk_operations(self, stand_in_calendar: StandInCalendar):
+        adapter = stand_in_calendar.calendar_adapter
+        now = now_without_micros()
+        date_ranges = [(now + timedelta(minutes=i * 30), now + timedelta(minutes=i * 30 + 15)) for i in range(4)]
+
+        created_events = adapter.create_events(date_ranges)
+        assert [(e.start, e.end) for e in created_events] == date_ranges
+
+        adapter.update_events([FocusTimeEventUpdate(event, reminder_in_minutes=5) for event in created_events[:2]])
+        adapter.remove_events(created_events[2:])
+
+        events = sorted(adapter.get_events(), key=lambda e: e.start)
+        assert [(e.start, e.end, e.reminder_in_minutes) for e in events] == [
+            (start, end, 5) for start, end in date_ranges[:2]]
+
+    def test_adapter_sees_changes_of_other_clients(self, stand_in_calendar: StandInCalendar):
+        """
+        Verifies that get_events() returns the events that another calendar client created, updated or removed since
+        the previous call, which the "incremental" mode must detect with its sync tokens or delta queries.
+        """
+        adapter = stand_in_calendar.calendar_adapter
+        other_client_adapter = stand_in_calendar.other_client_adapter
+        assert not adapter.get_events()
+
+        now = now_without_micros()
+        created_event1 = other_client_adapter.create_event(now, now + timedelta(minutes=30))
+        created_event2 = other_client_adapter.create_event(now + timedelta(hours=1), now + timedelta(hours=2))
+        assert sorted(e.id for e in adapter.get_events()) == sorted([created_event1.id, created_event2.id])
+
+        other_client_adapter.update_event(created_event1, to_date=now + timedelta(minutes=45))
+        other_client_adapter.remove_event(created_event2)
+        events = adapter.get_events()
+        assert len(events) == 1
+        assert (events[0].id, events[0].end) == (created_event1.id, now + timedelta(minutes=45))
+
+    @pytest.mark.parametrize("stand_in_server", [CalendarType.CalDAV], ids=["CalDAV"], indirect=True)
+    def test_adapter_bulk_operation_as_first_operation(self, stand_in_calendar: StandInCalendar):
+        """
+        Verifies that a bulk operation also works if it sends the very first requests of the adapter, i.e. while the
+        DAVClient does not know the authentication method yet (which it determines from the first response with status
+        401, in a way that is not thread-safe).
+        """
+        now = now_without_micros()
+        date_ranges = [(now + timedelta(minutes=i * 30), now + timedelta(minutes=i * 30 + 15)) for i in range(16)]
+
+        created_events = stand_in_calendar.calendar_adapter.create_events(date_ranges)
+
+        assert [(e.start, e.end) for e in created_events] == date_ranges
+
+    def test_adapter_keeps_changes_of_other_clients(self, stand_in_calendar: StandInCalendar):
+        """
+        Verifies that update_event() keeps the changes that another calendar client made since the event was created
+        (which makes the conditional update fail at first).
+        """
+        adapter = stand_in_calendar.calendar_adapter
+        now = now_without_micros()
+        created_event = adapter.create_event(now + timedelta(minutes=30), now + timedelta(minutes=60))
+
+        stand_in_calendar.other_client_adapter.update_event(created_event, reminder_in_minutes=42)
+        adapter.update_event(created_event, to_date=now + timedelta(minutes=90))
+
+        events = adapter.get_events()
+        assert [(e.end, e.reminder_in_minutes) for e in events] == [(now + timedelta(minutes=90), 42)]
+
+    @pytest.mark.parametrize("stand_in_server", [CalendarType.Outlook365], ids=["Outlook365"], indirect=True)
+    def test_adapter_does_not_remove_events_moved_by_other_clients(self, stand_in_calendar: StandInCalendar):
+        adapter = stand_in_calendar.calendar_adapter
+        now = now_without_micros()
+        created_event = adapter.create_event(now + timedelta(minutes=30), now + timedelta(minutes=60))
+
+        stand_in_calendar.other_client_adapter.update_event(created_event, to_date=now + timedelta(minutes=90))
+        adapter.remove_event(created_event)
+
+        assert [(e.id, e.end) for e in stand_in_calendar.other_client_adapter.get_events()] == [
+            (created_event.id, now + timedelta(minutes=90))]
+
+    @pytest.mark.parametrize("stand_in_server", [CalendarType.Outlook365], ids=["Outlook365"], indirect=True)
+    def test_bulk_operations_keep_changes_of_other_clients(self, stand_in_calendar: StandInCalendar):
+        """
+        Verifies that update_events() and remove_events() handle events that another calendar client modified in the
+        meantime just like update_event() and remove_event() do.
+        """
+        adapter = stand_in_calendar.calendar_adapter
+        server = stand_in_calendar.server
+        now = now_without_micros()
+        events = adapter.create_events([(now + timedelta(minutes=30), now + timedelta(minutes=60)),
+                                        (now + timedelta(minutes=90), now + timedelta(minutes=120)),
+                                        (now + timedelta(minutes=150), now + timedelta(minutes=180))])
+
+        # The first event is renamed (and thus no longer a focus time event), the second one is moved
+        server.handle("PATCH", f"me/events/{events[0].resource_id}", {}, {}, {"subject": "Meeting"})
+        stand_in_calendar.other_client_adapter.update_event(events[1], to_date=now + timedelta(minutes=130))
+        adapter.update_events([FocusTimeEventUpdate(event, reminder_in_minutes=42) for event in events])
+        adapter.remove_events(events)
+
+        reminder_minutes = stand_in_calendar.configuration.event_reminder_time_minutes
+        assert sorted((e.start, e.subject, e.end, e.reminder_minutes) for e in server.get_events()) == [
+            (now + timedelta(minutes=30), "Meeting", now + timedelta(minutes=60), reminder_minutes),
+            (now + timedelta(minutes=90), stand_in_calendar.configuration.focustime_event_name,
+             now + timedelta(minutes=130), 42)]
+
+    @pytest.mark.parametrize("stand_in_server", [CalendarType.Outlook365], ids=["Outlook365"], indirect=True)
+    def test_bulk_operations_report_failed_requests(self, stand_in_calendar: StandInCalendar):
+        adapter = stand_in_calendar.calendar_adapter
+        now = now_without_micros()
+        events = adapter.create_events([(now + timedelta(minutes=30), now + timedelta(minutes=60)),
+                                        (now + timedelta(minutes=90), now + timedelta(minutes=120))])
+
+        stand_in_calendar.other_client_adapter.remove_event(events[0])
+        with pytest.raises(BatchRequestError) as e:
+            adapter.update_events([FocusTimeEventUpdate(event, reminder_in_minutes=42) for event in events])
+        assert e.value.failed_indices == [0]
+        assert events[0].resource_id in str(e.value)
+        assert [e.reminder_minutes for e in stand_in_calendar.server.get_events()] == [42]
+
+    @pytest.mark.parametrize("stand_in_server", [CalendarType.CalDAV], ids=["CalDAV"], indirect=True)
+    def test_update_keeps_time_zone_of_event(self, stand_in_calendar: StandInCalendar):
+        """
+        Verifies that update_event() does not rewrite an event (created by another client in a specific time zone) in
+        the form that the server returns for expanded queries (in UTC, without VTIMEZONE).
+        """
+        now = now_without_micros()
+        start = (now + timedelta(minutes=30)).astimezone(ZoneInfo("Europe/Berlin"))
+        end = start + timedelta(minutes=30)
+        href = stand_in_calendar.server.put_object("berlin.ics", "\r\n".join([
+            "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Other client//EN",
+            "BEGIN:VTIMEZONE", "TZID:Europe/Berlin",
+            "BEGIN:STANDARD", "DTSTART:19701025T030000", "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU",
+            "TZOFFSETFROM:+0200", "TZOFFSETTO:+0100", "END:STANDARD",
+            "BEGIN:DAYLIGHT", "DTSTART:19700329T020000", "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU",
+            "TZOFFSETFROM:+0100", "TZOFFSETTO:+0200", "END:DAYLIGHT", "END:VTIMEZONE",
+            "BEGIN:VEVENT", "UID:berlin", f"DTSTAMP:{now.strftime('%Y%m%dT%H%M%SZ')}",
+            f"DTSTART;TZID=Europe/Berlin:{start.strftime('%Y%m%dT%H%M%S')}",
+            f"DTEND;TZID=Europe/Berlin:{end.strftime('%Y%m%dT%H%M%S')}",
+            f"SUMMARY:{stand_in_calendar.configuration.focustime_event_name}", "END:VEVENT", "END:VCALENDAR", ""]))
+        adapter = stand_in_calendar.calendar_adapter
+
+        [event] = adapter.get_events()
+        adapter.update_event(event, reminder_in_minutes=42)
+
+        data = stand_in_calendar.server.get_objects()[href]
+        assert "BEGIN:VTIMEZONE" in data
+        assert f"DTSTART;TZID=Europe/Berlin:{start.strftime('%Y%m%dT%H%M%S')}" in data
+        assert [(e.start, e.reminder_in_minutes) for e in adapter.get_events()] == [(start, 42)]
+
+    @pytest.mark.parametrize("stand_in_server", [CalendarType.CalDAV], ids=["CalDAV"], indirect=True)
+    def test_adapter_keeps_changes_of_other_clients_without_etags(self, stand_in_calendar: StandInCalendar):
+        """
+        Verifies that update_event() does not overwrite the changes that another calendar client made in the meantime,
+        even if the server responded to the previous PUT without an ETag (because it modified the stored event).
+        """
+        stand_in_calendar.server.etag_in_put_responses = False
+        adapter = stand_in_calendar.calendar_adapter
+        now = now_without_micros()
+        created_event = adapter.create_event(now + timedelta(minutes=30), now + timedelta(minutes=60))
+
+        stand_in_calendar.other_client_adapter.update_event(created_event, reminder_in_minutes=42)
+        adapter.update_event(created_event, to_date=now + timedelta(minutes=90))
+
+        events = adapter.get_events()
+        assert [(e.end, e.reminder_in_minutes) for e in events] == [(now + timedelta(minutes=90), 42)]
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from typing import Union
+
+import pytest
+
+from focus_time_app.cli.commands import daemon_command
+from focus_time_app.cli.commands.daemon_command import DaemonCommand
+from focus_time_app.cli.commands.start_command import StartCommand
+from focus_time_app.cli.commands.stop_command import StopCommand
+from focus_time_app.cli.commands.sync_command import SyncCommand
+from focus_time_app.command_execution.abstract_command_executor import CommandExecutorConstants
+from focus_time_app.configuration.configuration import ConfigurationV1
+from focus_time_app.configuration.persistence import Persistence
+from focus_time_app.focus_time_calendar.caching_calendar_adapter import CachingCalendarAdapter
+from focus_time_app.focus_time_calendar.event_store import EventStore
+from tests import now_without_micros
+from tests.utils.caldav_stand_in_server import CaldavStandInServer
+from tests.utils.fake_command_executor import FakeCommandExecutor
+from tests.utils.fake_os_notification import FakeOsNotification
+from tests.utils.graph_stand_in_server import GraphStandInServer
+from tests.utils.stand_in_calendar_adapters import create_stand_in_adapter, create_stand_in_configuration
+
+
+class _SingleInstanceStub:
+    """
+    Replaces the lock that the daemon acquires for each synchronization, which would otherwise be shared by all
+    tests that run in parallel.
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+def _create_caching_adapter(configuration: ConfigurationV1,
+                            server: Union[CaldavStandInServer, GraphStandInServer]) -> CachingCalendarAdapter:
+    """
+    Returns the calendar adapter that a CLI command (or the daemon) uses, with its own connection to the EventStore
+    in the storage directory, like a separate process would have.
+    """
+    event_store = EventStore(configuration)
+    calendar_adapter = create_stand_in_adapter(configuration, server, event_store, o365_requests_delay_ms=0)
+    return CachingCalendarAdapter(configuration, calendar_adapter, event_store)
+
+
+class TestDaemonCommand:
+    """
+    Tests the DaemonCommand against the stand-in calendar servers. Instead of sleeping, the tests run the iterations
+    of the daemon directly, where an iteration without refresh corresponds to the wakeup at the start or end of a
+    focus time event.
+    """
+
+    @pytest.fixture
+    def configuration(self, stand_in_server, monkeypatch) -> ConfigurationV1:
+        configuration = create_stand_in_configuration(
+            stand_in_server, focustime_event_name="Focustime-hermetic",
+            start_commands=[CommandExecutorConstants.DND_START_COMMAND, "echo start"],
+            stop_commands=[CommandExecutorConstants.DND_STOP_COMMAND, "echo stop"], http_max_requests_per_second=0)
+        Persistence.store_configuration(configuration)
+        monkeypatch.setattr(daemon_command, "create_caching_calendar_adapter",
+                            lambda c: _create_caching_adapter(c, stand_in_server))
+        monkeypatch.setattr(daemon_command, "SingleInstance", _SingleInstanceStub)
+        return configuration
+
+    def test_cli_stop_between_daemon_iterations(self, configuration: ConfigurationV1, stand_in_server,
+                                                fake_command_executor: FakeCommandExecutor,
+                                                fake_os_notification: FakeOsNotification):
+        """
+        Verifies that the daemon does not start the focus time again after the user stopped it with the "stop"
+        command, if the daemon wakes up (for another event) before refreshing the events.
+        """
+        now = now_without_micros()
+        other_client_adapter = create_stand_in_adapter(configuration, stand_in_server, o365_requests_delay_ms=0)
+        other_client_adapter.create_event(now - timedelta(minutes=5), now + timedelta(minutes=30))
+        daemon = DaemonCommand(interval_seconds=60)
+        daemon._run_once(refresh=True)
+        assert fake_command_executor.executed_commands == configuration.start_commands
+
+        cli_adapter = _create_caching_adapter(configuration, stand_in_server)
+        StopCommand(configuration, cli_adapter).run()
+        SyncCommand(configuration, cli_adapter).run()
+        assert fake_command_executor.executed_commands == configuration.start_commands + configuration.stop_commands
+
+        daemon._run_once(refresh=False)
+        assert fake_command_executor.executed_commands == configuration.start_commands + configuration.stop_commands
+        assert not Persistence.ongoing_focustime_markerfile_exists()
+
+    def test_cli_start_between_daemon_iterations(self, configuration: ConfigurationV1, stand_in_server,
+                                                 fake_command_executor: FakeCommandExecutor,
+                                                 fake_os_notification: FakeOsNotification):
+        """
+        Verifies that the daemon does not stop the focus time that the user started with the "start" command, if the
+        daemon wakes up (for another event) before refreshing the events.
+        """
+        daemon = DaemonCommand(interval_seconds=60)
+        daemon._run_once(refresh=True)
+        assert not fake_command_executor.executed_commands
+
+        cli_adapter = _create_caching_adapter(configuration, stand_in_server)
+        StartCommand(configuration, cli_adapter, duration_in_minutes=30).run()
+        SyncCommand(configuration, cli_adapter).run()
+        assert fake_command_executor.executed_commands == configuration.start_commands
+
+        daemon._run_once(refresh=False)
+        assert fake_command_executor.executed_commands == configuration.start_commands
+        assert Persistence.ongoing_focustime_markerfile_exists()
@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from focus_time_app.cli.commands.sync_command import SyncCommand
+from focus_time_app.configuration.persistence import Persistence
+from tests import now_without_micros
+from tests.hermetic.conftest import StandInCalendar
+from tests.utils.fake_command_executor import FakeCommandExecutor
+from tests.utils.fake_os_notification import FakeOsNotification
+from tests.utils.synthetic_calendar import SyntheticEvent, seed_calendar
+
+
+class TestSyncCommand:
+    """
+    Tests the SyncCommand against the stand-in calendar servers, like TestCLISyncCommand does with the frozen app
+    against the real calendar servers. Instead of waiting for focus time events to start or end, another calendar
+    client moves them.
+    """
+
+    def test_on_off_sync(self, stand_in_calendar: StandInCalendar, fake_command_executor: FakeCommandExecutor,
+                         fake_os_notification: FakeOsNotification, capsys):
+        configuration = stand_in_calendar.configuration
+        sync_command = SyncCommand(configuration, stand_in_calendar.calendar_adapter)
+
+        # The focus time event starts in one minute, nothing should happen
+        now = now_without_micros()
+        event = stand_in_calendar.other_client_adapter.create_event(now + timedelta(minutes=1),
+                                                                    now + timedelta(minutes=3))
+        sync_command.run()
+        assert capsys.readouterr().out.startswith("No focus time is active. Exiting ...")
+        assert not fake_command_executor.executed_commands
+        assert not fake_command_executor.is_dnd_active()
+
+        # The focus time event has started, the start commands should be called
+        stand_in_calendar.other_client_adapter.update_event(event, from_date=now - timedelta(minutes=1))
+        sync_command.run()
+        assert "calling start command(s) ..." in capsys.readouterr().out
+        assert fake_command_executor.executed_commands == configuration.start_commands
+        assert fake_command_executor.dnd_profile_name == configuration.dnd_profile_name
+        assert [title for title, _ in fake_os_notification.notifications] == ["Focus time starts now"]
+        assert Persistence.ongoing_focustime_markerfile_exists()
+
+        # Syncing again should not change anything
+        sync_command.run()
+        assert capsys.readouterr().out.startswith("Focus time is already active. Exiting ...")
+        assert fake_command_executor.executed_commands == configuration.start_commands
+
+        # The focus time event has ended, the stop commands should be called
+        stand_in_calendar.other_client_adapter.update_event(event, to_date=now - timedelta(seconds=1))
+        sync_command.run()
+        assert capsys.readouterr().out.startswith("No focus time is active anymore, calling stop command(s) ...")
+        assert fake_command_executor.executed_commands == configuration.start_commands + configuration.stop_commands
+        assert not fake_command_executor.is_dnd_active()
+        assert [title for title, _ in fake_os_notification.notifications] == ["Focus time starts now",
+                                                                              "Focus time has ended"]
+        assert not Persistence.ongoing_focustime_markerfile_exists()
+
+        # Syncing again should not change anything
+        sync_command.run()
+        assert capsys.readouterr().out.startswith("No focus time is active. Exiting ...")
+        assert len(fake_command_executor.executed_commands) == 4
+
+    def test_removed_event_stops_focus_time(self, stand_in_calendar: StandInCalendar,
+                                            fake_command_executor: FakeCommandExecutor,
+                                            fake_os_notification: FakeOsNotification):
+        """
+        Verifies that the stop commands are called if the user removes the ongoing focus time event.
+        """
+        configuration = stand_in_calendar.configuration
+        sync_command = SyncCommand(configuration, stand_in_calendar.calendar_adapter)
+        now = now_without_micros()
+        event = stand_in_calendar.other_client_adapter.create_event(now - timedelta(minutes=5),
+                                                                    now + timedelta(minutes=30))
+        sync_command.run()
+        assert fake_command_executor.is_dnd_active()
+
+        stand_in_calendar.other_client_adapter.remove_event(event)
+        sync_command.run()
+        assert fake_command_executor.executed_commands == configuration.start_commands + configuration.stop_commands
+        assert not fake_command_executor.is_dnd_active()
+
+    def test_other_events_do_not_start_focus_time(self, stand_in_calendar: StandInCalendar,
+                                                  fake_command_executor: FakeCommandExecutor,
+                                                  fake_os_notification: FakeOsNotification, capsys):
+        now = now_without_micros()
+        seed_calendar(stand_in_calendar.server, [
+            SyntheticEvent(uid="meeting", subject="Meeting", start=now - timedelta(minutes=30),
+                           end=now + timedelta(minutes=30), reminder_minutes=5, occurrences=1),
+            SyntheticEvent(uid="daily-meeting", subject="Daily meeting", start=now - timedelta(days=1, minutes=5),
+                           end=now - timedelta(days=1, minutes=-10), reminder_minutes=0, occurrences=3),
+        ])
+
+        SyncCommand(stand_in_calendar.configuration, stand_in_calendar.calendar_adapter).run()
+        assert capsys.readouterr().out.startswith("No focus time is active. Exiting ...")
+        assert not fake_command_executor.executed_commands
+        assert not fake_os_notification.notifications
+
+    def test_reminder(self, stand_in_calendar: StandInCalendar, fake_command_executor: FakeCommandExecutor,
+                      fake_os_notification: FakeOsNotification):
+        """
+        Verifies that the sync adjusts the reminder of focus time events that were created (by another client) with a
+        different reminder time.
+        """
+        configuration = stand_in_calendar.configuration
+        now = now_without_micros()
+        seed_calendar(stand_in_calendar.server, [
+            SyntheticEvent(uid="focus-now", subject=configuration.focustime_event_name, start=now,
+                           end=now + timedelta(minutes=2), reminder_minutes=30, occurrences=1),
+            SyntheticEvent(uid="focus-later", subject=configuration.focustime_event_name,
+                           start=now + timedelta(hours=1), end=now + timedelta(hours=2), reminder_minutes=0,
+                           occurrences=1),
+        ])
+        date_range = (now - timedelta(minutes=1), now + timedelta(hours=3))
+        assert sorted(e.reminder_in_minutes for e in stand_in_calendar.other_client_adapter.get_events(date_range)) \
+               == [0, 30]
+
+        SyncCommand(configuration, stand_in_calendar.calendar_adapter).run()
+        assert fake_command_executor.executed_commands == configuration.start_commands
+
+        events = stand_in_calendar.other_client_adapter.get_events(date_range)
+        assert [e.reminder_in_minutes for e in events] == [configuration.event_reminder_time_minutes] * 2
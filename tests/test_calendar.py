@@ -3,7 +3,7 @@ from datetime import timedelta
 
 import pytest
 
-from focus_time_app.focus_time_calendar.utils import get_active_focustime_event
+from focus_time_app.focus_time_calendar.utils import get_active_focustime_event, get_next_focustime_transition
 from focus_time_app.focus_time_calendar.event import FocusTimeEvent
 from tests import now_without_micros
 from tests.utils.abstract_testing_calendar_adapter import AbstractTestingCalendarAdapter
@@ -141,3 +141,26 @@ class TestCalendar:
 
         active_event_case_2 = get_active_focustime_event(events=case_2)
         assert active_event_case_2 is None
+
+    def test_next_focus_time_transition(self):
+        """
+        Tests that the get_next_focustime_transition() function determines the next start or end of a focus time event.
+        """
+        now = now_without_micros()
+        events = [
+            FocusTimeEvent(id="1", start=now - timedelta(hours=2), end=now - timedelta(hours=1), reminder_in_minutes=0),
+            FocusTimeEvent(id="2", start=now - timedelta(hours=1), end=now + timedelta(hours=1), reminder_in_minutes=0),
+            FocusTimeEvent(id="3", start=now + timedelta(hours=2), end=now + timedelta(hours=3), reminder_in_minutes=0)
+        ]
+
+        # Case 1: the ongoing event ends next, the transition happens right after its end
+        next_transition = get_next_focustime_transition(events, now)
+        assert next_transition is not None
+        assert get_active_focustime_event(events) is not None
+        assert now + timedelta(hours=1) < next_transition < now + timedelta(hours=1, seconds=1)
+
+        # Case 2: between two events, the start of the next event is the next transition
+        assert get_next_focustime_transition(events, now + timedelta(hours=1, minutes=30)) == now + timedelta(hours=2)
+
+        # Case 3: no transition after the last event has ended
+        assert get_next_focustime_transition(events, now + timedelta(hours=4)) is None
@@ -0,0 +1,122 @@
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import CredentialsError
+from focus_time_app.focus_time_calendar.circuit_breaker import ConnectivityCircuitBreaker, CalendarUnreachableError, \
+    is_connectivity_error, is_authentication_error
+from focus_time_app.focus_time_calendar.http_transport import RequestDeadlineExceededError
+from focus_time_app.utils.deadline import DeadlineExceededError
+
+
+def _get_unused_port_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}/"
+
+
+class TestCircuitBreaker:
+    """
+    Unit tests for the ConnectivityCircuitBreaker, which do not require access to any calendar server.
+    """
+
+    def test_circuit_opens_after_consecutive_failures(self, tmp_path: Path):
+        circuit_breaker = ConnectivityCircuitBreaker(_get_unused_port_url(), failure_threshold=2,
+                                                     state_path=tmp_path / "state.json")
+
+        circuit_breaker.record_failure()
+        circuit_breaker.before_attempt()  # still closed
+        circuit_breaker.record_failure()
+        assert [path.name for path in tmp_path.iterdir()] == ["state.json"]  # no temporary file is left
+
+        # A new instance (e.g. of the next sync run) reads the persisted state
+        circuit_breaker = ConnectivityCircuitBreaker(_get_unused_port_url(), failure_threshold=2,
+                                                     state_path=tmp_path / "state.json")
+        start = time.monotonic()
+        with pytest.raises(CalendarUnreachableError):
+            circuit_breaker.before_attempt()
+        assert time.monotonic() - start < 0.5
+
+    def test_probe_after_cooldown(self, tmp_path: Path):
+        server_socket = socket.create_server(("127.0.0.1", 0))
+        reachable_url = f"http://127.0.0.1:{server_socket.getsockname()[1]}/"
+        state_path = tmp_path / "state.json"
+        try:
+            # The circuit is open, but the cool-down has passed
+            state_path.write_text('{"consecutive_failures": 1, "open_until": 0}')
+            circuit_breaker = ConnectivityCircuitBreaker(_get_unused_port_url(), failure_threshold=1,
+                                                         state_path=state_path)
+
+            # The probe fails, because nothing listens on the port, which re-opens the circuit
+            with pytest.raises(CalendarUnreachableError):
+                circuit_breaker.before_attempt()
+
+            state_path.write_text('{"consecutive_failures": 2, "open_until": 0}')
+            circuit_breaker = ConnectivityCircuitBreaker(reachable_url, failure_threshold=1, state_path=state_path)
+            circuit_breaker.before_attempt()  # the probe succeeds
+            circuit_breaker.record_success()
+            assert not state_path.exists()
+        finally:
+            server_socket.close()
+
+    def test_probe_is_skipped_with_proxy(self, tmp_path: Path, monkeypatch):
+        state_path = tmp_path / "state.json"
+        state_path.write_text('{"consecutive_failures": 1, "open_until": 0}')
+        monkeypatch.delenv("NO_PROXY", raising=False)
+        monkeypatch.delenv("no_proxy", raising=False)
+        monkeypatch.setenv("HTTP_PROXY", "http://proxy.example.com:3128")
+        circuit_breaker = ConnectivityCircuitBreaker(_get_unused_port_url(), failure_threshold=1,
+                                                     state_path=state_path)
+
+        # A direct connection to the server would fail, but the requests are sent via the proxy
+        circuit_breaker.before_attempt()
+
+    def test_disabled_circuit_breaker(self, tmp_path: Path):
+        circuit_breaker = ConnectivityCircuitBreaker(_get_unused_port_url(), failure_threshold=0,
+                                                     state_path=tmp_path / "state.json")
+        for _ in range(5):
+            circuit_breaker.record_failure()
+        circuit_breaker.before_attempt()
+
+    def test_connectivity_errors_are_classified(self):
+        assert is_connectivity_error(requests.ConnectionError("unreachable"))
+        assert is_connectivity_error(requests.ReadTimeout("timed out"))
+        assert not is_connectivity_error(requests.HTTPError("401 Unauthorized"))
+        assert not is_connectivity_error(RuntimeError("Unable to load auth token"))
+        assert is_connectivity_error(RequestDeadlineExceededError("The deadline has been exceeded"))
+        # E.g. raised because slow start/stop commands used up the time budget
+        assert not is_connectivity_error(DeadlineExceededError("The deadline has been exceeded"))
+
+        try:
+            try:
+                raise socket.gaierror("Name or service not known")
+            except socket.gaierror as e:
+                raise RuntimeError("Wrapped by a calendar library") from e
+        except RuntimeError as e:
+            assert is_connectivity_error(e)
+
+    def test_authentication_errors_are_classified(self):
+        def http_error(status_code: int) -> requests.HTTPError:
+            response = requests.Response()
+            response.status_code = status_code
+            return requests.HTTPError(f"{status_code} Client Error", response=response)
+
+        assert is_authentication_error(http_error(401))
+        assert is_authentication_error(http_error(403))
+        assert is_authentication_error(CredentialsError("Unable to load auth token"))
+        assert not is_authentication_error(http_error(404))
+        assert not is_authentication_error(requests.ConnectionError("unreachable"))
+        # E.g. raised by a failing start command
+        assert not is_authentication_error(subprocess.CalledProcessError(1, "false"))
+
+        try:
+            try:
+                raise http_error(401)
+            except requests.HTTPError as e:
+                raise RuntimeError("Wrapped by a calendar library") from e
+        except RuntimeError as e:
+            assert is_authentication_error(e)
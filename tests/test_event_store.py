@@ -0,0 +1,109 @@
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from focus_time_app.configuration.configuration import ConfigurationV1
+from focus_time_app.focus_time_calendar.event import CalendarType, FocusTimeEvent
+from focus_time_app.focus_time_calendar.event_store import EventStore
+from tests import now_without_micros
+
+
+def create_configuration(focustime_event_name: str = "ft") -> ConfigurationV1:
+    return ConfigurationV1(calendar_type=CalendarType.CalDAV, calendar_look_ahead_hours=3, calendar_look_back_hours=5,
+                           focustime_event_name=focustime_event_name, start_commands=[], stop_commands=[],
+                           dnd_profile_name="dnd", set_event_reminder=False, event_reminder_time_minutes=0,
+                           adapter_configuration={"calendar_url": "https://example.com/calendar"})
+
+
+@pytest.fixture
+def database_path(tmp_path: Path) -> Path:
+    return tmp_path / EventStore.DATABASE_FILE_NAME
+
+
+class TestEventStore:
+    """
+    Unit tests for the EventStore, which do not require access to any calendar server.
+    """
+
+    def test_store_and_query_events(self, database_path: Path):
+        """
+        Stores events for a time window and verifies that time range queries, as well as the active/next queries,
+        return the expected events (with unchanged values).
+        """
+        now = now_without_micros()
+        active_event = FocusTimeEvent(id="1", start=now - timedelta(minutes=10), end=now + timedelta(minutes=20),
+                                      reminder_in_minutes=0, etag='"abc"')
+        next_event = FocusTimeEvent(id="2", start=now + timedelta(hours=1), end=now + timedelta(hours=2),
+                                    reminder_in_minutes=15)
+        event_store = EventStore(create_configuration(), database_path)
+        event_store.store_events(now - timedelta(hours=5), now + timedelta(hours=3), [next_event, active_event])
+
+        assert event_store.get_events(now - timedelta(hours=5), now + timedelta(hours=3)) == [active_event, next_event]
+        assert event_store.get_events(now + timedelta(minutes=30), now + timedelta(hours=3)) == [next_event]
+        assert event_store.get_active_event(now) == active_event
+        assert event_store.get_next_event(now) == next_event
+        assert event_store.get_active_event(now + timedelta(minutes=30)) is None
+        assert event_store.get_next_event(now + timedelta(hours=1)) is None
+
+    def test_store_events_replaces_window(self, database_path: Path):
+        """
+        Verifies that storing events for a time window removes previously stored events of that window (e.g. because
+        they were deleted on the calendar server), but keeps events outside the window.
+        """
+        now = now_without_micros()
+        old_event = FocusTimeEvent(id="1", start=now, end=now + timedelta(minutes=30), reminder_in_minutes=0)
+        outside_event = FocusTimeEvent(id="2", start=now + timedelta(hours=5), end=now + timedelta(hours=6),
+                                       reminder_in_minutes=0)
+        event_store = EventStore(create_configuration(), database_path)
+        event_store.store_events(now - timedelta(hours=1), now + timedelta(hours=7), [old_event, outside_event])
+        event_store.store_events(now - timedelta(hours=1), now + timedelta(hours=1), [])
+
+        assert event_store.get_events(now - timedelta(hours=1), now + timedelta(hours=7)) == [outside_event]
+
+    def test_upsert_and_remove_event(self, database_path: Path):
+        now = now_without_micros()
+        event = FocusTimeEvent(id="1", start=now, end=now + timedelta(minutes=30), reminder_in_minutes=0)
+        event_store = EventStore(create_configuration(), database_path)
+
+        event_store.upsert_event(event)
+        assert event_store.get_active_event(now + timedelta(minutes=1)) == event
+
+        event_store.remove_event(event)
+        assert event_store.get_active_event(now + timedelta(minutes=1)) is None
+
+    def test_is_fresh(self, database_path: Path):
+        """
+        Verifies that the stored events are only considered fresh for (sub-)windows of the refreshed window, and only
+        within the maximum age.
+        """
+        now = now_without_micros()
+        event_store = EventStore(create_configuration(), database_path)
+        assert not event_store.is_fresh(now, now + timedelta(hours=1), max_age=timedelta(minutes=5))
+        assert event_store.get_last_refresh_time() is None
+
+        event_store.store_events(now - timedelta(hours=1), now + timedelta(hours=1), [])
+
+        assert event_store.is_fresh(now, now + timedelta(hours=1), max_age=timedelta(minutes=5))
+        assert not event_store.is_fresh(now, now + timedelta(hours=2), max_age=timedelta(minutes=5))
+        assert not event_store.is_fresh(now, now + timedelta(hours=1), max_age=timedelta(0))
+        assert event_store.get_last_refresh_time() is not None
+
+    def test_events_are_persisted_and_discarded_on_configuration_change(self, database_path: Path):
+        """
+        Verifies that a new EventStore instance sees the events stored by a previous instance, unless the calendar
+        configuration has changed in the meantime.
+        """
+        now = now_without_micros()
+        event = FocusTimeEvent(id="1", start=now, end=now + timedelta(minutes=30), reminder_in_minutes=0)
+        event_store = EventStore(create_configuration(), database_path)
+        event_store.store_events(now - timedelta(hours=1), now + timedelta(hours=1), [event])
+        event_store.close()
+
+        event_store = EventStore(create_configuration(), database_path)
+        assert event_store.get_events(now - timedelta(hours=1), now + timedelta(hours=1)) == [event]
+        event_store.close()
+
+        event_store = EventStore(create_configuration(focustime_event_name="other"), database_path)
+        assert event_store.get_events(now - timedelta(hours=1), now + timedelta(hours=1)) == []
+        assert event_store.get_last_refresh_time() is None
@@ -0,0 +1,77 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+import pytest
+import requests
+
+from focus_time_app.focus_time_calendar import http_trace
+from focus_time_app.focus_time_calendar.http_transport import configure_session
+
+
+class EchoRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(201)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpTrace:
+    """
+    Unit tests for the HTTP request accounting, which do not require access to any calendar server.
+    """
+
+    def test_url_template(self):
+        assert http_trace.get_url_template(
+            "https://graph.microsoft.com/v1.0/me/calendars/AAMkADAwATM0MDAAMS1iNTcwLTk5/events"
+            "?startDateTime=2024-01-01&$top=100") == \
+            "https://graph.microsoft.com/v1.0/me/calendars/{id}/events?startDateTime&$top"
+        assert http_trace.get_url_template("https://dav.example.com/calendars/user/work/1234-abcd.ics") == \
+            "https://dav.example.com/calendars/user/work/{id}.ics"
+        assert http_trace.get_url_template("https://dav.example.com/calendars/user/work/") == \
+            "https://dav.example.com/calendars/user/work/"
+
+    def test_requests_are_attributed_to_operations(self, server_url: str):
+        printed_records: List[http_trace.HttpRequestRecord] = []
+        http_trace.pop_records()
+        http_trace.set_listener(printed_records.append)
+        try:
+            with requests.Session() as session:
+                configure_session(session)
+                with http_trace.adapter_operation("create_event"):
+                    with http_trace.adapter_operation("nested"):
+                        session.put(server_url + "calendar/1234-abcd.ics", data=b"x" * 100)
+                session.put(server_url + "calendar/", data=b"y" * 10)
+        finally:
+            http_trace.set_listener(None)
+
+        records = http_trace.pop_records()
+        assert records == printed_records
+        assert [(r.operation, r.method, r.status, r.request_bytes, r.response_bytes) for r in records] == [
+            ("create_event", "PUT", 201, 100, 100),
+            (http_trace.NO_OPERATION, "PUT", 201, 10, 10)
+        ]
+        assert records[0].url_template == server_url + "calendar/{id}.ics"
+        assert records[0].latency_ms > 0
+        assert http_trace.pop_records() == []
+
+        summary = http_trace.summarize(records)
+        assert len(summary) == 2
+        assert summary[0].startswith("create_event: 1 requests, 100 B sent, 100 B received")
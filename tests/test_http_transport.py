@@ -0,0 +1,132 @@
+import gzip
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
+
+from focus_time_app.focus_time_calendar.http_transport import configure_session, get_transport_statistics, \
+    PooledHTTPAdapter
+from focus_time_app.utils.deadline import Deadline, DeadlineExceededError
+
+
+class GzipRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # enables keep-alive connections
+    throttled_paths = set()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path not in self.throttled_paths:
+            self.throttled_paths.add(self.path)
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.do_GET()
+
+    def do_GET(self):
+        body = b"hello"
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GzipRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stalled_server_url() -> Iterator[str]:
+    """
+    URL of a server that accepts connections, but never responds.
+    """
+    server_socket = socket.create_server(("127.0.0.1", 0))
+    yield f"http://127.0.0.1:{server_socket.getsockname()[1]}/"
+    server_socket.close()
+
+
+class TestHttpTransport:
+    """
+    Unit tests for the shared HTTP transport, which do not require access to any calendar server.
+    """
+
+    def test_connections_are_reused_and_responses_compressed(self, server_url: str):
+        session = configure_session(requests.Session(), pool_size=2)
+        statistics_before = get_transport_statistics()
+
+        for _ in range(3):
+            response = session.get(server_url)
+            assert response.text == "hello"
+
+        statistics_after = get_transport_statistics()
+        assert statistics_after.requests - statistics_before.requests == 3
+        assert statistics_after.new_connections - statistics_before.new_connections == 1
+        assert statistics_after.reused_connections - statistics_before.reused_connections == 2
+        assert statistics_after.compressed_responses - statistics_before.compressed_responses == 3
+
+    def test_library_retry_configuration_is_replaced(self):
+        """
+        Verifies that requests are not retried by two layers (the calendar library's and the shared retry policy).
+        """
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(max_retries=Retry(total=3, status_forcelist=[429])))
+
+        configure_session(session)
+
+        adapter = session.get_adapter("https://example.com")
+        assert isinstance(adapter, PooledHTTPAdapter)
+        assert adapter.max_retries.status == 0
+
+    def test_throttled_requests_are_retried_honoring_retry_after(self, server_url: str):
+        session = configure_session(requests.Session())
+        statistics_before = get_transport_statistics()
+
+        start = time.monotonic()
+        response = session.post(server_url + "throttle-once", data=b"body")
+
+        assert response.status_code == 200
+        assert time.monotonic() - start >= 1  # the server sent "Retry-After: 1"
+        statistics_after = get_transport_statistics()
+        assert statistics_after.throttled_responses - statistics_before.throttled_responses == 1
+        assert statistics_after.retries - statistics_before.retries == 1
+
+    def test_request_rate_is_limited(self, server_url: str):
+        session = configure_session(requests.Session(), max_requests_per_second=5)
+
+        start = time.monotonic()
+        for _ in range(10):
+            session.get(server_url)
+
+        # The first 5 requests are sent immediately (burst), the other 5 are spread across the following second
+        assert time.monotonic() - start >= 0.9
+
+    def test_deadline_limits_requests(self, stalled_server_url: str):
+        deadline = Deadline(0.5)
+        session = configure_session(requests.Session(), deadline_provider=lambda: deadline)
+
+        start = time.monotonic()
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            session.get(stalled_server_url)
+        assert time.monotonic() - start < 2
+
+        with pytest.raises(DeadlineExceededError):
+            session.get(stalled_server_url)
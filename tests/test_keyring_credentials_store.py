@@ -0,0 +1,130 @@
+import sys
+from pathlib import Path
+from typing import Iterator
+from unittest import mock
+
+import keyring
+import pytest
+
+from focus_time_app.configuration.persistence import Persistence
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import CredentialsError
+from focus_time_app.focus_time_calendar.impl import keyring_credentials_store
+from focus_time_app.focus_time_calendar.impl.keyring_credentials_store import KeyringCredentialsStore
+from tests.utils.in_memory_keyring import CountingInMemoryKeyring
+
+
+@pytest.fixture
+def in_memory_keyring(tmp_path: Path) -> Iterator[CountingInMemoryKeyring]:
+    previous_keyring = keyring.get_keyring()
+    backend = CountingInMemoryKeyring(latency_seconds=0)
+    keyring.set_keyring(backend)
+    KeyringCredentialsStore.clear_process_cache()
+    with mock.patch.object(Persistence, "get_storage_directory", return_value=tmp_path), \
+            mock.patch.dict(KeyringCredentialsStore.PASSWORD_LENGTH_LIMITATION, {sys.platform: 500}):
+        yield backend
+    KeyringCredentialsStore.clear_process_cache()
+    keyring.set_keyring(previous_keyring)
+
+
+class TestKeyringCredentialsStore:
+    """
+    Unit tests for the caches of the KeyringCredentialsStore, which use an in-memory keyring backend.
+    """
+
+    def test_disk_cache_avoids_loading_the_chunks(self, in_memory_keyring: CountingInMemoryKeyring):
+        credentials = "x" * 3000
+        KeyringCredentialsStore(namespace_override="test", use_disk_cache=True).save_credentials(credentials)
+
+        KeyringCredentialsStore.clear_process_cache()  # simulates a new process
+        in_memory_keyring.calls = 0
+        assert KeyringCredentialsStore(namespace_override="test", use_disk_cache=True).load_credentials() == credentials
+        assert in_memory_keyring.calls == 1  # only the key of the disk cache
+
+        in_memory_keyring.calls = 0
+        assert KeyringCredentialsStore(namespace_override="test", use_disk_cache=True).load_credentials() == credentials
+        assert in_memory_keyring.calls == 0  # cached in the process
+
+    def test_caches_are_invalidated(self, in_memory_keyring: CountingInMemoryKeyring):
+        store = KeyringCredentialsStore(namespace_override="test", use_disk_cache=True)
+        store.save_credentials("old")
+        store.save_credentials("new")
+        KeyringCredentialsStore.clear_process_cache()
+        assert store.load_credentials() == "new"
+
+        store.delete_credentials()
+        assert not store.load_credentials()
+        KeyringCredentialsStore.clear_process_cache()
+        assert not store.load_credentials()
+
+    @pytest.mark.parametrize("use_disk_cache", [True, False])
+    def test_process_cache_notices_changes_of_other_processes(self, in_memory_keyring: CountingInMemoryKeyring,
+                                                              use_disk_cache: bool):
+        store = KeyringCredentialsStore(namespace_override="test", use_disk_cache=use_disk_cache)
+        store.save_credentials("old" * 300)
+        in_memory_keyring.calls = 0
+        assert store.load_credentials() == "old" * 300
+        # Checking the entry of the process cache costs no keyring call with the disk cache, and one (reading the
+        # manifest) without it
+        assert in_memory_keyring.calls == (0 if use_disk_cache else 1)
+
+        with mock.patch.object(keyring_credentials_store, "_credentials_cache", {}):  # simulates another process
+            KeyringCredentialsStore(namespace_override="test", use_disk_cache=use_disk_cache).save_credentials("new")
+        assert store.load_credentials() == "new"
+
+        with mock.patch.object(keyring_credentials_store, "_credentials_cache", {}):
+            KeyringCredentialsStore(namespace_override="test", use_disk_cache=use_disk_cache).delete_credentials()
+        assert not store.load_credentials()
+
+    def test_manifest_avoids_probing_and_rewriting_chunks(self, in_memory_keyring: CountingInMemoryKeyring):
+        store = KeyringCredentialsStore(namespace_override="test")
+        store.save_credentials("a" * 1000 + "b" * 600)
+
+        KeyringCredentialsStore.clear_process_cache()
+        in_memory_keyring.calls = 0
+        assert store.load_credentials() == "a" * 1000 + "b" * 600
+        assert in_memory_keyring.calls == 5  # the manifest and exactly 4 chunks
+
+        in_memory_keyring.calls = 0
+        store.save_credentials("a" * 1000 + "c" * 500)
+        # Reading the manifest, writing the changed third chunk, deleting the superfluous fourth chunk, writing the
+        # manifest
+        assert in_memory_keyring.calls == 4
+        KeyringCredentialsStore.clear_process_cache()
+        assert store.load_credentials() == "a" * 1000 + "c" * 500
+
+        in_memory_keyring.calls = 0
+        store.delete_credentials()
+        assert in_memory_keyring.calls == 5  # reading the manifest, deleting 3 chunks and the manifest
+        KeyringCredentialsStore.clear_process_cache()
+        assert not store.load_credentials()
+
+    def test_chunks_of_concurrent_save_are_not_mixed(self, in_memory_keyring: CountingInMemoryKeyring):
+        store = KeyringCredentialsStore(namespace_override="test")
+        store.save_credentials("a" * 1000)
+        # Another process has written the first chunk of its new credentials, but neither the second one nor the
+        # manifest yet
+        keyring.set_password("FocusTimeApp-test", "FocusTimeApp-test-0", "b" * 500)
+        KeyringCredentialsStore.clear_process_cache()
+
+        with mock.patch.object(keyring_credentials_store.time, "sleep") as sleep:
+            with pytest.raises(CredentialsError):
+                store.load_credentials()
+        assert [c.args[0] for c in sleep.call_args_list if c.args[0]] == \
+               KeyringCredentialsStore._MANIFEST_MISMATCH_RETRY_DELAYS_SECONDS
+        # Nothing was deleted
+        assert keyring.get_password("FocusTimeApp-test", "FocusTimeApp-test-1") == "a" * 500
+        assert keyring.get_password("FocusTimeApp-test", "FocusTimeApp-test-manifest")
+
+        # The other process finishes saving while the credentials are being loaded
+        def finish_saving(seconds: float):
+            if seconds:  # the retry delay, rather than the (zero) latency of the in-memory keyring
+                KeyringCredentialsStore(namespace_override="test").save_credentials("b" * 1000)
+
+        with mock.patch.object(keyring_credentials_store.time, "sleep", side_effect=finish_saving):
+            assert store.load_credentials() == "b" * 1000
+
+    def test_credentials_without_manifest_are_loaded(self, in_memory_keyring: CountingInMemoryKeyring):
+        for i, chunk in enumerate(["a" * 500, "b" * 500, "c" * 10]):
+            keyring.set_password("FocusTimeApp-test", f"FocusTimeApp-test-{i}", chunk)
+
+        assert KeyringCredentialsStore(namespace_override="test").load_credentials() == "a" * 500 + "b" * 500 + "c" * 10
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# Prints those (slow-to-import) calendar libraries that have been imported, separated by comma
+PRINT_LOADED_CALENDAR_LIBRARIES = "print(','.join(m for m in ('O365', 'caldav') if m in sys.modules))"
+
+
+def get_loaded_calendar_libraries(code: str) -> list[str]:
+    """
+    Runs the provided Python code in a fresh interpreter (to start with an empty sys.modules), followed by
+    PRINT_LOADED_CALENDAR_LIBRARIES, and returns the names of the loaded calendar libraries.
+    """
+    project_root_path = Path(__file__).parent.parent
+    output = subprocess.check_output([sys.executable, "-c", f"import sys\n{code}\n{PRINT_LOADED_CALENDAR_LIBRARIES}"],
+                                     cwd=project_root_path)
+    return [m for m in output.decode("utf-8").strip().split(",") if m]
+
+
+class TestLazyLoading:
+    """
+    Verifies that the calendar adapter implementations (and their third-party libraries) are only imported when needed.
+    """
+
+    def test_cli_import_loads_no_calendar_library(self):
+        assert get_loaded_calendar_libraries("import focus_time_app.cli.cli") == []
+
+    def test_caldav_adapter_does_not_load_o365(self):
+        code = "from focus_time_app.configuration.configuration import ConfigurationV1\n" \
+               "from focus_time_app.focus_time_calendar.adapter_factory import create_calendar_adapter\n" \
+               "from focus_time_app.focus_time_calendar.event import CalendarType\n" \
+               "config = ConfigurationV1(calendar_type=CalendarType.CalDAV, calendar_look_ahead_hours=3, " \
+               "calendar_look_back_hours=5, focustime_event_name='ft', start_commands=[], stop_commands=[], " \
+               "dnd_profile_name='dnd', set_event_reminder=False, event_reminder_time_minutes=0)\n" \
+               "create_calendar_adapter(config)"
+        assert get_loaded_calendar_libraries(code) == ["caldav"]
@@ -0,0 +1,66 @@
+import time
+from typing import Any, Dict
+from unittest import mock
+
+import pytest
+from O365.utils import BaseTokenBackend
+
+from focus_time_app.configuration.configuration import ConfigurationV1
+from focus_time_app.focus_time_calendar.event import CalendarType
+from focus_time_app.focus_time_calendar.impl import outlook365_calendar_adapter
+from focus_time_app.focus_time_calendar.impl.outlook365_calendar_adapter import Outlook365CalendarAdapter, \
+    _PooledConnection
+
+
+class _InMemoryTokenBackend(BaseTokenBackend):
+    """
+    Token backend that only keeps the token (set by the test) in memory, instead of the OS credentials manager.
+    """
+    token_to_load: Dict[str, Any] = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+
+    def load_token(self):
+        return self.token_to_load
+
+    def save_token(self):
+        return True
+
+
+def _create_token(expires_in_minutes: float, long_lived: bool = True) -> Dict[str, Any]:
+    token = {"token_type": "Bearer", "access_token": "access-token", "expires_at": time.time() + expires_in_minutes * 60}
+    if long_lived:
+        token["refresh_token"] = "refresh-token"
+    return token
+
+
+class TestOutlook365TokenRefresh:
+    """
+    Unit tests for Outlook365CalendarAdapter.refresh_credentials_if_expiring(), which do not require access to any
+    calendar server.
+    """
+
+    @pytest.mark.parametrize("token, margin_minutes, expect_refresh", [
+        (_create_token(expires_in_minutes=5), 10, True),
+        (_create_token(expires_in_minutes=30), 10, False),
+        (_create_token(expires_in_minutes=5), 0, False),  # a margin of 0 disables the refresh
+        (_create_token(expires_in_minutes=5, long_lived=False), 10, False),  # there is no refresh token
+    ], ids=["inside-margin", "outside-margin", "margin-0", "not-long-lived"])
+    def test_token_is_refreshed_within_margin(self, token: Dict[str, Any], margin_minutes: int,
+                                              expect_refresh: bool):
+        configuration = ConfigurationV1(calendar_type=CalendarType.Outlook365, calendar_look_ahead_hours=3,
+                                        calendar_look_back_hours=5, focustime_event_name="Focus time",
+                                        start_commands=[], stop_commands=[], dnd_profile_name="unused",
+                                        set_event_reminder=False, event_reminder_time_minutes=0,
+                                        token_refresh_margin_minutes=margin_minutes,
+                                        adapter_configuration={"client_id": "00000000-0000-0000-0000-000000000000",
+                                                               "tenant_id": None, "calendar_name": "Calendar"})
+        with mock.patch.object(outlook365_calendar_adapter, "Outlook365KeyringBackend", _InMemoryTokenBackend), \
+                mock.patch.object(_InMemoryTokenBackend, "token_to_load", token), \
+                mock.patch.object(_PooledConnection, "refresh_token", return_value=True) as refresh_token:
+            adapter = Outlook365CalendarAdapter(configuration)
+            adapter.prepare_connection()  # loads the token, without contacting the server
+            adapter.refresh_credentials_if_expiring()
+
+        assert refresh_token.called == expect_refresh
@@ -0,0 +1,68 @@
+import time
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from focus_time_app.utils import perf
+from focus_time_app.utils.perf import span, record_run, load_history, summarize_phases, percentile, PHASE_TOTAL
+
+
+class TestPerf:
+    """
+    Unit tests for the timing instrumentation, which do not require access to any calendar server.
+    """
+
+    def test_spans_are_recorded_per_run(self, tmp_path: Path):
+        history_file_path = tmp_path / "perf-history.jsonl"
+
+        with span("outside_of_any_run"):
+            pass
+        for _ in range(3):
+            with record_run("sync", history_file_path):
+                with span("get_events"):
+                    time.sleep(0.01)
+                for _ in range(2):  # the durations of repeated phases are summed up
+                    with span("command_execution"):
+                        time.sleep(0.01)
+        with pytest.raises(ValueError):
+            with record_run("start", history_file_path):
+                raise ValueError("failed")
+
+        runs = load_history(history_file_path, max_runs=10)
+        assert [run.command for run in runs] == ["sync", "sync", "sync", "start"]
+        assert [run.succeeded for run in runs] == [True, True, True, False]
+        assert set(runs[0].spans) == {"get_events", "command_execution", PHASE_TOTAL}
+        assert runs[0].spans["command_execution"] >= 20
+        assert runs[0].spans[PHASE_TOTAL] >= 30
+
+        assert len(load_history(history_file_path, max_runs=2)) == 2
+        assert len(load_history(history_file_path, max_runs=10, command="start")) == 1
+
+    def test_percentiles(self, tmp_path: Path):
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile(values, 99) == 99
+        assert percentile([7.0], 99) == 7
+
+        history_file_path = tmp_path / "perf-history.jsonl"
+        history_file_path.write_text('{"command":"sync","started_at":1,"succeeded":true,'
+                                     '"spans":{"get_events":5,"total":9}}\n'
+                                     'corrupt line of a killed run\n'
+                                     '{"command":"sync","started_at":2,"succeeded":true,'
+                                     '"spans":{"get_events":3,"total":4}}\n')
+        phases = summarize_phases(load_history(history_file_path, max_runs=10))
+        assert phases == {"get_events": [3, 5], PHASE_TOTAL: [4, 9]}
+
+    def test_history_is_trimmed(self, tmp_path: Path):
+        history_file_path = tmp_path / "perf-history.jsonl"
+
+        with mock.patch.object(perf, "MAX_RECORDED_RUNS", 3), \
+                mock.patch.object(perf, "_MAX_HISTORY_FILE_SIZE_BYTES", 0):
+            for started_at in range(5):
+                with record_run("sync", history_file_path) as run:
+                    run.started_at = started_at
+
+        assert [run.started_at for run in load_history(history_file_path, max_runs=10)] == [2, 3, 4]
+        assert [path.name for path in tmp_path.iterdir()] == ["perf-history.jsonl"]  # no temporary file is left
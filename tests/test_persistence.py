@@ -1,3 +1,5 @@
+from unittest import mock
+
 from focus_time_app.configuration.configuration import ConfigurationV1
 from focus_time_app.configuration.persistence import Persistence
 from focus_time_app.focus_time_calendar.event import CalendarType
@@ -26,6 +28,27 @@ class TestPersistence:
         assert config == config_loaded
         assert id(config) != id(config_loaded)
 
+    def test_load_configuration_from_cache(self):
+        """
+        Verifies that the validated configuration is cached, and that the cache is invalidated when the configuration
+        file changes.
+        """
+        config = ConfigurationV1(calendar_type=CalendarType.CalDAV, calendar_look_ahead_hours=3,
+                                 calendar_look_back_hours=5, focustime_event_name="ft", start_commands=["start"],
+                                 stop_commands=["stop"], dnd_profile_name="dnd", set_event_reminder=False,
+                                 event_reminder_time_minutes=0, adapter_configuration={"calendar_url": "https://x"})
+        Persistence.store_configuration(config)
+
+        assert Persistence.load_configuration() == config  # populates the cache
+        with mock.patch("focus_time_app.configuration.persistence.get_configuration_schema") as schema_mock:
+            assert Persistence.load_configuration() == config
+            schema_mock.assert_not_called()
+
+        config_file_path = Persistence.get_config_file_path()
+        config_file_path.write_text(config_file_path.read_text(encoding="utf-8").replace(
+            "focustime_event_name: ft", "focustime_event_name: changed"), encoding="utf-8")
+        assert Persistence.load_configuration().focustime_event_name == "changed"
+
     def test_ongoing_focus_time(self):
         """
         Verifies that the persistence of the "is focus time ongoing" marker file works.
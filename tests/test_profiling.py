@@ -0,0 +1,58 @@
+import os
+import pstats
+import time
+from pathlib import Path
+from unittest import mock
+
+from focus_time_app.utils import profiling
+from focus_time_app.utils.profiling import CommandProfiler
+
+
+def _busy_wait(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiling:
+    """
+    Unit tests for the profiling of CLI commands, which do not require access to any calendar server.
+    """
+
+    def test_profile_and_collapsed_stacks_are_written(self, tmp_path: Path):
+        profiler = CommandProfiler("sync", tmp_path / "profiles", sample_stacks=True)
+        profiler.start()
+        _busy_wait(0.1)
+        pstats_path, collapsed_path = profiler.stop()
+
+        assert pstats_path.name.startswith("sync-") and pstats_path.suffix == ".pstats"
+        profiled_functions = [function for _, _, function in pstats.Stats(str(pstats_path)).stats]
+        assert "_busy_wait" in profiled_functions
+
+        stacks = collapsed_path.read_text(encoding="utf-8").splitlines()
+        assert stacks
+        assert any(f"{__name__}:_busy_wait:" in line.rsplit(" ", 1)[0] for line in stacks)
+        assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in stacks)
+
+    def test_stacks_are_only_sampled_on_request(self, tmp_path: Path):
+        profiler = CommandProfiler("start", tmp_path, sample_stacks=False)
+        profiler.start()
+        written_paths = profiler.stop()
+        assert [path.suffix for path in written_paths] == [".pstats"]
+
+    def test_old_profiles_are_deleted(self, tmp_path: Path):
+        for i in range(3):
+            for suffix in [".pstats", ".collapsed"]:
+                path = tmp_path / f"sync-old{i}{suffix}"
+                path.write_text("")
+                os.utime(path, (i, i))
+        other_file = tmp_path / "notes.txt"
+        other_file.write_text("")
+
+        profiler = CommandProfiler("sync", tmp_path, sample_stacks=True)
+        profiler.start()
+        with mock.patch.object(profiling, "MAX_KEPT_PROFILES", 2):
+            written_paths = profiler.stop()
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+            ["notes.txt", "sync-old2.collapsed", "sync-old2.pstats"] + [path.name for path in written_paths])
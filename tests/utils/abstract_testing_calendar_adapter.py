@@ -12,5 +12,4 @@ class AbstractTestingCalendarAdapter(AbstractCalendarAdapter, ABC):
         to_date = now + timedelta(days=2)
 
         events = self.get_events((from_date, to_date))
-        for event in events:
-            self.remove_event(event)
+        self.remove_events(events)
@@ -0,0 +1,468 @@
+import base64
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, date, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List, Tuple
+from urllib.parse import urlsplit, unquote
+from xml.sax.saxutils import escape
+
+import icalendar
+import recurring_ical_events
+from lxml import etree
+
+DAV_NS = "DAV:"
+CALDAV_NS = "urn:ietf:params:xml:ns:caldav"
+CALENDARSERVER_NS = "http://calendarserver.org/ns/"
+NAMESPACES = {"D": DAV_NS, "C": CALDAV_NS, "CS": CALENDARSERVER_NS}
+
+SYNC_TOKEN_PREFIX = "http://focus-time-app.stand-in/sync/"
+
+
+@dataclass
+class StoredCalendarObject:
+    data: str
+    etag: str
+    start: datetime  # of the first occurrence
+    end: datetime
+    is_recurring: bool
+    calendar: icalendar.Calendar
+
+
+def _to_utc_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    raise ValueError(f"Unsupported date value {value!r}")
+
+
+def _parse_calendar_object(data: str) -> StoredCalendarObject:
+    calendar = icalendar.Calendar.from_ical(data)
+    events = [c for c in calendar.walk("VEVENT")]
+    if not events:
+        raise ValueError("The calendar object does not contain any VEVENT")
+    master = events[0]
+    start = _to_utc_datetime(master["dtstart"].dt)
+    end = _to_utc_datetime(master["dtend"].dt) if "dtend" in master else start
+    is_recurring = any(key in master for key in ["rrule", "rdate", "exdate", "exrule"])
+    return StoredCalendarObject(data=data, etag=f'"{hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]}"',
+                                start=start, end=end, is_recurring=is_recurring, calendar=calendar)
+
+
+def _to_expanded_form(calendar_object: StoredCalendarObject) -> str:
+    """
+    Returns the data of the calendar object in the form in which servers return it for a calendar-query with an
+    <expand> element (RFC 4791, section 9.6.5): the dates are converted to UTC, and the VTIMEZONE components are
+    dropped. Recurring objects are returned unchanged (the caldav library expands them on the client side).
+    """
+    if calendar_object.is_recurring:
+        return calendar_object.data
+    calendar = icalendar.Calendar.from_ical(calendar_object.data)
+    calendar.subcomponents = [c for c in calendar.subcomponents if c.name != "VTIMEZONE"]
+    for event in calendar.walk("VEVENT"):
+        for key in ["dtstart", "dtend"]:
+            if key in event and isinstance(event[key].dt, datetime):
+                value = _to_utc_datetime(event[key].dt)
+                del event[key]
+                event.add(key, value)
+    return calendar.to_ical().decode("utf-8")
+
+
+class CaldavStandInServer:
+    """
+    In-process CalDAV server (on localhost) with a single calendar, which supports the subset of RFC 4791 (CalDAV) and
+    RFC 6578 (sync-collection) that the CaldavCalendarAdapter uses: principal discovery, calendar-query (time-range and
+    UID filters), calendar-multiget and sync-collection REPORTs, the ctag and sync-token properties, and conditional
+    PUT and DELETE requests with ETags. Recurring events are returned unexpanded (the caldav library expands them on
+    the client side), while calendar-queries that request the expansion return the dates of the other events in UTC.
+
+    Every request is delayed by <latency_seconds>, to simulate the round-trip time of a real server.
+
+    If <etag_in_put_responses> is False, responses to PUT requests lack the ETag header, like real servers respond if
+    they modified (e.g. normalized) the stored calendar object.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, username: str = "user", password: str = "password"):
+        self.latency_seconds = latency_seconds
+        self.etag_in_put_responses = True
+        self.username = username
+        self.password = password
+        self.request_count = 0
+        self._objects: Dict[str, StoredCalendarObject] = {}  # by href
+        self._revision = 0
+        self._changes: List[Tuple[int, str]] = []  # (revision, href) of each modification
+        self._lock = threading.RLock()
+        self._http_server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._http_server.server_address[1]}"
+
+    @property
+    def calendar_path(self) -> str:
+        return f"/calendars/{self.username}/focus-time/"
+
+    @property
+    def calendar_url(self) -> str:
+        return self.base_url + self.calendar_path
+
+    def start(self) -> "CaldavStandInServer":
+        self._http_server = ThreadingHTTPServer(("127.0.0.1", 0), _CaldavRequestHandler)
+        self._http_server.daemon_threads = True
+        self._http_server.stand_in = self
+        # Note: the poll interval determines how long stop() takes
+        self._thread = threading.Thread(target=self._http_server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="CaldavStandInServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._http_server:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
+
+    def __enter__(self) -> "CaldavStandInServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def put_object(self, name: str, data: str) -> str:
+        """
+        Stores (or replaces) the calendar object <name> (e.g. "<uid>.ics") without sending a request, e.g. to seed the
+        calendar. Returns its href.
+        """
+        href = self.calendar_path + name
+        with self._lock:
+            self._store(href, _parse_calendar_object(data))
+        return href
+
+    def get_objects(self) -> Dict[str, str]:
+        """
+        Returns the data of the stored calendar objects, by href.
+        """
+        with self._lock:
+            return {href: o.data for href, o in self._objects.items()}
+
+    def clear(self):
+        with self._lock:
+            for href in list(self._objects):
+                self._delete(href)
+
+    def _store(self, href: str, calendar_object: StoredCalendarObject):
+        self._objects[href] = calendar_object
+        self._record_change(href)
+
+    def _delete(self, href: str):
+        del self._objects[href]
+        self._record_change(href)
+
+    def _record_change(self, href: str):
+        self._revision += 1
+        self._changes.append((self._revision, href))
+
+    @property
+    def _sync_token(self) -> str:
+        return f"{SYNC_TOKEN_PREFIX}{self._revision}"
+
+
+class _CaldavRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # enables keep-alive connections
+    disable_nagle_algorithm = True  # avoids delayed ACKs, because headers and body are written separately
+    server: ThreadingHTTPServer
+
+    @property
+    def _stand_in(self) -> CaldavStandInServer:
+        return getattr(self.server, "stand_in")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: bytes = b"", content_type: Optional[str] = None,
+              headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_multistatus(self, responses: List[str], extra: str = ""):
+        body = f'<?xml version="1.0" encoding="utf-8"?>\n<D:multistatus xmlns:D="DAV:" xmlns:C="{CALDAV_NS}" ' \
+               f'xmlns:CS="{CALENDARSERVER_NS}">{"".join(responses)}{extra}</D:multistatus>'
+        self._send(207, body.encode("utf-8"), 'application/xml; charset="utf-8"')
+
+    def _is_authorized(self) -> bool:
+        expected = base64.b64encode(f"{self._stand_in.username}:{self._stand_in.password}".encode()).decode()
+        return self.headers.get("Authorization", "") == f"Basic {expected}"
+
+    def _handle(self, method):
+        body = self._read_body()
+        stand_in = self._stand_in
+        with stand_in._lock:
+            stand_in.request_count += 1
+        if stand_in.latency_seconds > 0:
+            time.sleep(stand_in.latency_seconds)
+        if not self._is_authorized():
+            self._send(401, b"Unauthorized", "text/plain", {"WWW-Authenticate": 'Basic realm="stand-in"'})
+            return
+        path = unquote(urlsplit(self.path).path)
+        try:
+            method(path, body)
+        except etree.XMLSyntaxError:
+            self._send(400, b"Malformed XML body", "text/plain")
+
+    def do_OPTIONS(self):
+        self._handle(lambda path, body: self._send(200, headers={
+            "DAV": "1, 2, 3, calendar-access", "Allow": "OPTIONS, GET, PUT, DELETE, PROPFIND, REPORT"}))
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_PUT(self):
+        self._handle(self._put)
+
+    def do_DELETE(self):
+        self._handle(self._delete)
+
+    def do_PROPFIND(self):
+        self._handle(self._propfind)
+
+    def do_REPORT(self):
+        self._handle(self._report)
+
+    def _get(self, path: str, body: bytes):
+        with self._stand_in._lock:
+            calendar_object = self._stand_in._objects.get(path)
+        if calendar_object is None:
+            self._send(404)
+        else:
+            self._send(200, calendar_object.data.encode("utf-8"), 'text/calendar; charset="utf-8"',
+                       {"ETag": calendar_object.etag})
+
+    def _put(self, path: str, body: bytes):
+        stand_in = self._stand_in
+        if not path.startswith(stand_in.calendar_path) or path == stand_in.calendar_path:
+            self._send(403)
+            return
+        try:
+            calendar_object = _parse_calendar_object(body.decode("utf-8"))
+        except ValueError:
+            self._send(400, b"Invalid calendar data", "text/plain")
+            return
+        with stand_in._lock:
+            existing_object = stand_in._objects.get(path)
+            if not self._preconditions_hold(existing_object):
+                self._send(412)
+                return
+            stand_in._store(path, calendar_object)
+        self._send(204 if existing_object else 201,
+                   headers={"ETag": calendar_object.etag} if stand_in.etag_in_put_responses else {})
+
+    def _delete(self, path: str, body: bytes):
+        stand_in = self._stand_in
+        with stand_in._lock:
+            existing_object = stand_in._objects.get(path)
+            if existing_object is None:
+                self._send(404)
+                return
+            if not self._preconditions_hold(existing_object):
+                self._send(412)
+                return
+            stand_in._delete(path)
+        self._send(204)
+
+    def _preconditions_hold(self, existing_object: Optional[StoredCalendarObject]) -> bool:
+        if self.headers.get("If-None-Match") == "*" and existing_object is not None:
+            return False
+        if if_match := self.headers.get("If-Match"):
+            return existing_object is not None and if_match in ("*", existing_object.etag)
+        return True
+
+    # PROPFIND
+
+    def _propfind(self, path: str, body: bytes):
+        stand_in = self._stand_in
+        requested_props = self._get_requested_props(body)
+        principal_path = f"/principals/{stand_in.username}/"
+        home_path = f"/calendars/{stand_in.username}/"
+        with stand_in._lock:
+            resources = [path]
+            if self.headers.get("Depth", "0") == "1":
+                if path == home_path:
+                    resources.append(stand_in.calendar_path)
+                elif path == stand_in.calendar_path:
+                    resources.extend(stand_in._objects)
+            if path not in (principal_path, home_path, stand_in.calendar_path, "/") and \
+                    path not in stand_in._objects:
+                self._send(404)
+                return
+            responses = [self._propfind_response(resource, requested_props, principal_path, home_path)
+                         for resource in resources]
+        self._send_multistatus(responses)
+
+    @staticmethod
+    def _get_requested_props(body: bytes) -> List[str]:
+        if not body.strip():
+            return []  # allprop
+        root = etree.fromstring(body)
+        return [element.tag for element in root.iterfind("D:prop/*", NAMESPACES)]
+
+    def _propfind_response(self, path: str, requested_props: List[str], principal_path: str, home_path: str) -> str:
+        stand_in = self._stand_in
+        calendar_object = stand_in._objects.get(path)
+        values: Dict[str, str] = {
+            f"{{{DAV_NS}}}current-user-principal": f"<D:href>{principal_path}</D:href>",
+            f"{{{CALDAV_NS}}}calendar-home-set": f"<D:href>{home_path}</D:href>",
+        }
+        if path == stand_in.calendar_path:
+            values.update({
+                f"{{{DAV_NS}}}resourcetype": "<D:collection/><C:calendar/>",
+                f"{{{DAV_NS}}}displayname": "Focus time",
+                f"{{{CALENDARSERVER_NS}}}getctag": str(stand_in._revision),
+                f"{{{DAV_NS}}}sync-token": stand_in._sync_token,
+                f"{{{CALDAV_NS}}}supported-calendar-component-set": '<C:comp name="VEVENT"/>',
+            })
+        elif calendar_object is not None:
+            values.update({
+                f"{{{DAV_NS}}}resourcetype": "",
+                f"{{{DAV_NS}}}getetag": escape(calendar_object.etag),
+                f"{{{DAV_NS}}}getcontenttype": "text/calendar; charset=utf-8",
+            })
+        elif path == principal_path:
+            values[f"{{{DAV_NS}}}resourcetype"] = "<D:collection/><D:principal/>"
+        else:
+            values[f"{{{DAV_NS}}}resourcetype"] = "<D:collection/>"
+        return self._response(path, {prop: values.get(prop) for prop in requested_props or values})
+
+    @staticmethod
+    def _response(href: str, props: Dict[str, Optional[str]]) -> str:
+        """
+        Returns a <D:response> element with the provided properties (clark notation). Properties whose value is None
+        are reported as not found.
+        """
+
+        def prop_xml(tag: str, value: Optional[str]) -> str:
+            namespace, name = tag[1:].split("}")
+            prefix = {DAV_NS: "D", CALDAV_NS: "C", CALENDARSERVER_NS: "CS"}.get(namespace)
+            if prefix is None:
+                return f'<X:{name} xmlns:X="{namespace}"/>'
+            return f"<{prefix}:{name}>{value or ''}</{prefix}:{name}>" if value is not None else f"<{prefix}:{name}/>"
+
+        found = "".join(prop_xml(tag, value) for tag, value in props.items() if value is not None)
+        missing = "".join(prop_xml(tag, None) for tag, value in props.items() if value is None)
+        xml = f"<D:response><D:href>{escape(href)}</D:href>"
+        if found or not missing:
+            xml += f"<D:propstat><D:prop>{found}</D:prop><D:status>HTTP/1.1 200 OK</D:status></D:propstat>"
+        if missing:
+            xml += f"<D:propstat><D:prop>{missing}</D:prop><D:status>HTTP/1.1 404 Not Found</D:status></D:propstat>"
+        return xml + "</D:response>"
+
+    # REPORT
+
+    def _report(self, path: str, body: bytes):
+        if path != self._stand_in.calendar_path:
+            self._send(403)
+            return
+        root = etree.fromstring(body)
+        if root.tag == f"{{{CALDAV_NS}}}calendar-query":
+            self._calendar_query(root)
+        elif root.tag == f"{{{CALDAV_NS}}}calendar-multiget":
+            self._calendar_multiget(root)
+        elif root.tag == f"{{{DAV_NS}}}sync-collection":
+            self._sync_collection(root)
+        else:
+            self._send(403, b"Unsupported REPORT", "text/plain")
+
+    def _object_props(self, calendar_object: StoredCalendarObject, requested_props: List[str],
+                      expand: bool = False) -> Dict[str, str]:
+        data = _to_expanded_form(calendar_object) if expand else calendar_object.data
+        values = {f"{{{DAV_NS}}}getetag": escape(calendar_object.etag),
+                  f"{{{CALDAV_NS}}}calendar-data": escape(data)}
+        return {prop: values.get(prop) for prop in requested_props}
+
+    def _calendar_query(self, root: etree.Element):
+        requested_props = [e.tag for e in root.iterfind("D:prop/*", NAMESPACES)]
+        time_range = root.find(".//C:comp-filter[@name='VEVENT']/C:time-range", NAMESPACES)
+        start = self._parse_utc(time_range.get("start")) if time_range is not None else None
+        end = self._parse_utc(time_range.get("end")) if time_range is not None else None
+        uid_match = root.find(".//C:prop-filter[@name='UID']/C:text-match", NAMESPACES)
+        expand = root.find("D:prop/C:calendar-data/C:expand", NAMESPACES) is not None
+
+        with self._stand_in._lock:
+            objects = list(self._stand_in._objects.items())
+        responses = []
+        for href, calendar_object in objects:
+            if uid_match is not None and \
+                    str(calendar_object.calendar.walk("VEVENT")[0].get("uid")) != (uid_match.text or "").strip():
+                continue
+            if (start or end) and not self._overlaps(calendar_object, start, end):
+                continue
+            responses.append(self._response(href, self._object_props(calendar_object, requested_props, expand)))
+        self._send_multistatus(responses)
+
+    def _calendar_multiget(self, root: etree.Element):
+        requested_props = [e.tag for e in root.iterfind("D:prop/*", NAMESPACES)]
+        responses = []
+        with self._stand_in._lock:
+            for href_element in root.iterfind("D:href", NAMESPACES):
+                href = unquote(urlsplit(href_element.text.strip()).path)
+                if calendar_object := self._stand_in._objects.get(href):
+                    responses.append(self._response(href, self._object_props(calendar_object, requested_props)))
+                else:
+                    responses.append(f"<D:response><D:href>{escape(href)}</D:href>"
+                                     f"<D:status>HTTP/1.1 404 Not Found</D:status></D:response>")
+        self._send_multistatus(responses)
+
+    def _sync_collection(self, root: etree.Element):
+        stand_in = self._stand_in
+        requested_props = [e.tag for e in root.iterfind("D:prop/*", NAMESPACES)]
+        token = (root.findtext("D:sync-token", default="", namespaces=NAMESPACES) or "").strip()
+        with stand_in._lock:
+            if not token:
+                changed_hrefs = list(stand_in._objects)
+            else:
+                revision = token[len(SYNC_TOKEN_PREFIX):] if token.startswith(SYNC_TOKEN_PREFIX) else ""
+                if not revision.isdigit() or int(revision) > stand_in._revision:
+                    self._send(403, b'<?xml version="1.0" encoding="utf-8"?>\n'
+                                    b'<D:error xmlns:D="DAV:"><D:valid-sync-token/></D:error>',
+                               'application/xml; charset="utf-8"')
+                    return
+                changed_hrefs = list(dict.fromkeys(href for rev, href in stand_in._changes if rev > int(revision)))
+            responses = []
+            for href in changed_hrefs:
+                if calendar_object := stand_in._objects.get(href):
+                    responses.append(self._response(href, self._object_props(calendar_object, requested_props)))
+                else:
+                    responses.append(f"<D:response><D:href>{escape(href)}</D:href>"
+                                     f"<D:status>HTTP/1.1 404 Not Found</D:status></D:response>")
+            sync_token = stand_in._sync_token
+        self._send_multistatus(responses, extra=f"<D:sync-token>{sync_token}</D:sync-token>")
+
+    @staticmethod
+    def _parse_utc(value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+
+    @staticmethod
+    def _overlaps(calendar_object: StoredCalendarObject, start: Optional[datetime], end: Optional[datetime]) -> bool:
+        start = start or datetime.min.replace(tzinfo=timezone.utc)
+        end = end or datetime.max.replace(tzinfo=timezone.utc)
+        if not calendar_object.is_recurring:
+            return calendar_object.start < end and calendar_object.end > start
+        if calendar_object.start >= end:
+            return False
+        return bool(recurring_ical_events.of(calendar_object.calendar).between(start, end))
@@ -0,0 +1,43 @@
+from typing import List, Optional
+
+from focus_time_app.command_execution.abstract_command_executor import AbstractCommandExecutor, \
+    CommandExecutorConstants
+from focus_time_app.utils.deadline import Deadline
+
+
+class FakeCommandExecutor(AbstractCommandExecutor):
+    """
+    Command executor that only records the commands (instead of running them in a shell), and keeps the DND state in
+    memory (instead of changing the DND / Focus mode of the OS). Works on any platform, including Linux, and does not
+    affect other tests that run at the same time.
+    """
+
+    def __init__(self):
+        self.executed_commands: List[str] = []
+        self.dnd_profile_name: Optional[str] = None  # the active DND profile, None if DND is inactive
+        self.dnd_helper_installed = True
+
+    def execute_commands(self, commands: List[str], dnd_profile_name: str, deadline: Optional[Deadline] = None):
+        for command in commands:
+            if deadline is not None:
+                deadline.get_timeout()  # raises if the deadline has expired, like the real implementations
+            if command == CommandExecutorConstants.DND_START_COMMAND:
+                self.set_dnd_active(active=True, dnd_profile_name=dnd_profile_name)
+            elif command == CommandExecutorConstants.DND_STOP_COMMAND:
+                self.set_dnd_active(active=False, dnd_profile_name=dnd_profile_name)
+            self.executed_commands.append(command)
+
+    def install_dnd_helpers(self):
+        self.dnd_helper_installed = True
+
+    def is_dnd_helper_installed(self) -> bool:
+        return self.dnd_helper_installed
+
+    def uninstall_dnd_helpers(self):
+        self.dnd_helper_installed = False
+
+    def is_dnd_active(self) -> bool:
+        return self.dnd_profile_name is not None
+
+    def set_dnd_active(self, active: bool, dnd_profile_name: str, timeout: Optional[float] = None):
+        self.dnd_profile_name = dnd_profile_name if active else None
@@ -0,0 +1,15 @@
+from typing import List, Tuple
+
+from focus_time_app.utils.os_notification.abstract_os_notification import AbstractOsNotification
+
+
+class FakeOsNotification(AbstractOsNotification):
+    """
+    Records the notifications (as (title, message) tuples) instead of showing them. Works on any platform.
+    """
+
+    def __init__(self):
+        self.notifications: List[Tuple[str, str]] = []
+
+    def send_notification(self, title: str, message: str):
+        self.notifications.append((title, message))
@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from keyring.backend import KeyringBackend
+from keyring.errors import PasswordDeleteError
+
+# Path of the JSON file in which the FileKeyring stores the passwords
+KEYRING_FILE_ENV_VAR_NAME = "FOCUS_TIME_APP_TEST_KEYRING_FILE"
+# Value of the PYTHON_KEYRING_BACKEND environment variable, which makes the keyring library of a (child) process use
+# the FileKeyring
+FILE_KEYRING_BACKEND_NAME = "tests.utils.file_keyring.FileKeyring"
+
+
+class FileKeyring(KeyringBackend):
+    """
+    Keyring backend that stores the passwords (in plain text!) in the JSON file configured via the
+    KEYRING_FILE_ENV_VAR_NAME environment variable. Unlike an in-memory keyring, it can be shared with child processes
+    (e.g. a CLI command started by a benchmark), which select it via the PYTHON_KEYRING_BACKEND environment variable.
+    Only meant for tests and benchmarks, which must not touch the credentials manager of the OS.
+    """
+    priority = 1
+    _lock = threading.Lock()
+
+    @property
+    def _path(self) -> Path:
+        return Path(os.environ[KEYRING_FILE_ENV_VAR_NAME])
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self._path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    def _save(self, passwords: dict):
+        self._path.write_text(json.dumps(passwords), encoding="utf-8")
+
+    def get_password(self, service, username):
+        with self._lock:
+            return self._load().get(f"{service}/{username}")
+
+    def set_password(self, service, username, password):
+        with self._lock:
+            passwords = self._load()
+            passwords[f"{service}/{username}"] = password
+            self._save(passwords)
+
+    def delete_password(self, service, username):
+        with self._lock:
+            passwords = self._load()
+            if passwords.pop(f"{service}/{username}", None) is None:
+                raise PasswordDeleteError(username)
+            self._save(passwords)
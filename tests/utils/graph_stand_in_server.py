@@ -0,0 +1,427 @@
+import json
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List, Tuple, Any
+from urllib.parse import urlsplit, parse_qs, urlencode, unquote
+
+GRAPH_API_VERSION = "v1.0"
+# Format of the "dateTime" values of Graph's dateTimeTimeZone resources
+GRAPH_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f0"
+
+_FILTER_CONDITION_PATTERN = re.compile(r"([\w/]+) (eq|ne|ge|gt|le|lt) '((?:[^']|'')*)'")
+
+
+@dataclass
+class StoredGraphEvent:
+    id: str
+    ical_uid: str
+    subject: str
+    start: datetime  # in UTC
+    end: datetime
+    reminder_minutes: int = 0  # 0 disables the reminder
+    # Number of daily occurrences (1 for non-recurring events)
+    occurrences: int = 1
+    change_key: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+
+    def get_instances(self) -> List[Tuple[str, datetime, datetime]]:
+        """
+        Returns the (ID, start, end) of each occurrence of the event, as returned by calendarView queries.
+        """
+        if self.occurrences <= 1:
+            return [(self.id, self.start, self.end)]
+        return [(f"{self.id}-{i}", self.start + timedelta(days=i), self.end + timedelta(days=i))
+                for i in range(self.occurrences)]
+
+    def to_json(self, instance_id: Optional[str] = None, start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> Dict[str, Any]:
+        start, end = start or self.start, end or self.end
+        event_type = "singleInstance" if self.occurrences <= 1 else \
+            ("seriesMaster" if instance_id is None else "occurrence")
+        result = {
+            "@odata.etag": f'W/"{self.change_key}"',
+            "id": instance_id or self.id,
+            "iCalUId": self.ical_uid,
+            "changeKey": self.change_key,
+            "subject": self.subject,
+            "type": event_type,
+            "isAllDay": False,
+            "isCancelled": False,
+            "showAs": "busy",
+            "isReminderOn": self.reminder_minutes > 0,
+            "reminderMinutesBeforeStart": self.reminder_minutes,
+            "start": {"dateTime": start.strftime(GRAPH_DATETIME_FORMAT), "timeZone": "UTC"},
+            "end": {"dateTime": end.strftime(GRAPH_DATETIME_FORMAT), "timeZone": "UTC"},
+        }
+        if event_type == "seriesMaster":
+            result["recurrence"] = {
+                "pattern": {"type": "daily", "interval": 1},
+                "range": {"type": "numbered", "startDate": self.start.strftime("%Y-%m-%d"),
+                          "numberOfOccurrences": self.occurrences}}
+        if event_type == "occurrence":
+            result["seriesMasterId"] = self.id
+        return result
+
+
+def _parse_graph_datetime(value: Dict[str, str]) -> datetime:
+    # Note: the stand-in only supports UTC, which is what the Outlook365CalendarAdapter sends
+    return datetime.fromisoformat(value["dateTime"].rstrip("Z")[:26]).replace(tzinfo=timezone.utc)
+
+
+def _parse_filter_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.rstrip("Z"))
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+class GraphStandInServer:
+    """
+    In-process stand-in (on localhost) for the calendar endpoints of Microsoft Graph, with a single calendar (which is
+    also the default calendar), supporting what the Outlook365CalendarAdapter uses: listing calendars (optionally
+    filtered by name), events queries (with simple $filter expressions and $top), creating, updating (PATCH) and
+    deleting events (conditional with If-Match), JSON batch requests, and calendarView delta queries (with nextLinks
+    and deltaLinks). Recurring events recur daily, and are only expanded by calendarView queries.
+
+    Any bearer token is accepted. Every request is delayed by <latency_seconds>, to simulate the round-trip time of a
+    real server.
+    """
+    CALENDAR_NAME = "Calendar"
+
+    def __init__(self, latency_seconds: float = 0.0, delta_page_size: int = 50):
+        self.latency_seconds = latency_seconds
+        self.delta_page_size = delta_page_size
+        self.request_count = 0
+        self.calendar_id = "AAMkAGI2TGuLAAA" + uuid.uuid4().hex
+        self._events: Dict[str, StoredGraphEvent] = {}  # by ID
+        self._revision = 0
+        self._changes: List[Tuple[int, str]] = []  # (revision, event ID) of each modification
+        self._deleted_instance_ids: Dict[str, List[str]] = {}  # by event ID
+        self._lock = threading.RLock()
+        self._http_server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._http_server.server_address[1]}/"
+
+    @property
+    def service_url(self) -> str:
+        return f"{self.base_url}{GRAPH_API_VERSION}/"
+
+    def start(self) -> "GraphStandInServer":
+        self._http_server = ThreadingHTTPServer(("127.0.0.1", 0), _GraphRequestHandler)
+        self._http_server.daemon_threads = True
+        self._http_server.stand_in = self
+        # Note: the poll interval determines how long stop() takes
+        threading.Thread(target=self._http_server.serve_forever, kwargs={"poll_interval": 0.05},
+                         name="GraphStandInServer", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._http_server:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
+
+    def __enter__(self) -> "GraphStandInServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def add_event(self, subject: str, start: datetime, end: datetime, reminder_minutes: int = 0,
+                  occurrences: int = 1, ical_uid: Optional[str] = None) -> StoredGraphEvent:
+        """
+        Stores a new event without sending a request, e.g. to seed the calendar.
+        """
+        event = StoredGraphEvent(id="AAMkAGI2THVSAAA" + uuid.uuid4().hex, ical_uid=ical_uid or uuid.uuid4().hex,
+                                 subject=subject, start=start.astimezone(timezone.utc),
+                                 end=end.astimezone(timezone.utc), reminder_minutes=reminder_minutes,
+                                 occurrences=occurrences)
+        with self._lock:
+            self._store(event)
+        return event
+
+    def get_events(self) -> List[StoredGraphEvent]:
+        with self._lock:
+            return list(self._events.values())
+
+    def clear(self):
+        with self._lock:
+            for event_id in list(self._events):
+                self._delete(event_id)
+
+    def _store(self, event: StoredGraphEvent):
+        self._events[event.id] = event
+        self._record_change(event.id)
+
+    def _delete(self, event_id: str):
+        # Note: the IDs of the deleted occurrences are returned by delta queries
+        self._deleted_instance_ids[event_id] = [i for i, _, _ in self._events.pop(event_id).get_instances()]
+        self._record_change(event_id)
+
+    def _record_change(self, event_id: str):
+        self._revision += 1
+        self._changes.append((self._revision, event_id))
+
+    # Request handling, independent of HTTP (because batch requests contain sub-requests)
+
+    def handle(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+               body: Optional[Dict[str, Any]]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """
+        Handles one (sub-)request, where <path> is relative to the service URL, e.g. "me/events/<id>". Returns the
+        status code and the JSON body.
+        """
+        segments = [unquote(s) for s in path.strip("/").split("/")]
+        if segments[0] == "users":
+            segments = ["me"] + segments[2:]  # the adapter always uses "me", but be lenient
+        with self._lock:
+            if method == "GET" and segments == ["me", "calendars"]:
+                return self._list_calendars(query)
+            if method == "GET" and segments in (["me", "calendar"], ["me", "calendars", self.calendar_id]):
+                return 200, self._calendar_json()
+            if segments[:2] == ["me", "calendar"] or segments[:3] == ["me", "calendars", self.calendar_id]:
+                rest = segments[2:] if segments[1] == "calendar" else segments[3:]
+                if rest == ["events"] and method == "GET":
+                    return self._query_events(query)
+                if rest == ["events"] and method == "POST":
+                    return self._create_event(body or {})
+                if rest == ["calendarView", "delta"] and method == "GET":
+                    return self._delta(query)
+                if rest == ["calendarView"] and method == "GET":
+                    return self._calendar_view(query)
+            if len(segments) == 3 and segments[:2] == ["me", "events"]:
+                if method == "GET":
+                    event = self._events.get(segments[2])
+                    return (200, event.to_json()) if event else self._error(404, "ErrorItemNotFound")
+                if method == "PATCH":
+                    return self._update_event(segments[2], headers, body or {})
+                if method == "DELETE":
+                    return self._delete_event(segments[2], headers)
+        return self._error(400, "BadRequest", f"Unsupported request {method} {path}")
+
+    @staticmethod
+    def _error(status: int, code: str, message: str = "") -> Tuple[int, Dict[str, Any]]:
+        return status, {"error": {"code": code, "message": message or code}}
+
+    def _calendar_json(self) -> Dict[str, Any]:
+        return {"id": self.calendar_id, "name": self.CALENDAR_NAME, "canEdit": True, "isDefaultCalendar": True,
+                "owner": {"name": "Stand-in user", "address": "user@example.com"}}
+
+    def _list_calendars(self, query: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        calendars = [self._calendar_json()]
+        if name_filter := query.get("$filter"):
+            conditions = self._parse_filter(name_filter)
+            calendars = [c for c in calendars if all(c.get(a) == v for a, op, v in conditions if op == "eq")]
+        return 200, {"value": calendars}
+
+    @staticmethod
+    def _parse_filter(value: str) -> List[Tuple[str, str, str]]:
+        return [(attribute, operator, operand.replace("''", "'"))
+                for attribute, operator, operand in _FILTER_CONDITION_PATTERN.findall(value)]
+
+    def _matches_filter(self, event_json: Dict[str, Any], conditions: List[Tuple[str, str, str]]) -> bool:
+        for attribute, operator, operand in conditions:
+            if attribute in ("start/dateTime", "end/dateTime"):
+                actual: Any = _parse_graph_datetime(event_json[attribute.split("/")[0]])
+                expected: Any = _parse_filter_datetime(operand)
+            else:
+                actual, expected = event_json.get(attribute), operand
+            if not {"eq": actual == expected, "ne": actual != expected, "ge": actual >= expected,
+                    "gt": actual > expected, "le": actual <= expected, "lt": actual < expected}[operator]:
+                return False
+        return True
+
+    def _query_events(self, query: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        return 200, self._filter_and_paginate([e.to_json() for e in self._events.values()], query, "events")
+
+    def _filter_and_paginate(self, events: List[Dict[str, Any]], query: Dict[str, str],
+                             resource: str) -> Dict[str, Any]:
+        """
+        Applies the $filter, $orderby, $top and $skip query parameters to the provided events (JSON), and returns the
+        response body, with a nextLink if there are further events.
+        """
+        conditions = self._parse_filter(query.get("$filter", ""))
+        events = [e for e in events if self._matches_filter(e, conditions)]
+        if query.get("$orderby", "").startswith("start/dateTime"):
+            events.sort(key=lambda e: e["start"]["dateTime"], reverse=query["$orderby"].endswith(" desc"))
+        top = int(query.get("$top", 10))
+        skip = int(query.get("$skip", 0))
+        result: Dict[str, Any] = {"value": events[skip:skip + top]}
+        if skip + top < len(events):
+            result["@odata.nextLink"] = f"{self.service_url}me/calendars/{self.calendar_id}/{resource}?" + \
+                                        urlencode({**query, "$skip": skip + top})
+        return result
+
+    def _get_instances_in_window(self, start: datetime, end: datetime,
+                                 event_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        instances = []
+        for event_id in (event_ids if event_ids is not None else list(self._events)):
+            if event := self._events.get(event_id):
+                for instance_id, instance_start, instance_end in event.get_instances():
+                    if instance_start < end and instance_end > start:
+                        instances.append(event.to_json(instance_id if event.occurrences > 1 else None,
+                                                       instance_start, instance_end))
+        return instances
+
+    def _calendar_view(self, query: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        start, end = _parse_filter_datetime(query["startDateTime"]), _parse_filter_datetime(query["endDateTime"])
+        return 200, self._filter_and_paginate(self._get_instances_in_window(start, end), query, "calendarView")
+
+    def _delta(self, query: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        """
+        Delta query on the calendarView. The $deltatoken encodes the revision (and the time window), the $skiptoken
+        additionally the offset of the next page.
+        """
+        token = query.get("$skiptoken") or query.get("$deltatoken")
+        if token:
+            try:
+                revision, offset, start_value, end_value = token.split("~")
+                revision, offset = int(revision), int(offset)
+            except ValueError:
+                return self._error(400, "BadRequest", "Invalid token")
+            if revision > self._revision:
+                return self._error(410, "SyncStateNotFound")
+            start, end = _parse_filter_datetime(start_value), _parse_filter_datetime(end_value)
+        else:
+            revision, offset = 0, 0
+            start_value, end_value = query["startDateTime"], query["endDateTime"]
+            start, end = _parse_filter_datetime(start_value), _parse_filter_datetime(end_value)
+
+        if query.get("$deltatoken"):
+            changed_ids = list(dict.fromkeys(event_id for rev, event_id in self._changes if rev > revision))
+            changes = self._get_instances_in_window(start, end, [i for i in changed_ids if i in self._events])
+            changes.extend({"id": instance_id, "@removed": {"reason": "deleted"}}
+                           for event_id in changed_ids if event_id not in self._events
+                           for instance_id in self._deleted_instance_ids.get(event_id, [event_id]))
+            # Note: unlike Graph, the changes are returned on a single page
+            return 200, {"value": changes, "@odata.deltaLink": self._delta_link(self._revision, start_value,
+                                                                                end_value)}
+
+        # Initial (paged) synchronization: the revision of the first page is kept in the skiptokens
+        if not query.get("$skiptoken"):
+            revision = self._revision
+        instances = self._get_instances_in_window(start, end)
+        page = instances[offset:offset + self.delta_page_size]
+        result: Dict[str, Any] = {"value": page}
+        if offset + self.delta_page_size < len(instances):
+            result["@odata.nextLink"] = f"{self.service_url}me/calendars/{self.calendar_id}/calendarView/delta?" + \
+                urlencode({"$skiptoken": f"{revision}~{offset + self.delta_page_size}~{start_value}~{end_value}"})
+        else:
+            result["@odata.deltaLink"] = self._delta_link(revision, start_value, end_value)
+        return 200, result
+
+    def _delta_link(self, revision: int, start_value: str, end_value: str) -> str:
+        return f"{self.service_url}me/calendars/{self.calendar_id}/calendarView/delta?" + \
+            urlencode({"$deltatoken": f"{revision}~0~{start_value}~{end_value}"})
+
+    def _create_event(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if "start" not in body or "end" not in body:
+            return self._error(400, "ErrorInvalidRequest", "start and end are required")
+        event = StoredGraphEvent(id="AAMkAGI2THVSAAA" + uuid.uuid4().hex, ical_uid=uuid.uuid4().hex,
+                                 subject=body.get("subject", ""), start=_parse_graph_datetime(body["start"]),
+                                 end=_parse_graph_datetime(body["end"]),
+                                 reminder_minutes=body.get("reminderMinutesBeforeStart", 15)
+                                 if body.get("isReminderOn", True) else 0)
+        self._store(event)
+        return 201, event.to_json()
+
+    def _check_if_match(self, event: StoredGraphEvent, headers: Dict[str, str]) -> bool:
+        if_match = headers.get("if-match")
+        return not if_match or if_match in ("*", f'W/"{event.change_key}"', event.change_key)
+
+    def _update_event(self, event_id: str, headers: Dict[str, str],
+                      body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        event = self._events.get(event_id)
+        if event is None:
+            return self._error(404, "ErrorItemNotFound")
+        if not self._check_if_match(event, headers):
+            return self._error(412, "ErrorIrresolvableConflict")
+        if "subject" in body:
+            event.subject = body["subject"]
+        if "start" in body:
+            event.start = _parse_graph_datetime(body["start"])
+        if "end" in body:
+            event.end = _parse_graph_datetime(body["end"])
+        if "isReminderOn" in body:
+            event.reminder_minutes = body.get("reminderMinutesBeforeStart", event.reminder_minutes or 15) \
+                if body["isReminderOn"] else 0
+        event.change_key = uuid.uuid4().hex[:16]
+        self._store(event)
+        return 200, event.to_json()
+
+    def _delete_event(self, event_id: str, headers: Dict[str, str]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        event = self._events.get(event_id)
+        if event is None:
+            return self._error(404, "ErrorItemNotFound")
+        if not self._check_if_match(event, headers):
+            return self._error(412, "ErrorIrresolvableConflict")
+        self._delete(event_id)
+        return 204, None
+
+    def handle_batch(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        responses = []
+        for request in body.get("requests", []):
+            url = urlsplit(request["url"])
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            headers = {k.lower(): v for k, v in request.get("headers", {}).items()}
+            status, response_body = self.handle(request["method"].upper(), url.path, query, headers,
+                                                request.get("body"))
+            response = {"id": request["id"], "status": status, "headers": {"Content-Type": "application/json"}}
+            if response_body is not None:
+                response["body"] = response_body
+            responses.append(response)
+        return 200, {"responses": responses}
+
+
+class _GraphRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # enables keep-alive connections
+    disable_nagle_algorithm = True  # avoids delayed ACKs, because headers and body are written separately
+    server: ThreadingHTTPServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        stand_in: GraphStandInServer = getattr(self.server, "stand_in")
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        with stand_in._lock:
+            stand_in.request_count += 1
+        if stand_in.latency_seconds > 0:
+            time.sleep(stand_in.latency_seconds)
+
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            status, body = GraphStandInServer._error(401, "InvalidAuthenticationToken")
+        else:
+            url = urlsplit(self.path)
+            path = url.path
+            prefix = f"/{GRAPH_API_VERSION}/"
+            if not path.startswith(prefix):
+                status, body = GraphStandInServer._error(400, "BadRequest", "Unsupported API version")
+            else:
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                try:
+                    json_body = json.loads(raw_body) if raw_body else None
+                except ValueError:
+                    json_body = None
+                if path == prefix + "$batch" and self.command == "POST":
+                    status, body = stand_in.handle_batch(json_body or {})
+                else:
+                    headers = {k.lower(): v for k, v in self.headers.items()}
+                    status, body = stand_in.handle(self.command, path[len(prefix):], query, headers, json_body)
+
+        response_bytes = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response_bytes)))
+        self.end_headers()
+        self.wfile.write(response_bytes)
+
+    do_GET = _handle
+    do_POST = _handle
+    do_PATCH = _handle
+    do_DELETE = _handle
@@ -0,0 +1,36 @@
+import time
+from typing import Dict, Tuple
+
+from keyring.backend import KeyringBackend
+from keyring.errors import PasswordDeleteError
+
+
+class CountingInMemoryKeyring(KeyringBackend):
+    """
+    Keyring backend that keeps the passwords in memory, counts the calls, and simulates the latency of the credentials
+    manager of the OS.
+    """
+    priority = 1
+
+    def __init__(self, latency_seconds: float):
+        super().__init__()
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self._passwords: Dict[Tuple[str, str], str] = {}
+
+    def get_password(self, service, username):
+        self._simulate_call()
+        return self._passwords.get((service, username))
+
+    def set_password(self, service, username, password):
+        self._simulate_call()
+        self._passwords[(service, username)] = password
+
+    def delete_password(self, service, username):
+        self._simulate_call()
+        if self._passwords.pop((service, username), None) is None:
+            raise PasswordDeleteError(username)
+
+    def _simulate_call(self):
+        self.calls += 1
+        time.sleep(self.latency_seconds)
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Iterator, Union
+from unittest import mock
+
+import keyring
+
+from focus_time_app.configuration.configuration import ConfigurationV1
+from focus_time_app.configuration.persistence import Persistence
+from focus_time_app.focus_time_calendar.abstract_calendar_adapter import AbstractCalendarAdapter
+from focus_time_app.focus_time_calendar.event import CalendarType
+from focus_time_app.focus_time_calendar.event_store import EventStore
+from focus_time_app.focus_time_calendar.impl.caldav_calendar_adapter import CaldavCalendarAdapter
+from focus_time_app.focus_time_calendar.impl.keyring_credentials_store import KeyringCredentialsStore
+from focus_time_app.focus_time_calendar.impl.outlook365_calendar_adapter import Outlook365CalendarAdapter
+from tests.utils.caldav_stand_in_server import CaldavStandInServer
+from tests.utils.graph_stand_in_server import GraphStandInServer
+from tests.utils.in_memory_keyring import CountingInMemoryKeyring
+
+# Keyring namespace of the credentials of the adapters that talk to the stand-in servers
+STAND_IN_NAMESPACE = "stand-in"
+STAND_IN_OUTLOOK365_CLIENT_ID = "00000000-0000-0000-0000-000000000000"
+
+
+class StandInOutlook365CalendarAdapter(Outlook365CalendarAdapter):
+    """
+    Outlook365CalendarAdapter that sends its Graph requests to a GraphStandInServer instead of graph.microsoft.com.
+
+    :param requests_delay_ms: overrides the minimum delay between two requests, which the O365 library enforces (by
+        default 200 ms), e.g. 0 to speed up tests. None keeps the default, e.g. for realistic benchmarks.
+    """
+
+    def __init__(self, configuration: ConfigurationV1, server: GraphStandInServer,
+                 event_store: Optional[EventStore] = None, requests_delay_ms: Optional[int] = None):
+        super().__init__(configuration, environment_namespace_override=STAND_IN_NAMESPACE, event_store=event_store)
+        self._server = server
+        self._requests_delay_ms = requests_delay_ms
+
+    def _create_account(self):
+        account = super()._create_account()
+        account.protocol.protocol_url = self._server.base_url
+        account.protocol.service_url = self._server.service_url
+        if self._requests_delay_ms is not None:
+            account.con.requests_delay = self._requests_delay_ms
+        return account
+
+
+def create_stand_in_configuration(server: Union[CaldavStandInServer, GraphStandInServer],
+                                  **overrides) -> ConfigurationV1:
+    """
+    Returns a configuration for the calendar of the provided stand-in server, without any start or stop commands.
+    The "use_delta_queries" override only affects Outlook 365 (the CalDAV adapter synchronizes incrementally whenever
+    it is given an EventStore).
+    """
+    use_delta_queries = overrides.pop("use_delta_queries", False)
+    if isinstance(server, CaldavStandInServer):
+        calendar_type = CalendarType.CalDAV
+        adapter_configuration = {"calendar_url": server.calendar_url}
+    else:
+        calendar_type = CalendarType.Outlook365
+        adapter_configuration = {"client_id": STAND_IN_OUTLOOK365_CLIENT_ID, "tenant_id": None,
+                                 "calendar_name": server.CALENDAR_NAME, "use_delta_queries": use_delta_queries}
+    values = dict(calendar_type=calendar_type, calendar_look_ahead_hours=3, calendar_look_back_hours=5,
+                  focustime_event_name="Focus time", start_commands=[], stop_commands=[],
+                  dnd_profile_name="unused", set_event_reminder=True, event_reminder_time_minutes=15,
+                  adapter_configuration=adapter_configuration)
+    values.update(overrides)
+    return ConfigurationV1(**values)
+
+
+def create_stand_in_adapter(configuration: ConfigurationV1, server: Union[CaldavStandInServer, GraphStandInServer],
+                            event_store: Optional[EventStore] = None,
+                            o365_requests_delay_ms: Optional[int] = None) -> AbstractCalendarAdapter:
+    """
+    Returns a (connected) calendar adapter for the provided stand-in server, whose credentials must have been stored
+    with store_stand_in_credentials() before. See StandInOutlook365CalendarAdapter for o365_requests_delay_ms.
+    """
+    if isinstance(server, CaldavStandInServer):
+        adapter = CaldavCalendarAdapter(configuration, environment_namespace_override=STAND_IN_NAMESPACE,
+                                        event_store=event_store)
+    else:
+        adapter = StandInOutlook365CalendarAdapter(configuration, server, event_store=event_store,
+                                                   requests_delay_ms=o365_requests_delay_ms)
+    adapter.prepare_connection()
+    return adapter
+
+
+def store_stand_in_credentials(server: Union[CaldavStandInServer, GraphStandInServer]):
+    """
+    Stores the credentials for the provided stand-in server in the keyring: the username and password for the CalDAV
+    stand-in, or an OAuth token (that does not expire during the next day) for the Graph stand-in.
+    """
+    credentials_store = KeyringCredentialsStore(namespace_override=STAND_IN_NAMESPACE)
+    if isinstance(server, CaldavStandInServer):
+        credentials_store.save_credentials(f"{server.username}||{server.password}")
+    else:
+        credentials_store.save_credentials(json.dumps({
+            "token_type": "Bearer", "scope": ["https://graph.microsoft.com/Calendars.ReadWrite"],
+            "access_token": "stand-in-access-token", "refresh_token": "stand-in-refresh-token",
+            "expires_in": 86400, "expires_at": time.time() + 86400}))
+
+
+@contextmanager
+def stand_in_environment(storage_directory: Path) -> Iterator[CountingInMemoryKeyring]:
+    """
+    Isolates the enclosed block from the installation of this app and the OS: the storage directory is replaced by the
+    provided one, and the credentials are kept in an in-memory keyring (which is returned). Also allows
+    requests_oauthlib to send the bearer token over plain HTTP, which the Graph stand-in server uses.
+    """
+    in_memory_keyring = CountingInMemoryKeyring(latency_seconds=0)
+    previous_keyring = keyring.get_keyring()
+    keyring.set_keyring(in_memory_keyring)
+    KeyringCredentialsStore.clear_process_cache()
+    # Note: unlike the supported platforms, others (such as Linux) have no entry
+    password_length_limit = KeyringCredentialsStore.PASSWORD_LENGTH_LIMITATION.get(sys.platform, 0)
+    try:
+        with mock.patch.object(Persistence, "get_storage_directory", return_value=storage_directory), \
+                mock.patch.dict(KeyringCredentialsStore.PASSWORD_LENGTH_LIMITATION,
+                                {sys.platform: password_length_limit}), \
+                mock.patch.dict(os.environ, {"OAUTHLIB_INSECURE_TRANSPORT": "1"}):
+            yield in_memory_keyring
+    finally:
+        keyring.set_keyring(previous_keyring)
+        KeyringCredentialsStore.clear_process_cache()
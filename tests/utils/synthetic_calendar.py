@@ -0,0 +1,70 @@
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Union
+
+from tests.utils.caldav_stand_in_server import CaldavStandInServer
+from tests.utils.graph_stand_in_server import GraphStandInServer
+
+ICAL_DATETIME_FORMAT = "%Y%m%dT%H%M%SZ"
+
+
+@dataclass
+class SyntheticEvent:
+    uid: str
+    subject: str
+    start: datetime
+    end: datetime
+    reminder_minutes: int  # 0 means that the event has no reminder (VALARM)
+    occurrences: int  # number of daily occurrences, 1 for non-recurring events
+
+    def to_ical(self) -> str:
+        lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//focus-time-app//synthetic calendar//EN",
+                 "BEGIN:VEVENT", f"UID:{self.uid}", f"DTSTAMP:{self.start.strftime(ICAL_DATETIME_FORMAT)}",
+                 f"DTSTART:{self.start.strftime(ICAL_DATETIME_FORMAT)}",
+                 f"DTEND:{self.end.strftime(ICAL_DATETIME_FORMAT)}", f"SUMMARY:{self.subject}"]
+        if self.occurrences > 1:
+            lines.append(f"RRULE:FREQ=DAILY;COUNT={self.occurrences}")
+        if self.reminder_minutes > 0:
+            lines.extend(["BEGIN:VALARM", "ACTION:DISPLAY", "DESCRIPTION:Reminder",
+                          f"TRIGGER:-PT{self.reminder_minutes}M", "END:VALARM"])
+        lines.extend(["END:VEVENT", "END:VCALENDAR"])
+        return "\r\n".join(lines) + "\r\n"
+
+
+def generate_synthetic_events(count: int, focustime_event_name: str, focus_ratio: float = 0.1,
+                              recurring_ratio: float = 0.05, alarm_ratio: float = 0.5,
+                              spread: timedelta = timedelta(days=7), now: Optional[datetime] = None,
+                              seed: int = 0) -> List[SyntheticEvent]:
+    """
+    Returns <count> events that start within +/- <spread> around <now>, of which roughly <focus_ratio> are focus time
+    events (the others are "noise", such as meetings), <recurring_ratio> recur daily, and <alarm_ratio> have a reminder.
+    The events only depend on the seed (and <now>), so that benchmark runs are comparable.
+    """
+    rng = random.Random(seed)
+    now = (now or datetime.now(timezone.utc)).replace(microsecond=0)
+    spread_minutes = int(spread.total_seconds() // 60)
+    events = []
+    for i in range(count):
+        start = now + timedelta(minutes=rng.randint(-spread_minutes, spread_minutes))
+        is_focus_time = rng.random() < focus_ratio
+        events.append(SyntheticEvent(
+            uid=str(uuid.UUID(int=rng.getrandbits(128))),
+            subject=focustime_event_name if is_focus_time else f"Meeting {i}",
+            start=start, end=start + timedelta(minutes=rng.choice([15, 30, 60, 120])),
+            reminder_minutes=rng.choice([5, 15, 30]) if rng.random() < alarm_ratio else 0,
+            occurrences=rng.randint(2, 10) if rng.random() < recurring_ratio else 1))
+    return events
+
+
+def seed_calendar(server: Union[CaldavStandInServer, GraphStandInServer], events: List[SyntheticEvent]):
+    """
+    Stores the provided events in the calendar of the stand-in server.
+    """
+    for event in events:
+        if isinstance(server, CaldavStandInServer):
+            server.put_object(f"{event.uid}.ics", event.to_ical())
+        else:
+            server.add_event(event.subject, event.start, event.end, reminder_minutes=event.reminder_minutes,
+                             occurrences=event.occurrences, ical_uid=event.uid)